@@ -0,0 +1,46 @@
+"""add campaign coupon stats table
+
+Revision ID: 5e1f7a9c3d20
+Revises: b3d84f0e6c21
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '5e1f7a9c3d20'
+down_revision = 'b3d84f0e6c21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'campaign_coupon_stats',
+        sa.Column('campaign_id', sa.Uuid(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('assigned', sa.Integer(), nullable=False),
+        sa.Column('redeemed', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['campaign_id'], ['campaign.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('campaign_id')
+    )
+    # Backfill from the existing coupons
+    op.execute(
+        """
+        INSERT INTO campaign_coupon_stats (campaign_id, total, assigned, redeemed)
+        SELECT campaign_id,
+               count(*),
+               count(*) FILTER (WHERE assigned_to_user_id IS NOT NULL),
+               count(*) FILTER (WHERE redeemed)
+        FROM coupon
+        WHERE campaign_id IS NOT NULL
+        GROUP BY campaign_id
+        """
+    )
+
+
+def downgrade():
+    op.drop_table('campaign_coupon_stats')
@@ -0,0 +1,28 @@
+"""make keycloak_user_id unique
+
+Revision ID: 7c2e9d41a5b8
+Revises: 0801e102be1a
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e9d41a5b8'
+down_revision = '0801e102be1a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The identity sync upserts users with ON CONFLICT (keycloak_user_id),
+    # which needs a unique index on the column
+    op.execute('DROP INDEX IF EXISTS ix_user_keycloak_user_id')
+    op.create_index(op.f('ix_user_keycloak_user_id'), 'user', ['keycloak_user_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_user_keycloak_user_id'), table_name='user')
+    op.create_index(op.f('ix_user_keycloak_user_id'), 'user', ['keycloak_user_id'], unique=False)
@@ -0,0 +1,30 @@
+"""add coupon created_at id index
+
+Revision ID: 9a4c6e2b8f13
+Revises: 5e1f7a9c3d20
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c6e2b8f13'
+down_revision = '5e1f7a9c3d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CONCURRENTLY keeps coupon writable during the build; it can't run in a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_coupon_created_at_id', 'coupon', ['created_at', 'id'], unique=False, postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_coupon_created_at_id', table_name='coupon', postgresql_concurrently=True)
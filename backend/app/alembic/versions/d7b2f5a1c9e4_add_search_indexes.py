@@ -0,0 +1,54 @@
+"""add search indexes
+
+Revision ID: d7b2f5a1c9e4
+Revises: 9a4c6e2b8f13
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7b2f5a1c9e4'
+down_revision = '9a4c6e2b8f13'
+branch_labels = None
+depends_on = None
+
+TRIGRAM_INDEXES = [
+    ('ix_coupon_code_trgm', 'coupon', 'code'),
+    ('ix_campaign_title_trgm', 'campaign', 'title'),
+    ('ix_campaign_description_trgm', 'campaign', 'description'),
+    ('ix_announcement_category_trgm', 'announcement', 'category'),
+]
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # CONCURRENTLY keeps the tables writable during the (slow, for GIN) builds;
+    # it can't run in a transaction
+    with op.get_context().autocommit_block():
+        for name, table, column in TRIGRAM_INDEXES:
+            op.create_index(
+                name, table, [column], unique=False, postgresql_concurrently=True,
+                postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'},
+            )
+        op.create_index(
+            'ix_coupon_code_lower_pattern', 'coupon',
+            [sa.text('lower(code) text_pattern_ops')], unique=False, postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_announcement_search', 'announcement',
+            [sa.text("to_tsvector('simple'::regconfig, coalesce(title, '') || ' ' || coalesce(description, ''))")],
+            unique=False, postgresql_concurrently=True, postgresql_using='gin',
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_announcement_search', table_name='announcement', postgresql_concurrently=True)
+        op.drop_index('ix_coupon_code_lower_pattern', table_name='coupon', postgresql_concurrently=True)
+        for name, table, _ in reversed(TRIGRAM_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    # pg_trgm is left installed, other objects may depend on it
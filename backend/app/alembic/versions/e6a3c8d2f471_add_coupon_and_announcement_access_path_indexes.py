@@ -0,0 +1,54 @@
+"""add coupon and announcement access path indexes
+
+Revision ID: e6a3c8d2f471
+Revises: d7b2f5a1c9e4
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a3c8d2f471'
+down_revision = 'd7b2f5a1c9e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CONCURRENTLY keeps the tables writable during the build; it can't run in a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_coupon_campaign_id_created_at_id', 'coupon',
+            ['campaign_id', 'created_at', 'id'], unique=False, postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_coupon_assigned_to_user_id_campaign_id', 'coupon',
+            ['assigned_to_user_id', 'campaign_id'], unique=False, postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_coupon_campaign_id_unassigned', 'coupon',
+            ['campaign_id', 'id'], unique=False, postgresql_concurrently=True,
+            postgresql_where=sa.text('assigned_to_user_id IS NULL'),
+        )
+        op.create_index(
+            'ix_announcement_live_created_date', 'announcement',
+            ['created_date'], unique=False, postgresql_concurrently=True,
+            postgresql_where=sa.text('deleted_at IS NULL'),
+        )
+        op.create_index(
+            'ix_announcement_published_created_date', 'announcement',
+            ['created_date'], unique=False, postgresql_concurrently=True,
+            postgresql_where=sa.text('is_published AND deleted_at IS NULL'),
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_announcement_published_created_date', table_name='announcement', postgresql_concurrently=True)
+        op.drop_index('ix_announcement_live_created_date', table_name='announcement', postgresql_concurrently=True)
+        op.drop_index('ix_coupon_campaign_id_unassigned', table_name='coupon', postgresql_concurrently=True)
+        op.drop_index('ix_coupon_assigned_to_user_id_campaign_id', table_name='coupon', postgresql_concurrently=True)
+        op.drop_index('ix_coupon_campaign_id_created_at_id', table_name='coupon', postgresql_concurrently=True)
@@ -0,0 +1,55 @@
+"""add updated_at columns
+
+Revision ID: f3b9d1e7a2c5
+Revises: e6a3c8d2f471
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b9d1e7a2c5'
+down_revision = 'e6a3c8d2f471'
+branch_labels = None
+depends_on = None
+
+TABLES = ('coupon', 'campaign', 'announcement', 'campaign_coupon_stats')
+
+
+def upgrade():
+    # clock_timestamp() rather than now(): two updates of a row in different
+    # transactions always get different timestamps, even if the transactions overlap
+    op.execute(
+        """
+        CREATE FUNCTION set_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at = clock_timestamp();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for table in TABLES:
+        # now() is stable, so existing rows are filled in without a table rewrite
+        op.add_column(
+            table,
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        )
+        # Also covers bulk UPDATEs and ON CONFLICT DO UPDATE, which skip ORM onupdate hooks
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_set_updated_at
+            BEFORE UPDATE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION set_updated_at()
+            """
+        )
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER {table}_set_updated_at ON {table}")
+        op.drop_column(table, 'updated_at')
+    op.execute("DROP FUNCTION set_updated_at()")
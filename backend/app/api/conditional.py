@@ -0,0 +1,58 @@
+"""
+Conditional GET support for the listing endpoints
+
+Listings send a weak ETag built from a version stamp computed in SQL (see
+crud.rows_version_statement) and a Last-Modified header. A request whose
+If-None-Match matches the current ETag gets an empty 304 without the rows
+being loaded or serialized.
+
+If-Modified-Since is not evaluated: rows can leave a listing (expiry, soft
+delete, reassignment) without any remaining row's updated_at moving, so a
+date alone can't tell that the listing changed. Clients sending both headers
+are covered by If-None-Match, which takes precedence anyway.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+from fastapi import Request, Response
+
+
+def weak_etag(*parts: object) -> str:
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison of the request's If-None-Match against `etag`"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def http_date(moment: datetime) -> str:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+
+def set_validators(
+    response: Response, etag: str, last_modified: datetime | None, public: bool = False
+) -> None:
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    # Revalidate on every use; per-user listings must also stay out of shared caches
+    response.headers["Cache-Control"] = "public, no-cache" if public else "private, no-cache"
+
+
+def not_modified(etag: str, last_modified: datetime | None, public: bool = False) -> Response:
+    response = Response(status_code=304)
+    set_validators(response, etag, last_modified, public)
+    # Add CORS headers explicitly
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+    response.headers["Access-Control-Allow-Headers"] = "Authorization, Content-Type"
+    return response
@@ -1,122 +1,175 @@
-from collections.abc import Generator
-from typing import Annotated
+import logging
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Generator,
+)
+from contextlib import asynccontextmanager
+from typing import Annotated, Any, TypeVar
 
-import jwt
-from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
-from sqlmodel import Session, select
+from sqlalchemy import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core import security
 from app.core.config import settings
-from app.core.db import engine
+from app.core.db import async_engine, async_read_engine, engine, read_engine
+from app.core.replica import read_engine_for
 from app.models import User
+from app.services.identity_service import (
+    IdentityConflictError,
+    IdentityService,
+    claims_subject,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
 
 # Use HTTPBearer instead of OAuth2PasswordBearer for JWT tokens
 reusable_http_bearer = HTTPBearer()
+# Same, for routes that also serve anonymous requests
+optional_http_bearer = HTTPBearer(auto_error=False)
 
 def get_db() -> Generator[Session, None, None]:
     with Session(engine) as session:
         yield session
 
 SessionDep = Annotated[Session, Depends(get_db)]
+
+class Database:
+    """
+    Session of the hot async routes, whose crud and service calls don't block the event loop
+
+    With DB_ASYNC the session is an AsyncSession and the calls run on its sync
+    view through run_sync, so the driver does its I/O on the event loop;
+    otherwise it is a sync Session and the calls run in the threadpool. Either
+    way a route has a single handler running the same crud code.
+    """
+
+    def __init__(self, session: Session | AsyncSession):
+        self.session = session
+
+    async def run(self, function: Callable[..., T], /, **kwargs: Any) -> T:
+        """Return `function(session=<session>, **kwargs)`"""
+        if isinstance(self.session, AsyncSession):
+            return await self.session.run_sync(lambda session: function(session=session, **kwargs))
+        return await run_in_threadpool(function, session=self.session, **kwargs)
+
+@asynccontextmanager
+async def _open_database(bind: Engine, async_bind: AsyncEngine) -> AsyncIterator[Database]:
+    # Attributes can't be lazy loaded outside the greenlet or threadpool once a
+    # handler has committed, so keep them loaded instead of expiring them
+    if settings.DB_ASYNC:
+        async with AsyncSession(async_bind, expire_on_commit=False) as session:
+            yield Database(session)
+    else:
+        sync_session = Session(bind, expire_on_commit=False)
+        try:
+            yield Database(sync_session)
+        finally:
+            await run_in_threadpool(sync_session.close)
+
+async def get_database() -> AsyncGenerator[Database, None]:
+    async with _open_database(engine, async_engine) as database:
+        yield database
+
+DatabaseDep = Annotated[Database, Depends(get_database)]
 TokenDep = Annotated[HTTPAuthorizationCredentials, Depends(reusable_http_bearer)]
 
-def get_current_user(session: SessionDep, token: TokenDep) -> User:
+def get_token_claims(request: Request, token: TokenDep) -> dict[str, Any]:
+    """
+    Verify the bearer token and return the user info extracted from it.
+
+    The result is stored on `request.state`, so the signature is verified once per
+    request no matter how many dependencies (current user, role checks, route
+    bodies) need the claims.
+    """
+    claims: dict[str, Any] | None = getattr(request.state, "token_claims", None)
+    if claims is not None:
+        return claims
+
+    if not token.credentials:
+        raise HTTPException(status_code=403, detail="Empty token")
     try:
-        print(f"DEBUG: Token object: {token}")
-        print(f"DEBUG: Token credentials: {token.credentials}")
-        print(f"DEBUG: Token scheme: {token.scheme}")
-        
-        if not token.credentials:
-            print("DEBUG: Empty token credentials")
-            raise HTTPException(status_code=403, detail="Empty token")
-            
-        # Validate Keycloak token and extract user info
         # The token.credentials contains the actual JWT token
-        user_info = security.get_user_info_from_token(token.credentials)
-        
-        # Log the extracted user info for debugging
-        print(f"DEBUG: Extracted user info: {user_info}")
-        
-        keycloak_user_id = user_info.get("user_id")
-        user_roles = user_info.get("roles", [])
-        
-        # Check if user exists in our database, create if not
-        user = None
-        
-        # First, try to find by Keycloak user ID if available
-        if keycloak_user_id:
-            statement = select(User).where(User.keycloak_user_id == keycloak_user_id)
-            user = session.exec(statement).first()
-        
-        # If not found by Keycloak ID, try to find by email
-        email = user_info.get("email")
-        if not user and email:
-            statement = select(User).where(User.email == email)
-            user = session.exec(statement).first()
-        
-        if not user:
-            print(f"DEBUG: Creating new user for email: {email}")
-            # Create user if not exists
-            user = User(
-                email=email or f"unknown_{keycloak_user_id}@example.com",  # Use a fallback if no email
-                full_name=user_info.get("full_name") or f"User {keycloak_user_id}",  # Use a fallback if no name
-                keycloak_user_id=keycloak_user_id,
-                is_active=True,
-                is_superuser="admin" in user_roles  # Set superuser based on Keycloak roles
-            )
-            session.add(user)
-            session.commit()
-            session.refresh(user)
-            print(f"DEBUG: Created new user with id: {user.id}")
-        else:
-            print(f"DEBUG: Using existing user with id: {user.id}")
-            # Update user info if needed
-            updated = False
-            
-            # Update Keycloak user ID if it was missing
-            if not user.keycloak_user_id and keycloak_user_id:
-                user.keycloak_user_id = keycloak_user_id
-                updated = True
-                
-            # Update email if it was missing or changed
-            email = user_info.get("email")
-            if email and user.email != email:
-                user.email = email
-                updated = True
-                
-            # Update full name if it was missing or changed
-            full_name = user_info.get("full_name")
-            if full_name and user.full_name != full_name:
-                user.full_name = full_name
-                updated = True
-                
-            # Update superuser status based on Keycloak roles
-            is_admin = "admin" in user_roles
-            if user.is_superuser != is_admin:
-                user.is_superuser = is_admin
-                updated = True
-                
-            if updated:
-                session.add(user)
-                session.commit()
-                session.refresh(user)
-                print(f"DEBUG: Updated user information for user id: {user.id}")
-            
-        if not user.is_active:
-            raise HTTPException(status_code=400, detail="Inactive user")
-        return user
+        claims = security.get_user_info_from_token(token.credentials)
     except (ValueError, InvalidTokenError, ValidationError) as e:
-        print(f"DEBUG: Token validation error: {e}")
+        logger.debug("Token validation failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
+    request.state.token_claims = claims
+    return claims
+
+TokenClaimsDep = Annotated[dict[str, Any], Depends(get_token_claims)]
+OptionalTokenDep = Annotated[HTTPAuthorizationCredentials | None, Depends(optional_http_bearer)]
+
+def _read_subject(request: Request, token: HTTPAuthorizationCredentials | None) -> str | None:
+    # Anonymous and invalid tokens read from the replica; an invalid token is
+    # still rejected by the route's own auth dependencies
+    if token is None or not token.credentials:
+        return None
+    try:
+        return claims_subject(get_token_claims(request, token))
+    except HTTPException:
+        return None
+
+def get_read_db(request: Request, token: OptionalTokenDep) -> Generator[Session, None, None]:
+    """
+    Session for read-only routes, on the replica unless the user was pinned to
+    the primary by a recent write of their own
+    """
+    bind = read_engine_for(_read_subject(request, token), engine, read_engine)
+    with Session(bind) as session:
+        yield session
+
+ReadSessionDep = Annotated[Session, Depends(get_read_db)]
+
+async def get_read_database(request: Request, token: OptionalTokenDep) -> AsyncGenerator[Database, None]:
+    """get_read_db for the async routes"""
+    subject = _read_subject(request, token)
+    bind = read_engine_for(subject, engine, read_engine)
+    async_bind = read_engine_for(subject, async_engine, async_read_engine)
+    async with _open_database(bind, async_bind) as database:
+        yield database
+
+ReadDatabaseDep = Annotated[Database, Depends(get_read_database)]
+
+def get_current_user(session: SessionDep, user_info: TokenClaimsDep) -> User:
+    # Find or create the local user for the Keycloak identity; the table is only
+    # written when the token claims changed since the last sync
+    try:
+        user = IdentityService(session).sync_user(user_info)
+    except IdentityConflictError:
+        raise HTTPException(status_code=403, detail="The account is linked to another identity")
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
 
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
+async def get_current_user_async(database: DatabaseDep, user_info: TokenClaimsDep) -> User:
+    # Same sync as get_current_user, on the session of the async routes
+    try:
+        user = await database.run(lambda session: IdentityService(session).sync_user(user_info))
+    except IdentityConflictError:
+        raise HTTPException(status_code=403, detail="The account is linked to another identity")
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
+
+AsyncCurrentUser = Annotated[User, Depends(get_current_user_async)]
+
 def get_current_active_superuser(current_user: CurrentUser) -> User:
     if not current_user.is_superuser:
         raise HTTPException(
@@ -124,33 +177,40 @@ def get_current_active_superuser(current_user: CurrentUser) -> User:
         )
     return current_user
 
-def require_role(required_roles: str | list[str]):
+def _check_roles(user_info: dict[str, Any], required_roles: str | list[str]) -> None:
+    user_roles = user_info.get("roles", [])
+
+    # Convert single role to list for uniform processing
+    if isinstance(required_roles, str):
+        required_roles_list = [required_roles]
+    else:
+        required_roles_list = required_roles
+
+    # Check if user has any of the required roles
+    if not any(role in user_roles for role in required_roles_list):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"The user doesn't have any of the required roles: {required_roles_list}"
+        )
+
+def require_role(required_roles: str | list[str]) -> Callable[..., User]:
     """
     Dependency to check if user has specific roles (any of the provided roles)
     """
-    def role_checker(current_user: CurrentUser, token: TokenDep) -> User:
-        try:
-            # Validate Keycloak token and extract user info
-            user_info = security.get_user_info_from_token(token.credentials)
-            user_roles = user_info.get("roles", [])
-            
-            # Convert single role to list for uniform processing
-            if isinstance(required_roles, str):
-                required_roles_list = [required_roles]
-            else:
-                required_roles_list = required_roles
-            
-            # Check if user has any of the required roles
-            if not any(role in user_roles for role in required_roles_list):
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail=f"The user doesn't have any of the required roles: {required_roles_list}"
-                )
-            return current_user
-        except (ValueError, InvalidTokenError, ValidationError):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Could not validate credentials",
-            )
-    
-    return Depends(role_checker)
\ No newline at end of file
+    def role_checker(current_user: CurrentUser, user_info: TokenClaimsDep) -> User:
+        _check_roles(user_info, required_roles)
+        return current_user
+
+    dependency: Callable[..., User] = Depends(role_checker)
+    return dependency
+
+def require_role_async(required_roles: str | list[str]) -> Callable[..., Awaitable[User]]:
+    """
+    require_role for async routes, loads the current user through their Database
+    """
+    async def role_checker(current_user: AsyncCurrentUser, user_info: TokenClaimsDep) -> User:
+        _check_roles(user_info, required_roles)
+        return current_user
+
+    dependency: Callable[..., Awaitable[User]] = Depends(role_checker)
+    return dependency
@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, Query
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
 from sqlmodel import Session, select
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from typing import Any
 
-from app.api.deps import CurrentUser, SessionDep, require_role, TokenDep
+from app import crud
+from app.api.conditional import etag_matches, not_modified, set_validators, weak_etag
+from app.api.deps import CurrentUser, ReadDatabaseDep, SessionDep, require_role, TokenClaimsDep
+from app.core.response_cache import published_announcements_cache
 from app.crud import (
     create_announcement,
     delete_announcement,
     get_announcement,
     get_announcements,
     get_published_announcements,
+    next_published_announcements_change,
     update_announcement,
 )
 from app.models import (
@@ -19,7 +26,6 @@ from app.models import (
     AnnouncementUpdate,
 )
 from app.schemas import Message
-from app.core import security
 
 
 router = APIRouter(prefix="/announcements", tags=["announcements"])
@@ -34,38 +40,90 @@ def announcements_options(response: Response):
     return {}
 
 
+def _published_json_response(body: bytes, etag: str, last_modified: datetime | None) -> Response:
+    response = Response(content=body, media_type="application/json")
+    set_validators(response, etag, last_modified, public=True)
+    # Add CORS headers explicitly
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+    response.headers["Access-Control-Allow-Headers"] = "Authorization, Content-Type"
+    return response
+
+
+def _serialize_published(announcements: list[Announcement]) -> bytes:
+    return AnnouncementsPublic(data=announcements, count=len(announcements)).model_dump_json().encode()
+
+
+def _pack_published(etag: str, last_modified: datetime | None, body: bytes) -> bytes:
+    # Cached pages keep their validators on a first line, so a hit can answer 304 too
+    validators = {"etag": etag, "last_modified": last_modified.isoformat() if last_modified else None}
+    return json.dumps(validators).encode() + b"\n" + body
+
+
+def _unpack_published(cached: bytes) -> tuple[str, datetime | None, bytes]:
+    header, body = cached.split(b"\n", 1)
+    validators = json.loads(header)
+    last_modified = validators["last_modified"]
+    return validators["etag"], datetime.fromisoformat(last_modified) if last_modified else None, body
+
+
+def _utc_timestamp(moment: datetime | None) -> float | None:
+    return moment.replace(tzinfo=timezone.utc).timestamp() if moment else None
+
+
+# Pages are cached until the next announcement write, their TTL, or the moment
+# one of the announcements expires, whichever comes first
 @router.get("/published", response_model=AnnouncementsPublic)
-def read_published_announcements(
-    response: Response,
-    session: SessionDep,
+async def read_published_announcements(
+    request: Request,
+    database: ReadDatabaseDep,
     skip: int = 0,
     limit: int = 100,
     category: str | None = None,
     search: str | None = None,
     new_category: bool = Query(default=False, description="Include announcements created in the last 10 days"),
-) -> AnnouncementsPublic:
+) -> Response:
     """
     Retrieve published announcements.
     All users can see published, non-expired, non-soft-deleted announcements.
     Supports optional filtering by category and search in title/description.
+    Answers 304 Not Modified when If-None-Match carries the current ETag.
     """
-    # Add CORS headers explicitly
-    response.headers["Access-Control-Allow-Origin"] = "*"
-    response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-    response.headers["Access-Control-Allow-Headers"] = "Authorization, Content-Type"
-    
-    # Get published announcements that are not soft deleted or expired
-    announcements = get_published_announcements(
-        session=session, 
-        skip=skip, 
-        limit=limit, 
-        include_deleted=False,
-        category=category,
-        search=search,
-        include_new=new_category
+    cache_key = published_announcements_cache.key((category, search, new_category, skip, limit))
+    cached = published_announcements_cache.get(cache_key)
+    if cached is not None:
+        etag, last_modified, body = _unpack_published(cached)
+        if etag_matches(request, etag):
+            return not_modified(etag, last_modified, public=True)
+        return _published_json_response(body, etag, last_modified)
+
+    # One `now` for the version, the rows and for when they change, so nothing expires in between
+    now = datetime.utcnow()
+    filters: dict[str, Any] = {
+        "skip": skip,
+        "limit": limit,
+        "include_deleted": False,
+        "category": category,
+        "search": search,
+        "include_new": new_category,
+        "now": now,
+    }
+    digest, last_modified = await database.run(
+        crud.get_rows_version, statement=crud.published_announcements_version_statement(**filters)
     )
-    
-    return AnnouncementsPublic(data=announcements, count=len(announcements))
+    etag = weak_etag(digest)
+    if etag_matches(request, etag):
+        return not_modified(etag, last_modified, public=True)
+
+    # Get published announcements that are not soft deleted or expired
+    announcements = await database.run(get_published_announcements, **filters)
+    body = _serialize_published(announcements)
+    if published_announcements_cache.enabled:
+        change = await database.run(next_published_announcements_change, now=now, include_new=new_category)
+        published_announcements_cache.set(
+            cache_key, _pack_published(etag, last_modified, body), expires_at=_utc_timestamp(change)
+        )
+    return _published_json_response(body, etag, last_modified)
 
 
 @router.post("/", response_model=AnnouncementPublic, dependencies=[require_role(["admin", "manager"])])
@@ -85,7 +143,9 @@ def create_announcement_endpoint(
     response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
     response.headers["Access-Control-Allow-Headers"] = "Authorization, Content-Type"
     
-    return create_announcement(session=session, announcement_in=announcement_in)
+    announcement = create_announcement(session=session, announcement_in=announcement_in)
+    published_announcements_cache.invalidate()
+    return announcement
 
 
 @router.get("/", response_model=AnnouncementsPublic)
@@ -93,7 +153,7 @@ def read_announcements(
     response: Response,
     session: SessionDep,
     current_user: CurrentUser,
-    token: TokenDep,  # Added token dependency to extract roles from JWT
+    user_info: TokenClaimsDep,  # Claims verified once per request by the auth dependency
     skip: int = 0,
     limit: int = 100,
     category: str | None = None,
@@ -111,13 +171,8 @@ def read_announcements(
     response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
     response.headers["Access-Control-Allow-Headers"] = "Authorization, Content-Type"
     
-    # Extract roles from the JWT token
-    try:
-        user_info = security.get_user_info_from_token(token.credentials)
-        user_roles = user_info.get("roles", [])
-    except Exception as e:
-        print(f"DEBUG: Error extracting roles from token: {e}")
-        user_roles = []
+    # Roles come from the already verified JWT claims
+    user_roles = user_info.get("roles", [])
     
     # Determine if user is manager/admin to see all announcements
     is_manager_or_admin = any(role in ['manager', 'admin'] for role in user_roles)
@@ -160,7 +215,7 @@ def read_announcement(
     response: Response,
     session: SessionDep, 
     current_user: CurrentUser,
-    token: TokenDep,  # Added token dependency to extract roles from JWT
+    user_info: TokenClaimsDep,  # Claims verified once per request by the auth dependency
     id: str
 ) -> Announcement:
     """
@@ -181,13 +236,8 @@ def read_announcement(
     if announcement.deleted_at is not None:
         raise HTTPException(status_code=404, detail="Announcement not found")
     
-    # Extract roles from the JWT token
-    try:
-        user_info = security.get_user_info_from_token(token.credentials)
-        user_roles = user_info.get("roles", [])
-    except Exception as e:
-        print(f"DEBUG: Error extracting roles from token: {e}")
-        user_roles = []
+    # Roles come from the already verified JWT claims
+    user_roles = user_info.get("roles", [])
     
     # Check permissions
     is_manager_or_admin = any(role in ['manager', 'admin'] for role in user_roles)
@@ -230,7 +280,9 @@ def update_announcement_endpoint(
     if announcement.deleted_at is not None:
         raise HTTPException(status_code=404, detail="Announcement not found")
     
-    return update_announcement(session=session, announcement=announcement, announcement_in=announcement_in)
+    announcement = update_announcement(session=session, announcement=announcement, announcement_in=announcement_in)
+    published_announcements_cache.invalidate()
+    return announcement
 
 
 @router.delete("/{id}", dependencies=[require_role(["admin"])])
@@ -257,4 +309,5 @@ def delete_announcement_endpoint(
         raise HTTPException(status_code=404, detail="Announcement already deleted")
     
     delete_announcement(session=session, announcement=announcement)
+    published_announcements_cache.invalidate()
     return Message(message="Announcement deleted successfully")
\ No newline at end of file
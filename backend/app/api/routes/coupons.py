@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
+from app import crud
 from app.api.deps import get_current_user, get_db
 from app.models import User, Coupon
 from app.schemas import CouponPublic, CouponsPublic
@@ -29,7 +30,9 @@ def get_coupon(
 ):
     """Get a specific coupon"""
     coupon = db.get(Coupon, coupon_id)
-    if not coupon:
+    # Lock the row before checking it, so a concurrent write can't change it
+    # between the checks and the counter update
+    if not coupon or crud.lock_coupon(session=db, coupon=coupon) is None:
         raise HTTPException(status_code=404, detail="Coupon not found")
     
     # Only allow user to access their own coupon
@@ -57,9 +60,11 @@ def redeem_coupon(
     if coupon.redeemed:
         raise HTTPException(status_code=400, detail="Coupon already redeemed")
     
+    before = crud.coupon_stats_state(coupon)
     coupon.redeemed = True
     coupon.redeemed_at = datetime.utcnow()
     db.add(coupon)
+    crud.record_coupon_stats_change(session=db, before=before, after=crud.coupon_stats_state(coupon))
     db.commit()
     db.refresh(coupon)
     
@@ -0,0 +1,32 @@
+import secrets
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+
+from app.api.deps import OptionalTokenDep
+from app.core.config import settings
+from app.core.db import engine_pools
+from app.core.metrics import CONTENT_TYPE, pool_metrics, registry
+
+router = APIRouter(tags=["metrics"])
+
+registry.add_collector(lambda: pool_metrics(engine_pools()))
+
+
+def verify_metrics_token(credentials: OptionalTokenDep) -> None:
+    """Require `Authorization: Bearer <METRICS_TOKEN>` when a token is configured"""
+    if settings.METRICS_TOKEN is None:
+        return
+    if credentials is None or not secrets.compare_digest(
+        credentials.credentials.encode(), settings.METRICS_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(verify_metrics_token)])
+def metrics() -> Response:
+    """Metrics of this process in the Prometheus text format"""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
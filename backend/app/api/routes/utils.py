@@ -1,7 +1,11 @@
+from typing import Any
+
 from fastapi import APIRouter, Depends
 from pydantic.networks import EmailStr
 
 from app.api.deps import get_current_active_superuser
+from app.core.db import engine_pools
+from app.core.db_pool import pool_status
 from app.schemas import Message
 from app.utils import generate_test_email, send_email
 
@@ -26,6 +30,25 @@ def test_email(email_to: EmailStr) -> Message:
     return Message(message="Test email sent")
 
 
+@router.get(
+    "/db-pool/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def db_pool() -> dict[str, Any]:
+    """
+    Database connection pool gauges and checkout latency of this process.
+
+    The primary pool is reported at the top level. With DB_ASYNC the pool of the
+    async routes is reported under `async`, the pools of a configured read
+    replica under `replica` and `async_replica`.
+    """
+    pools = engine_pools()
+    status = pool_status(pools.pop("primary"))
+    for name, pool_engine in pools.items():
+        status[name] = pool_status(pool_engine)
+    return status
+
+
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
@@ -0,0 +1,190 @@
+"""
+Structured access log
+
+One JSON line per request with the method, route template, status, latency,
+response size and the number and total duration of its database statements.
+Request headers, query strings and bodies are never logged, so tokens and
+personal data stay out of the logs.
+
+Requests pass through a level gate and sampling before a record is even
+created: 5xx responses are logged at ERROR, 4xx and slow responses at
+WARNING, the rest at INFO. Only INFO entries are sampled. Records are handed
+to a bounded queue and formatted and written by a background thread, so a
+request never waits on the log stream; when the queue is full entries are
+dropped and counted instead.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from typing import Any
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.access")
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            **getattr(record, "access", {}),
+        }
+        return json.dumps(entry, separators=(",", ":"))
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks or formats in the calling thread"""
+
+    def __init__(self, log_queue: queue.Queue[logging.LogRecord]):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock handler formats here; the listener's handler does it instead
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_access_log(
+    level: str = settings.ACCESS_LOG_LEVEL,
+    queue_size: int = settings.ACCESS_LOG_QUEUE_SIZE,
+    stream: Any = None,
+) -> logging.handlers.QueueListener | None:
+    """
+    Send the access log as JSON lines to `stream` (stdout by default) through a
+    background thread
+
+    Returns:
+        The started listener, or None when the access log is OFF
+    """
+    global _listener
+    stop_access_log()
+    if level == "OFF":
+        logger.disabled = True
+        return None
+
+    log_queue: queue.Queue[logging.LogRecord] = queue.Queue(maxsize=queue_size)
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JSONFormatter())
+    listener = logging.handlers.QueueListener(log_queue, output)
+
+    logger.handlers = [DroppingQueueHandler(log_queue)]
+    logger.setLevel(level)
+    logger.propagate = False
+    logger.disabled = False
+    listener.start()
+    _listener = listener
+    # This log replaces uvicorn's plain text access log
+    logging.getLogger("uvicorn.access").disabled = True
+    return listener
+
+
+@atexit.register
+def stop_access_log() -> None:
+    """Write out the queued entries and stop the background thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def route_template(scope: Scope) -> str | None:
+    """Path template of the route that handled the request, None if no route matched"""
+    # FastAPI versions that include routers lazily keep the route's own path on
+    # scope["route"] and the full template, with the router prefixes, here
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    template: str | None = getattr(context, "path_format", None)
+    if template:
+        return template
+    route = scope.get("route")
+    path: str | None = getattr(route, "path", None)
+    return path
+
+
+class AccessLogMiddleware:
+    """ASGI middleware writing one access log entry per HTTP request"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        sample_rate: float = settings.ACCESS_LOG_SAMPLE_RATE,
+        slow_ms: float = settings.ACCESS_LOG_SLOW_MS,
+        sample: Callable[[], float] = random.random,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self._sample = sample
+        self._clock = clock
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Nothing can be logged at all: don't even time the request
+        if scope["type"] != "http" or not logger.isEnabledFor(logging.ERROR):
+            await self.app(scope, receive, send)
+            return
+
+        start = self._clock()
+        status = 500
+        size = 0
+
+        async def send_and_record(message: Message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            self.log(scope, status, size, (self._clock() - start) * 1000)
+
+    def level_for(self, status: int, duration_ms: float) -> int:
+        if status >= 500:
+            return logging.ERROR
+        if status >= 400 or duration_ms >= self.slow_ms:
+            return logging.WARNING
+        return logging.INFO
+
+    def log(self, scope: Scope, status: int, size: int, duration_ms: float) -> None:
+        level = self.level_for(status, duration_ms)
+        if not logger.isEnabledFor(level):
+            return
+        if level == logging.INFO and self._sample() >= self.sample_rate:
+            return
+        entry = {
+            "method": scope["method"],
+            "route": route_template(scope),
+            "status": status,
+            "duration_ms": round(duration_ms, 2),
+            "bytes": size,
+        }
+        # Left on the scope by QueryStatsMiddleware
+        queries = scope.get("query_stats")
+        if queries is not None:
+            entry["db_queries"] = queries.count
+            entry["db_ms"] = round(queries.duration * 1000, 2)
+        # makeRecord + handle skips the caller lookup logger.log() does
+        record = logger.makeRecord(
+            logger.name, level, __file__, 0, "access", (), None, extra={"access": entry}
+        )
+        logger.handle(record)
@@ -63,6 +63,30 @@ class Settings(BaseSettings):
     KEYCLOAK_CLIENT_ID: str
     KEYCLOAK_CLIENT_SECRET: str
     KEYCLOAK_FRONTEND_CLIENT_ID: str
+    # Signing keys are refreshed in the background once older than this
+    KEYCLOAK_JWKS_CACHE_TTL_SECONDS: int = 300
+    # Minimum gap between forced refetches triggered by an unknown kid
+    KEYCLOAK_JWKS_MIN_REFETCH_SECONDS: int = 10
+    # Maximum number of verified tokens kept in memory, 0 disables the cache
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    # How long the Keycloak subject -> local user mapping is trusted before re-syncing
+    IDENTITY_CACHE_TTL_SECONDS: int = 300
+
+    # Connection pool of each API process
+    DB_POOL_SIZE: int = 10
+    # Extra connections opened under load beyond DB_POOL_SIZE
+    DB_MAX_OVERFLOW: int = 10
+    # Seconds a request waits for a free connection before failing
+    DB_POOL_TIMEOUT: float = 30
+    # Connections older than this many seconds are replaced, -1 keeps them forever
+    DB_POOL_RECYCLE: int = 1800
+    # Test connections with a lightweight ping on checkout
+    DB_POOL_PRE_PING: bool = True
+    # Connect through PgBouncer in transaction pooling mode: disables prepared statements
+    DB_PGBOUNCER: bool = False
+    # Run the queries of the hot async routes on an AsyncSession instead of a sync
+    # Session in the threadpool
+    DB_ASYNC: bool = False
 
     @computed_field  # type: ignore[prop-decorator]
     @property
@@ -81,6 +105,73 @@ class Settings(BaseSettings):
     def DATABASE_URL(self) -> PostgresDsn:
         return self.SQLALCHEMY_DATABASE_URI
 
+    # Streaming replica serving the read-only listing routes, unset sends every
+    # read to the primary. Port, user, password and database default to the primary's.
+    POSTGRES_REPLICA_SERVER: str | None = None
+    POSTGRES_REPLICA_PORT: int | None = None
+    POSTGRES_REPLICA_USER: str | None = None
+    POSTGRES_REPLICA_PASSWORD: str | None = None
+    POSTGRES_REPLICA_DB: str | None = None
+    # Seconds a user keeps reading from the primary after redeeming or claiming a
+    # coupon, so replication lag can't hide their own write
+    DB_REPLICA_PIN_SECONDS: float = 5
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def SQLALCHEMY_REPLICA_DATABASE_URI(self) -> PostgresDsn | None:
+        if not self.POSTGRES_REPLICA_SERVER:
+            return None
+        return PostgresDsn.build(
+            scheme="postgresql+psycopg",
+            username=self.POSTGRES_REPLICA_USER or self.POSTGRES_USER,
+            password=self.POSTGRES_REPLICA_PASSWORD if self.POSTGRES_REPLICA_PASSWORD is not None else self.POSTGRES_PASSWORD,
+            host=self.POSTGRES_REPLICA_SERVER,
+            port=self.POSTGRES_REPLICA_PORT or self.POSTGRES_PORT,
+            path=self.POSTGRES_REPLICA_DB or self.POSTGRES_DB,
+        )
+
+    # Rows per INSERT when bulk generating coupons (each row binds 6 parameters)
+    COUPON_GENERATION_CHUNK_SIZE: int = 5000
+    # Coupons assigned per UPDATE statement by bulk assignment
+    COUPON_ASSIGNMENT_BATCH_SIZE: int = 10000
+    # Rows read, validated and inserted at a time when importing coupon files
+    COUPON_IMPORT_CHUNK_SIZE: int = 5000
+    # Row errors listed in an import report; the failed count is always complete
+    COUPON_IMPORT_MAX_REPORTED_ERRORS: int = 100
+    # Background threads per API process running queued coupon imports
+    COUPON_IMPORT_WORKERS: int = 2
+    # Where queued uploads are spooled, defaults to the system temp directory
+    COUPON_IMPORT_SPOOL_DIR: str | None = None
+
+    # Seconds a page of /announcements/published is served from cache, 0 disables
+    # it. Unset, 30 with RESPONSE_CACHE_REDIS_URL and 0 without: each worker's
+    # in-memory cache only sees the invalidations made by that worker
+    ANNOUNCEMENT_CACHE_TTL_SECONDS: float | None = None
+    # Responses kept per process by the in-memory response cache
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    # redis:// URL of a Redis-compatible server caching responses for all workers,
+    # instead of each process caching in memory
+    RESPONSE_CACHE_REDIS_URL: str | None = None
+
+    # Lowest level written to the JSON access log: 5xx responses are ERROR, 4xx
+    # and slow ones WARNING, the rest INFO. OFF disables the access log
+    ACCESS_LOG_LEVEL: Literal["INFO", "WARNING", "ERROR", "OFF"] = "INFO"
+    # Fraction of INFO access log entries kept, warnings and errors are always kept
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0
+    # Requests taking at least this many milliseconds are logged at WARNING
+    ACCESS_LOG_SLOW_MS: float = 1000
+    # Access log entries waiting to be written; beyond that they are dropped
+    ACCESS_LOG_QUEUE_SIZE: int = 10000
+
+    # Serve Prometheus metrics of each process at /metrics (outside API_V1_STR)
+    METRICS_ENABLED: bool = False
+    # Bearer token /metrics requires when set; leave unset only where the path is
+    # not publicly reachable
+    METRICS_TOKEN: str | None = None
+    # Statements taking at least this many milliseconds are logged with their
+    # normalized SQL, 0 disables the slow query log
+    SLOW_QUERY_MS: float = 200
+
     SMTP_TLS: bool = True
     SMTP_SSL: bool = False
     SMTP_PORT: int = 587
@@ -1,11 +1,68 @@
+from typing import Any
+
+from sqlalchemy import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel import Session, create_engine, select
 
 from app import crud
 from app.core.config import settings
+from app.core.db_pool import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool
+from app.core.query_stats import instrument_engine
 from app.models import User
 from app.schemas import UserCreate
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+
+def engine_options(asyncio: bool = False) -> dict[str, Any]:
+    """create_engine() or create_async_engine() keyword arguments for the configured pool"""
+    options: dict[str, Any] = {
+        "poolclass": InstrumentedAsyncAdaptedQueuePool if asyncio else InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if settings.DB_PGBOUNCER:
+        # Transaction pooling hands each transaction to any server connection,
+        # so statements prepared on one connection can't be reused on the next
+        options["connect_args"] = {"prepare_threshold": None}
+    return options
+
+
+engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI), **engine_options())
+
+# Used by the async routes when DB_ASYNC is enabled. The same postgresql+psycopg
+# URL selects psycopg's asyncio driver; connections are only opened on first use.
+async_engine = create_async_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI), **engine_options(asyncio=True)
+)
+
+# Read-only listing routes (ReadSessionDep) read from the replica if one is
+# configured, otherwise these are the primary engines
+if settings.SQLALCHEMY_REPLICA_DATABASE_URI:
+    read_engine = create_engine(str(settings.SQLALCHEMY_REPLICA_DATABASE_URI), **engine_options())
+    async_read_engine = create_async_engine(
+        str(settings.SQLALCHEMY_REPLICA_DATABASE_URI), **engine_options(asyncio=True)
+    )
+else:
+    read_engine = engine
+    async_read_engine = async_engine
+
+# Statements are counted per request for the metrics
+for _engine in (engine, async_engine, read_engine, async_read_engine):
+    instrument_engine(_engine)
+
+
+def engine_pools() -> dict[str, Engine | AsyncEngine]:
+    """Engines whose pools this process uses, by name, each engine once"""
+    pools: dict[str, Engine | AsyncEngine] = {"primary": engine}
+    if settings.DB_ASYNC:
+        pools["async"] = async_engine
+    if read_engine is not engine:
+        pools["replica"] = read_engine
+        if settings.DB_ASYNC:
+            pools["async_replica"] = async_read_engine
+    return pools
 
 
 # make sure all SQLModel models are imported (app.models) before initializing DB
@@ -30,4 +87,4 @@ def init_db(session: Session) -> None:
             email=settings.FIRST_SUPERUSER,
             is_superuser=True,
         )
-        user = crud.create_user(session=session, user_create=user_in)
\ No newline at end of file
+        user = crud.create_user(session=session, user_create=user_in)
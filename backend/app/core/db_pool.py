@@ -0,0 +1,97 @@
+import threading
+import time
+from typing import Any, cast
+
+from sqlalchemy import Engine, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection, QueuePool
+
+from app.core.config import settings
+
+# Upper bounds, in seconds, of the checkout latency histogram buckets
+CHECKOUT_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolStats:
+    """Checkout counters of a connection pool, safe to update from any thread"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        # Cumulative like Prometheus buckets: bucket i counts waits <= CHECKOUT_LATENCY_BUCKETS[i]
+        self.bucket_counts = [0] * len(CHECKOUT_LATENCY_BUCKETS)
+
+    def record_checkout(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            for i, bound in enumerate(CHECKOUT_LATENCY_BUCKETS):
+                if seconds <= bound:
+                    self.bucket_counts[i] += 1
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_seconds_buckets": dict(zip(CHECKOUT_LATENCY_BUCKETS, self.bucket_counts, strict=True)),
+            }
+
+
+class _InstrumentedPool(QueuePool):
+    """QueuePool base that times every checkout, including waits for a free connection"""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self) -> PoolProxiedConnection:
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.record_timeout()
+            raise
+        self.stats.record_checkout(time.perf_counter() - start)
+        return connection
+
+    def recreate(self) -> QueuePool:
+        # Keep counting across dispose() and invalidation
+        pool = cast(_InstrumentedPool, super().recreate())
+        pool.stats = self.stats
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPool):
+    """QueuePool that times every checkout, including waits for a free connection"""
+
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    """The asyncio flavour of InstrumentedQueuePool, for engines of the async session"""
+
+
+def pool_status(engine: Engine | AsyncEngine) -> dict[str, Any]:
+    """Current gauges and checkout counters of an engine's pool"""
+    # Engines are created with one of the instrumented pools (see db.engine_options)
+    pool = cast(QueuePool, engine.pool)
+    status: dict[str, Any] = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        # Negative while the pool holds fewer than `size` connections
+        "overflow": pool.overflow(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+    }
+    if isinstance(pool, _InstrumentedPool):
+        status.update(pool.stats.snapshot())
+    return status
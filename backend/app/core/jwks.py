@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from jose import jwk
+from jose.backends.base import Key
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSCache:
+    """
+    In-process cache of the identity provider's signing keys, indexed by `kid`.
+
+    Keys are fetched once and served from memory until they are older than
+    `ttl`. A stale cache keeps serving the keys it has while a single background
+    thread refetches them, so a slow IdP never sits on the request path. The
+    only synchronous fetches are the very first one and the forced refetch when
+    a token carries a `kid` we have never seen (key rotation); the latter is
+    rate limited by `min_refetch_interval` so garbage tokens can't hammer the IdP.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], dict[str, Any]],
+        *,
+        ttl: float = 300.0,
+        min_refetch_interval: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.min_refetch_interval = min_refetch_interval
+        self._clock = clock
+
+        self._keys: dict[str, Key] = {}
+        self._default_key: Key | None = None
+        self._fetched_at: float | None = None
+        self._last_forced_refetch: float | None = None
+
+        self._lock = threading.Lock()
+        self._refresh_thread: threading.Thread | None = None
+
+    @property
+    def kids(self) -> list[str]:
+        return list(self._keys)
+
+    def get_key(self, kid: str | None) -> Key:
+        """
+        Return the verification key for `kid`.
+
+        Tokens without a `kid` header fall back to the first RS256 signing key,
+        which matches what Keycloak realms with a single active key produce.
+        """
+        if self._fetched_at is None:
+            self.refresh()
+        elif self._is_stale():
+            self._refresh_in_background()
+
+        key = self._lookup(kid)
+        if key is None and kid is not None and self._may_force_refetch():
+            logger.info("Unknown signing key id %s, refetching JWKS", kid)
+            self._last_forced_refetch = self._clock()
+            self.refresh()
+            key = self._lookup(kid)
+
+        if key is None:
+            raise ValueError(f"No signing key found for kid {kid!r}")
+        return key
+
+    def refresh(self) -> None:
+        """Fetch the key set and atomically replace the cached keys."""
+        jwks = self._fetch()
+
+        keys: dict[str, Key] = {}
+        default_key: Key | None = None
+        for key_data in jwks.get("keys", []):
+            if key_data.get("use", "sig") != "sig":
+                continue
+            alg = key_data.get("alg", "RS256")
+            if alg != "RS256":
+                continue
+            key = jwk.construct(key_data, alg)
+            if key_data.get("kid"):
+                keys[key_data["kid"]] = key
+            if default_key is None:
+                default_key = key
+
+        with self._lock:
+            self._keys = keys
+            self._default_key = default_key
+            self._fetched_at = self._clock()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys = {}
+            self._default_key = None
+            self._fetched_at = None
+            self._last_forced_refetch = None
+
+    def _lookup(self, kid: str | None) -> Key | None:
+        if kid is None:
+            return self._default_key
+        return self._keys.get(kid)
+
+    def _is_stale(self) -> bool:
+        return self._fetched_at is not None and self._clock() - self._fetched_at >= self.ttl
+
+    def _may_force_refetch(self) -> bool:
+        if self._last_forced_refetch is None:
+            return True
+        return self._clock() - self._last_forced_refetch >= self.min_refetch_interval
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(
+                target=self._background_refresh, name="jwks-refresh", daemon=True
+            )
+            self._refresh_thread.start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            # Keep serving the keys we have; the next stale lookup retries
+            logger.warning("Background JWKS refresh failed: %s", e)
+
+    def wait_for_refresh(self, timeout: float | None = None) -> None:
+        """Block until an in-flight background refresh finishes (used by tests)."""
+        thread = self._refresh_thread
+        if thread is not None:
+            thread.join(timeout)
@@ -0,0 +1,87 @@
+"""
+Stand-in for Keycloak's token signing, used by the tests and the benchmarks:
+an RSA key signing tokens and a local JWKS endpoint publishing it
+"""
+import json
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk
+from jose import jwt as jose_jwt
+
+
+class RSASigningKey:
+    """RSA key pair that signs tokens the way Keycloak does (RS256 + kid header)."""
+
+    def __init__(self, kid: str | None = None):
+        self.kid = kid or uuid.uuid4().hex
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.private_pem = private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        ).decode()
+
+    @property
+    def public_jwk(self) -> dict[str, Any]:
+        public = jwk.construct(self.private_pem, "RS256").public_key().to_dict()
+        return {**public, "kid": self.kid, "use": "sig", "alg": "RS256"}
+
+    def sign(self, claims: dict[str, Any], expires_in: timedelta = timedelta(hours=1)) -> str:
+        now = datetime.now(timezone.utc)
+        payload = {"iat": now, "exp": now + expires_in, **claims}
+        token: str = jose_jwt.encode(
+            payload, self.private_pem, algorithm="RS256", headers={"kid": self.kid}
+        )
+        return token
+
+
+class StubJWKSServer:
+    """
+    Local HTTP server serving a JWKS document, standing in for Keycloak's certs
+    endpoint. `keys` can be swapped at any time to simulate key rotation and
+    `requests` counts how often the endpoint was hit.
+    """
+
+    def __init__(self, keys: list[RSASigningKey]):
+        self.keys = keys
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                stub.requests += 1
+                body = json.dumps({"keys": [k.public_jwk for k in stub.keys]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/certs"
+
+    def fetch(self) -> dict[str, Any]:
+        document: dict[str, Any] = httpx.get(self.url).json()
+        return document
+
+    def __enter__(self) -> "StubJWKSServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,304 @@
+"""
+Prometheus metrics of this process
+
+A small in-process registry rendered in the Prometheus text exposition format
+at /metrics, so no client library or push gateway is needed. Every metric is
+safe to update from any thread. Like the pool stats in app.core.db_pool, the
+values are per process: with several workers, each exposes its own.
+"""
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from typing import Any
+
+from sqlalchemy import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.access_log import route_template
+from app.core.db_pool import CHECKOUT_LATENCY_BUCKETS, pool_status
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds of the response size histogram, in bytes
+RESPONSE_SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+# Upper bounds of the database queries per request histogram
+QUERIES_PER_REQUEST_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _sample_line(name: str, labels: dict[str, str], value: float) -> str:
+    if labels:
+        rendered = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+        name = f"{name}{{{rendered}}}"
+    return f"{name} {_format_value(value)}"
+
+
+class _Metric(ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        """(name, labels, value) of every sample of the metric"""
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {_escape_help(self.documentation)}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        lines.extend(_sample_line(name, labels, value) for name, labels, value in self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name, dict(zip(self.labelnames, key, strict=True)), value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = CHECKOUT_LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: non-cumulative count per bucket (+Inf last) and the sum
+        self._values: dict[LabelValues, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            values = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        for key, counts, total in values:
+            labels = dict(zip(self.labelnames, key, strict=True))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts, strict=True):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class PoolWaitHistogram(_Metric):
+    """Checkout wait histogram of connection pools, from their PoolStats snapshots"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation, ("pool",))
+        self._snapshots: list[tuple[str, dict[str, Any]]] = []
+
+    def add(self, pool: str, status: dict[str, Any]) -> None:
+        self._snapshots.append((pool, status))
+
+    def samples(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        for pool, status in self._snapshots:
+            # PoolStats buckets are already cumulative
+            for bound, count in status["wait_seconds_buckets"].items():
+                yield f"{self.name}_bucket", {"pool": pool, "le": _format_value(bound)}, count
+            yield f"{self.name}_bucket", {"pool": pool, "le": "+Inf"}, status["checkouts"]
+            yield f"{self.name}_sum", {"pool": pool}, status["wait_seconds_total"]
+            yield f"{self.name}_count", {"pool": pool}, status["checkouts"]
+
+
+def pool_metrics(pools: Mapping[str, Engine | AsyncEngine]) -> list[_Metric]:
+    """Gauges and checkout counters of the engines' pools, labelled with their name"""
+    gauges = {
+        "size": Gauge("db_pool_size", "Connections the pool keeps open", ("pool",)),
+        "checked_out": Gauge("db_pool_checked_out", "Connections in use", ("pool",)),
+        "checked_in": Gauge("db_pool_checked_in", "Idle connections in the pool", ("pool",)),
+        "overflow": Gauge("db_pool_overflow", "Connections open beyond the pool size", ("pool",)),
+    }
+    checkouts = Counter("db_pool_checkouts_total", "Connection checkouts", ("pool",))
+    timeouts = Counter("db_pool_checkout_timeouts_total", "Checkouts that timed out waiting", ("pool",))
+    waits = PoolWaitHistogram("db_pool_checkout_wait_seconds", "Time spent checking out a connection")
+    for pool, engine in pools.items():
+        status = pool_status(engine)
+        for key, gauge in gauges.items():
+            gauge.set(status[key], pool=pool)
+        if "checkouts" in status:
+            checkouts.inc(status["checkouts"], pool=pool)
+            timeouts.inc(status["timeouts"], pool=pool)
+            waits.add(pool, status)
+    return [*gauges.values(), checkouts, timeouts, waits]
+
+
+class Registry:
+    """Metrics rendered at /metrics, plus collectors building metrics at scrape time"""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], Iterable[_Metric]]] = []
+
+    def register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[_Metric]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        metrics = list(self._metrics.values())
+        for collector in self._collectors:
+            metrics.extend(collector())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.register(
+    Counter("http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+)
+HTTP_REQUEST_DURATION = registry.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+)
+HTTP_REQUESTS_IN_PROGRESS = registry.register(
+    Gauge("http_requests_in_progress", "HTTP requests being handled", ("method",))
+)
+HTTP_RESPONSE_SIZE = registry.register(
+    Histogram("http_response_size_bytes", "HTTP response body size", ("method", "route"), RESPONSE_SIZE_BUCKETS)
+)
+DB_QUERIES_PER_REQUEST = registry.register(
+    Histogram(
+        "db_queries_per_request",
+        "Database statements executed while handling an HTTP request",
+        ("method", "route"),
+        QUERIES_PER_REQUEST_BUCKETS,
+    )
+)
+TOKEN_VERIFICATIONS = registry.register(
+    Counter(
+        "token_verifications_total",
+        "Bearer token validations: verified, served from the verified token cache, or failed",
+        ("result",),
+    )
+)
+COUPON_REDEMPTIONS = registry.register(
+    Counter(
+        "coupon_redemptions_total",
+        "Coupon redemption attempts: redeemed, already_redeemed, forbidden or not_found",
+        ("result",),
+    )
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the HTTP metrics of every request, by route template"""
+
+    def __init__(self, app: ASGIApp, clock: Callable[[], float] = time.perf_counter):
+        self.app = app
+        self._clock = clock
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        size = 0
+
+        async def send_and_record(message: Message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc(method=method)
+        start = self._clock()
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            duration = self._clock() - start
+            HTTP_REQUESTS_IN_PROGRESS.dec(method=method)
+            # Unmatched paths share one label so arbitrary URLs can't add series
+            route = route_template(scope) or "unmatched"
+            HTTP_REQUESTS.inc(method=method, route=route, status=status)
+            HTTP_REQUEST_DURATION.observe(duration, method=method, route=route)
+            HTTP_RESPONSE_SIZE.observe(size, method=method, route=route)
+            # Left on the scope by QueryStatsMiddleware
+            queries = scope.get("query_stats")
+            if queries is not None:
+                DB_QUERIES_PER_REQUEST.observe(queries.count, method=method, route=route)
@@ -0,0 +1,21 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+
+
+def encode_cursor(created_at: datetime, id: uuid.UUID) -> str:
+    """Opaque token pointing just past the row with this (created_at, id)"""
+    payload = json.dumps([created_at.isoformat(), str(id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """Inverse of encode_cursor, raises ValueError for a malformed token"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), uuid.UUID(id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
@@ -0,0 +1,153 @@
+"""
+Database statements executed per HTTP request
+
+SQLAlchemy cursor events on every engine time each statement and add it to
+the stats of the request being handled, found through a context variable.
+Sync routes run in the threadpool with a copy of the request's context and
+async sessions run their statements on greenlets sharing it, so both are
+counted. QueryStatsMiddleware reports the totals in a Server-Timing header
+and leaves them on the ASGI scope for the access log and the metrics.
+
+Statements slower than SLOW_QUERY_MS are logged with their normalized SQL,
+request or not. Parameters are never logged.
+"""
+import logging
+import re
+import time
+from contextvars import ContextVar, Token
+from typing import Any
+
+from sqlalchemy import Engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.slow_query")
+
+# Longest normalized statement written to the slow query log
+MAX_LOGGED_STATEMENT_LENGTH = 2000
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+# Bound parameters in the pyformat, format, qmark, named and numeric styles
+_PLACEHOLDER = r"(?:%\(\w+\)s|%s|\?|:\w+|\$\d+)"
+# Expanded IN lists: one placeholder per value, so every list length would be a different statement
+_IN_LIST = re.compile(rf"\bIN \(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """SQL with literals replaced by ?, IN lists collapsed and whitespace squeezed"""
+    normalized = _WHITESPACE.sub(" ", statement).strip()
+    normalized = _IN_LIST.sub("IN (...)", normalized)
+    normalized = _STRING_LITERAL.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    if len(normalized) > MAX_LOGGED_STATEMENT_LENGTH:
+        normalized = normalized[:MAX_LOGGED_STATEMENT_LENGTH] + "..."
+    return normalized
+
+
+class QueryStats:
+    __slots__ = ("count", "duration")
+
+    def __init__(self) -> None:
+        self.count = 0
+        # Seconds spent executing statements
+        self.duration = 0.0
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def begin_request() -> tuple[QueryStats, Token[QueryStats | None]]:
+    """Start counting the statements of a request; pass the token to end_request"""
+    stats = QueryStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token: Token[QueryStats | None]) -> None:
+    _current.reset(token)
+
+
+def current_query_stats() -> QueryStats | None:
+    return _current.get()
+
+
+def _before_cursor_execute(
+    conn: Any, _cursor: Any, _statement: str, _parameters: Any, _context: Any, _executemany: bool
+) -> None:
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(
+    conn: Any, _cursor: Any, statement: str, _parameters: Any, _context: Any, _executemany: bool
+) -> None:
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += elapsed
+    if settings.SLOW_QUERY_MS > 0 and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        logger.warning(
+            "Slow query (%.1f ms): %s",
+            elapsed * 1000,
+            normalize_statement(statement),
+            extra={"duration_ms": round(elapsed * 1000, 2)},
+        )
+
+
+def _handle_error(exception_context: Any) -> None:
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start"):
+        connection.info["query_start"].pop()
+
+
+def instrument_engine(engine: Engine | AsyncEngine) -> None:
+    """Time the statements `engine` executes and count them towards the current request"""
+    sync_engine = engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+    for name, listener in (
+        ("before_cursor_execute", _before_cursor_execute),
+        ("after_cursor_execute", _after_cursor_execute),
+        ("handle_error", _handle_error),
+    ):
+        if not event.contains(sync_engine, name, listener):
+            event.listen(sync_engine, name, listener)
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware collecting the statements of each HTTP request
+
+    The stats are sent in a Server-Timing header and stored as
+    scope["query_stats"], so outer middleware can report them.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = begin_request()
+        scope["query_stats"] = stats
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            end_request(token)
@@ -0,0 +1,62 @@
+import time
+from collections.abc import Callable
+from typing import TypeVar
+
+from app.core.config import settings
+from app.core.response_cache import (
+    CacheBackend,
+    InMemoryCacheBackend,
+    ResponseCache,
+    cache_backend,
+)
+
+EngineT = TypeVar("EngineT")
+
+# Pins kept at most when they live in this process's memory
+LOCAL_PINS_MAX_ENTRIES = 100_000
+
+
+class PrimaryPins:
+    """
+    Users that must read from the primary for a while after writing
+
+    A replica lags the primary by a few milliseconds to seconds, so a user who
+    just redeemed a coupon could otherwise list their coupons from the replica
+    and see it unredeemed. Pins are keyed by the Keycloak subject and kept in a
+    cache backend, so with RESPONSE_CACHE_REDIS_URL every worker sees them;
+    without it each process only sees its own pins.
+    """
+
+    def __init__(
+        self, ttl: float, backend: CacheBackend | None = None, clock: Callable[[], float] = time.time
+    ):
+        self.ttl = ttl
+        if backend is None:
+            backend = InMemoryCacheBackend(max_entries=LOCAL_PINS_MAX_ENTRIES, clock=clock)
+        self._pins = ResponseCache(backend, namespace="replica:pins", ttl=ttl, clock=clock)
+
+    def pin(self, subject: str | None) -> None:
+        if subject:
+            self._pins.set(self._pins.key((subject,)), b"1")
+
+    def is_pinned(self, subject: str | None) -> bool:
+        if not subject or not self._pins.enabled:
+            return False
+        return self._pins.get(self._pins.key((subject,))) is not None
+
+    def clear(self) -> None:
+        self._pins.invalidate()
+
+
+primary_pins = PrimaryPins(
+    ttl=settings.DB_REPLICA_PIN_SECONDS, backend=cache_backend(max_entries=LOCAL_PINS_MAX_ENTRIES)
+)
+
+
+def read_engine_for(
+    subject: str | None, primary: EngineT, replica: EngineT, pins: PrimaryPins = primary_pins
+) -> EngineT:
+    """Engine a read-only request of `subject` (None when anonymous) should use"""
+    if replica is primary or pins.is_pinned(subject):
+        return primary
+    return replica
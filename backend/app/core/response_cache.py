@@ -0,0 +1,201 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any, Protocol
+
+from app.core.config import settings
+
+try:
+    import redis
+
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> bytes | None: ...
+
+    def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    def incr(self, key: str) -> int: ...
+
+    def counter(self, key: str) -> int: ...
+
+
+class InMemoryCacheBackend:
+    """
+    Bounded LRU of byte strings with a per-entry expiry, local to this process.
+
+    Expired entries are never returned; when the cache is full the least
+    recently used entry is dropped.
+    """
+
+    def __init__(self, max_entries: int, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+        self._counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if self._clock() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, self._clock() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+
+class RedisCacheBackend:
+    """Cache backend on a Redis-compatible server, shared by every worker process"""
+
+    def __init__(self, url: str):
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> bytes | None:
+        value: bytes | None = self._client.get(key)
+        return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        milliseconds = int(ttl * 1000)
+        if milliseconds > 0:
+            self._client.set(key, value, px=milliseconds)
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(key))
+
+    def counter(self, key: str) -> int:
+        return int(self._client.get(key) or 0)
+
+
+class ResponseCache:
+    """
+    Serialized responses of one endpoint, keyed by their query parameters
+
+    Writes invalidate the whole namespace at once by bumping a generation
+    counter that is part of every key; entries of older generations are never
+    read again and age out of the backend. Each entry lives for `ttl` seconds,
+    or less when the caller knows the response changes by itself sooner (an
+    announcement reaching its expiry date).
+
+    For `settle_seconds` after an invalidation nothing is stored: a response
+    loaded from a lagging replica in that window would otherwise be cached
+    under the new generation as current.
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        namespace: str,
+        ttl: float,
+        clock: Callable[[], float] = time.time,
+        settle_seconds: float = 0,
+    ):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+        self.settle_seconds = settle_seconds
+        self._clock = clock
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def key(self, params: tuple[Any, ...]) -> str:
+        """
+        Cache key of the response to a request with these query parameters
+
+        Take the key before loading the response and store under that same key:
+        a response loaded while a write invalidated the cache then lands in the
+        old generation instead of being served as current.
+        """
+        generation = self.backend.counter(f"{self.namespace}:generation")
+        return f"{self.namespace}:{generation}:{json.dumps(params, default=str)}"
+
+    def get(self, key: str) -> bytes | None:
+        if not self.enabled:
+            return None
+        return self.backend.get(key)
+
+    def set(self, key: str, value: bytes, expires_at: float | None = None) -> None:
+        """
+        Cache a response
+
+        Args:
+            key: Key returned by `key()` before the response was loaded
+            value: Serialized response
+            expires_at: Epoch seconds at which the response stops being valid, if known
+        """
+        if not self.enabled:
+            return
+        if self.settle_seconds > 0 and self.backend.get(f"{self.namespace}:settling") is not None:
+            return
+        ttl = self.ttl
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - self._clock())
+        self.backend.set(key, value, ttl)
+
+    def invalidate(self) -> None:
+        if self.settle_seconds > 0:
+            self.backend.set(f"{self.namespace}:settling", b"1", self.settle_seconds)
+        self.backend.incr(f"{self.namespace}:generation")
+
+
+def cache_backend(max_entries: int = settings.RESPONSE_CACHE_MAX_ENTRIES) -> CacheBackend:
+    """
+    The configured backend: Redis when RESPONSE_CACHE_REDIS_URL is set, else in
+    memory, holding at most `max_entries`
+    """
+    if settings.RESPONSE_CACHE_REDIS_URL:
+        if REDIS_AVAILABLE:
+            return RedisCacheBackend(settings.RESPONSE_CACHE_REDIS_URL)
+        logger.warning("RESPONSE_CACHE_REDIS_URL is set but redis is not installed, caching in memory")
+    return InMemoryCacheBackend(max_entries=max_entries)
+
+
+def announcement_cache_ttl() -> float:
+    """ANNOUNCEMENT_CACHE_TTL_SECONDS, or its default: 30 with Redis, off without"""
+    if settings.ANNOUNCEMENT_CACHE_TTL_SECONDS is not None:
+        return settings.ANNOUNCEMENT_CACHE_TTL_SECONDS
+    return 30 if settings.RESPONSE_CACHE_REDIS_URL else 0
+
+
+# Pages of /announcements/published; they may be loaded from the replica, so
+# nothing is cached while it catches up with a write
+published_announcements_cache = ResponseCache(
+    cache_backend(),
+    namespace="announcements:published",
+    ttl=announcement_cache_ttl(),
+    settle_seconds=settings.DB_REPLICA_PIN_SECONDS if settings.SQLALCHEMY_REPLICA_DATABASE_URI else 0,
+)
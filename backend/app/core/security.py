@@ -2,6 +2,7 @@ from datetime import datetime, timedelta, timezone
 from typing import Any
 import base64
 import json
+import logging
 
 import jwt
 try:
@@ -12,30 +13,42 @@ except ImportError:
     KEYCLOAK_AVAILABLE = False
 
 from app.core.config import settings
+from app.core.jwks import JWKSCache
+from app.core.metrics import TOKEN_VERIFICATIONS
+from app.core.token_cache import VerifiedTokenCache
 
-# Initialize Keycloak client only if settings are available
-print(f"DEBUG: KEYCLOAK_AVAILABLE: {KEYCLOAK_AVAILABLE}")
-print(f"DEBUG: Has KEYCLOAK_URL: {hasattr(settings, 'KEYCLOAK_URL')}")
-if hasattr(settings, 'KEYCLOAK_URL'):
-    print(f"DEBUG: KEYCLOAK_URL: {settings.KEYCLOAK_URL}")
-    print(f"DEBUG: KEYCLOAK_CLIENT_ID: {settings.KEYCLOAK_CLIENT_ID}")
-    print(f"DEBUG: KEYCLOAK_REALM: {settings.KEYCLOAK_REALM}")
-    print(f"DEBUG: KEYCLOAK_CLIENT_SECRET: {'*' * len(settings.KEYCLOAK_CLIENT_SECRET) if settings.KEYCLOAK_CLIENT_SECRET else 'None'}")
+logger = logging.getLogger(__name__)
 
+# Initialize Keycloak client only if settings are available
 if KEYCLOAK_AVAILABLE and hasattr(settings, 'KEYCLOAK_URL'):
-    print("DEBUG: Initializing Keycloak client")
     keycloak_openid = KeycloakOpenID(
         server_url=settings.KEYCLOAK_URL,
         client_id=settings.KEYCLOAK_CLIENT_ID,
         realm_name=settings.KEYCLOAK_REALM,
         client_secret_key=settings.KEYCLOAK_CLIENT_SECRET,
     )
-    print("DEBUG: Keycloak client initialized successfully")
 else:
-    print("DEBUG: Keycloak client not initialized")
+    logger.warning("Keycloak client not initialized, token validation is unavailable")
     keycloak_openid = None
 
 
+def _fetch_keycloak_certs() -> dict:
+    if not keycloak_openid:
+        raise ValueError("Keycloak is not configured")
+    return keycloak_openid.certs()
+
+
+# Signing keys are cached by kid so token validation doesn't call Keycloak per request
+jwks_cache = JWKSCache(
+    _fetch_keycloak_certs,
+    ttl=settings.KEYCLOAK_JWKS_CACHE_TTL_SECONDS,
+    min_refetch_interval=settings.KEYCLOAK_JWKS_MIN_REFETCH_SECONDS,
+)
+
+# Claims of already verified tokens, so repeat requests skip signature verification
+token_cache = VerifiedTokenCache(max_size=settings.TOKEN_CACHE_MAX_SIZE)
+
+
 def validate_keycloak_token(token: str) -> dict:
     """
     Validate Keycloak access token
@@ -43,36 +56,22 @@ def validate_keycloak_token(token: str) -> dict:
     if not keycloak_openid:
         raise ValueError("Keycloak is not configured")
     
+    cached = token_cache.get(token)
+    if cached is not None:
+        TOKEN_VERIFICATIONS.inc(result="cached")
+        return cached
+    
     try:
-        # Get the public key from Keycloak
-        certs = keycloak_openid.certs()
-        
-        # Find the signing key (use=sig, alg=RS256)
-        signing_key = None
-        for key in certs['keys']:
-            if key.get('use') == 'sig' and key.get('alg') == 'RS256':
-                signing_key = key
-                break
-        
-        if not signing_key:
-            raise ValueError("No RS256 signing key found")
-        
-        # Use the jose library for token validation
         from jose import jwt as jose_jwt
-        
-        # Create a JWK dict for jose
-        jwk_dict = {
-            'kty': 'RSA',
-            'n': signing_key['n'],
-            'e': signing_key['e'],
-            'alg': 'RS256',
-            'use': 'sig'
-        }
+
+        # Pick the signing key matching the token's kid from the local cache
+        header = jose_jwt.get_unverified_header(token)
+        signing_key = jwks_cache.get_key(header.get("kid"))
         
         # Decode the token
         token_info = jose_jwt.decode(
             token,
-            jwk_dict,
+            signing_key,
             algorithms=['RS256'],
             options={
                 "verify_signature": True,
@@ -82,9 +81,13 @@ def validate_keycloak_token(token: str) -> dict:
                 "verify_aud": False  # We're not verifying audience for now
             }
         )
-        return token_info
     except Exception as e:
+        TOKEN_VERIFICATIONS.inc(result="failed")
         raise ValueError(f"Token validation failed: {str(e)}")
+    
+    TOKEN_VERIFICATIONS.inc(result="verified")
+    token_cache.set(token, token_info)
+    return token_info
 
 
 def get_user_info_from_token(token: str) -> dict:
@@ -0,0 +1,95 @@
+import hashlib
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache of verified token claims.
+
+    Entries are keyed by the SHA-256 of the raw token (the token itself is never
+    kept) and live until the token's `exp`: an expired entry is never returned,
+    and expired entries are swept out on every insert. When the cache is full the
+    least recently used entry is dropped. A `max_size` of 0 disables caching.
+    """
+
+    def __init__(self, max_size: int, clock: Callable[[], float] = time.time):
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[dict[str, Any], float]] = OrderedDict()
+        self._expiry_heap: list[tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> dict[str, Any] | None:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                claims, expires_at = entry
+                if self._clock() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return claims
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, token: str, claims: dict[str, Any]) -> None:
+        if self.max_size <= 0:
+            return
+        exp = claims.get("exp")
+        if not isinstance(exp, int | float):
+            # Without an expiry we can't bound how long the claims stay valid
+            return
+
+        key = self._key(token)
+        with self._lock:
+            now = self._clock()
+            if exp <= now:
+                return
+            self._evict_expired(now)
+            self._entries[key] = (claims, float(exp))
+            self._entries.move_to_end(key)
+            heapq.heappush(self._expiry_heap, (float(exp), key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._expiry_heap.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _evict_expired(self, now: float) -> None:
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= now:
+                del self._entries[key]
+        # Entries dropped by LRU leave stale heap items behind; rebuild when they dominate
+        if len(heap) > 2 * max(self.max_size, len(self._entries)):
+            self._expiry_heap = [(exp, key) for key, (_, exp) in self._entries.items()]
+            heapq.heapify(self._expiry_heap)
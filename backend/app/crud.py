@@ -1,10 +1,17 @@
+import re
 import uuid
 from datetime import datetime, timedelta
-from typing import Any
+from collections.abc import Iterable
+from typing import Any, Literal
 
-from sqlmodel import Session, select
+from sqlalchemy import DateTime, Select, Table, Uuid, literal_column, text, tuple_
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlmodel import Session, col, delete, func, select
+from sqlmodel.sql.expression import SelectOfScalar
+from typing_extensions import Unpack
 
 
+from app.core.pagination import decode_cursor, encode_cursor
 from app.models import (
     Announcement, 
     AnnouncementCreate,
@@ -12,6 +19,7 @@ from app.models import (
 )
 from app.models import (
     Campaign, 
+    CampaignCouponStats,
     Coupon, 
     User,
     Item
@@ -19,12 +27,77 @@ from app.models import (
 from app.schemas import (
     CampaignCreate,
     CouponCreate,
+    CouponUpdate,
     UserCreate,
     UserUpdate,
     ItemCreate
 )
 
 
+CountMode = Literal["exact", "estimated", "none"]
+SearchMode = Literal["contains", "prefix"]
+# Statements of any columns, built here and run by the sync and async callers
+AnySelect = Select[Unpack[tuple[Any, ...]]]
+
+# Announcements created within this period are listed under the "new" category
+NEW_ANNOUNCEMENT_AGE = timedelta(days=10)
+
+
+# Search helpers, each builds the condition its index (see the search index migration) can serve
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def contains_filter(column: Any, term: str) -> Any:
+    """Case-insensitive substring match, served by the column's pg_trgm GIN index"""
+    return column.ilike(f"%{_escape_like(term)}%")
+
+
+def coupon_code_filter(term: str, mode: SearchMode = "contains") -> Any:
+    """
+    Match coupon codes containing `term`, or starting with it in "prefix" mode
+
+    Prefix matches go through the btree index on lower(code), substring matches
+    through the trigram index; terms shorter than 3 characters have no trigrams,
+    so their substring matches scan the table.
+    """
+    if mode == "prefix":
+        return func.lower(col(Coupon.code)).like(f"{_escape_like(term.lower())}%")
+    return contains_filter(col(Coupon.code), term)
+
+
+def announcement_search_vector() -> Any:
+    # Must stay identical to the expression of ix_announcement_search so the index is used
+    return func.to_tsvector(
+        literal_column("'simple'::regconfig"),
+        func.coalesce(col(Announcement.title), literal_column("''"))
+        + literal_column("' '")
+        + func.coalesce(col(Announcement.description), literal_column("''")),
+    )
+
+
+def announcement_search_query(search: str) -> Any | None:
+    """Full-text query matching announcements containing words starting with every search word"""
+    words = re.findall(r"\w+", search)
+    if not words:
+        return None
+    return func.to_tsquery(
+        literal_column("'simple'::regconfig"), " & ".join(f"{word}:*" for word in words)
+    )
+
+
+def _apply_announcement_search(
+    statement: SelectOfScalar[Announcement], search: str | None
+) -> SelectOfScalar[Announcement]:
+    query = announcement_search_query(search) if search else None
+    if query is None:
+        return statement
+    vector = announcement_search_vector()
+    return statement.where(vector.op("@@")(query)).order_by(None).order_by(
+        func.ts_rank(vector, query).desc(), col(Announcement.created_date).desc()
+    )
+
+
 def create_user(*, session: Session, user_create: UserCreate) -> User:
     user_data = user_create.model_dump()
     db_obj = User(**user_data)
@@ -130,6 +203,7 @@ def delete_campaign(*, session: Session, campaign: Campaign) -> None:
 def create_coupon(*, session: Session, coupon_in: CouponCreate) -> Coupon:
     db_obj = Coupon.model_validate(coupon_in)
     session.add(db_obj)
+    record_coupon_stats_change(session=session, before=None, after=coupon_stats_state(db_obj))
     session.commit()
     session.refresh(db_obj)
     return db_obj
@@ -139,40 +213,370 @@ def get_coupon(*, session: Session, coupon_id: uuid.UUID) -> Coupon | None:
     return session.get(Coupon, coupon_id)
 
 
+def get_coupons_by_codes(*, session: Session, codes: list[str], chunk_size: int = 5000) -> list[Coupon]:
+    # Chunked so a large batch stays under the bind parameter limit
+    coupons: list[Coupon] = []
+    for start in range(0, len(codes), chunk_size):
+        chunk = codes[start:start + chunk_size]
+        coupons.extend(session.exec(select(Coupon).where(col(Coupon.code).in_(chunk))).all())
+    return coupons
+
+
 def get_coupons(*, session: Session, skip: int = 0, limit: int = 100) -> list[Coupon]:
     statement = select(Coupon).offset(skip).limit(limit)
     return session.exec(statement).all()
 
 
+def coupon_filters(
+    *,
+    search: str | None = None,
+    search_mode: SearchMode = "contains",
+    category: str | None = None,
+    campaign_id: uuid.UUID | None = None,
+    assigned_to_user_id: uuid.UUID | None = None,
+) -> list[Any]:
+    filters: list[Any] = []
+    # Search in code
+    if search:
+        filters.append(coupon_code_filter(search, search_mode))
+    # Coupons have no category field, match it against the campaign's title and description
+    if category:
+        filters.append(
+            col(Coupon.campaign_id).in_(
+                select(col(Campaign.id)).where(
+                    contains_filter(col(Campaign.title), category)
+                    | contains_filter(col(Campaign.description), category)
+                )
+            )
+        )
+    if campaign_id:
+        filters.append(col(Coupon.campaign_id) == campaign_id)
+    if assigned_to_user_id:
+        filters.append(col(Coupon.assigned_to_user_id) == assigned_to_user_id)
+    return filters
+
+
+def get_coupons_page(
+    *, session: Session, filters: list[Any], limit: int = 100, cursor: str | None = None, skip: int = 0
+) -> tuple[list[Coupon], str | None]:
+    """
+    Newest coupons first, keyset paginated on (created_at, id)
+
+    Pass the returned cursor back to get the next page; it is None on the last
+    page. `skip` is only used without a cursor, for clients that still page by offset.
+    """
+    created_column, id_column = col(Coupon.created_at), col(Coupon.id)
+    statement = select(Coupon).where(*filters).order_by(created_column.desc(), id_column.desc())
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        statement = statement.where(
+            tuple_(created_column, id_column)
+            < tuple_(created_at, id, types=[DateTime(timezone=True), Uuid()])
+        )
+    elif skip:
+        statement = statement.offset(skip)
+    # One extra row tells whether there is a next page
+    coupons = list(session.exec(statement.limit(limit + 1)).all())
+    next_cursor = None
+    if len(coupons) > limit:
+        coupons = coupons[:limit]
+        next_cursor = encode_cursor(coupons[-1].created_at, coupons[-1].id)
+    return coupons, next_cursor
+
+
+def count_coupons(*, session: Session, filters: list[Any], mode: CountMode = "exact") -> int | None:
+    """Number of coupons matching the filters: exact, the planner's estimate, or None"""
+    if mode == "none":
+        return None
+    statement = select(func.count()).select_from(Coupon).where(*filters)
+    if mode == "estimated":
+        estimate = estimate_row_count(session=session, statement=select(col(Coupon.id)).where(*filters))
+        if estimate is not None:
+            return estimate
+    return session.exec(statement).one()
+
+
+def estimate_row_count(*, session: Session, statement: AnySelect) -> int | None:
+    """
+    Row count of a query as estimated by the planner, without running it
+
+    Unfiltered table scans use pg_class.reltuples, anything else the row
+    estimate of EXPLAIN. Returns None when no statistics are available yet.
+    """
+    froms = statement.get_final_froms()
+    if statement.whereclause is None and len(froms) == 1 and isinstance(froms[0], Table):
+        reltuples = session.execute(
+            text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:name)"),
+            {"name": froms[0].name},
+        ).scalar()
+        # -1 (or 0 on older servers) until the table is first vacuumed or analyzed
+        return int(reltuples) if reltuples and reltuples > 0 else None
+    compiled = statement.compile(dialect=session.get_bind().dialect)
+    plan = session.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar_one()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def get_user_coupon_for_campaign(*, session: Session, user_id: uuid.UUID, campaign_id: uuid.UUID) -> Coupon | None:
+    statement = select(Coupon).where(
+        Coupon.assigned_to_user_id == user_id,
+        Coupon.campaign_id == campaign_id,
+    )
+    return session.exec(statement).first()
+
+
+def get_unassigned_coupons(
+    *, session: Session, campaign_id: uuid.UUID, skip: int = 0, limit: int | None = None
+) -> list[Coupon]:
+    statement = (
+        select(Coupon)
+        .where(col(Coupon.campaign_id) == campaign_id, col(Coupon.assigned_to_user_id).is_(None))
+        .order_by(col(Coupon.id))
+        .offset(skip)
+        .limit(limit)
+    )
+    return list(session.exec(statement).all())
+
+
+def user_coupons_statement(user_id: uuid.UUID) -> SelectOfScalar[Coupon]:
+    return select(Coupon).where(col(Coupon.assigned_to_user_id) == user_id)
+
+
+def user_coupons_version_statement(user_id: uuid.UUID) -> AnySelect:
+    return rows_version_statement(user_coupons_statement(user_id), col(Coupon.id), col(Coupon.updated_at))
+
+
 def get_user_coupons(*, session: Session, user_id: uuid.UUID) -> list[Coupon]:
-    print(f"DEBUG: Getting coupons for user_id: {user_id}")
-    try:
-        statement = select(Coupon).where(Coupon.assigned_to_user_id == user_id)
-        result = session.exec(statement).all()
-        print(f"DEBUG: Got {len(result)} coupons for user")
-        return result
-    except Exception as e:
-        print(f"DEBUG: Error getting user coupons: {e}")
-        raise
-
-
-def update_coupon(*, session: Session, coupon: Coupon, coupon_in: CouponCreate) -> Coupon:
+    return list(session.exec(user_coupons_statement(user_id)).all())
+
+
+def lock_coupon(*, session: Session, coupon: Coupon) -> Coupon | None:
+    """
+    Lock a coupon's row until commit and reload it, None if it was deleted
+
+    Its counter contribution is then read from the row as it is now, so two
+    concurrent writes of the same coupon move the counters one after the other
+    instead of both applying a delta from the same stale state.
+    """
+    statement = (
+        select(Coupon)
+        .where(col(Coupon.id) == coupon.id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    return session.exec(statement).first()
+
+
+def update_coupon(*, session: Session, coupon: Coupon, coupon_in: CouponCreate | CouponUpdate) -> Coupon:
+    if lock_coupon(session=session, coupon=coupon) is None:
+        raise ValueError("Coupon not found")
+    before = coupon_stats_state(coupon)
     coupon_data = coupon_in.model_dump(exclude_unset=True)
     coupon.sqlmodel_update(coupon_data)
     session.add(coupon)
+    record_coupon_stats_change(session=session, before=before, after=coupon_stats_state(coupon))
     session.commit()
     session.refresh(coupon)
     return coupon
 
 
 def delete_coupon(*, session: Session, coupon: Coupon) -> None:
+    if lock_coupon(session=session, coupon=coupon) is None:
+        # Deleted concurrently, which already took it off the counters
+        session.rollback()
+        return
+    record_coupon_stats_change(session=session, before=coupon_stats_state(coupon), after=None)
     session.delete(coupon)
     session.commit()
 
 
+def rows_version_statement(page: AnySelect, id_column: Any, updated_column: Any) -> AnySelect:
+    """
+    Version of the rows a page query returns, without loading them: an md5 over
+    their ids and updated_at, and the latest updated_at
+
+    The md5 changes whenever a row of the page is updated, or a row enters or
+    leaves it (expiry, deletion, a row of an earlier page going away), which a
+    max(updated_at) alone would miss.
+    """
+    rows = page.with_only_columns(id_column.label("id"), updated_column.label("updated_at")).subquery()
+    fingerprint = func.string_agg(
+        func.concat(rows.c.id, ":", rows.c.updated_at), aggregate_order_by(literal_column("','"), rows.c.id)
+    )
+    return select(func.md5(func.coalesce(fingerprint, "")), func.max(rows.c.updated_at))
+
+
+def get_rows_version(*, session: Session, statement: AnySelect) -> tuple[str, datetime | None]:
+    """Run a rows_version_statement, returns (digest, last modified)"""
+    digest, last_modified = session.execute(statement).one()
+    return digest, last_modified
+
+
+def coupon_stats_columns() -> list[Any]:
+    """Aggregate columns for total, assigned, unassigned and redeemed coupon counts"""
+    # Count coupon ids rather than rows so campaigns LEFT JOINed without coupons count 0
+    coupon_id = col(Coupon.id)
+    assigned = col(Coupon.assigned_to_user_id).is_not(None)
+    return [
+        func.count(coupon_id).label("total"),
+        func.count(coupon_id).filter(assigned).label("assigned"),
+        func.count(coupon_id).filter(~assigned).label("unassigned"),
+        func.count(coupon_id).filter(col(Coupon.redeemed)).label("redeemed"),
+    ]
+
+
+def _stats_dict(total: int | None, assigned: int | None, redeemed: int | None) -> dict[str, int]:
+    total, assigned, redeemed = total or 0, assigned or 0, redeemed or 0
+    return {"total": total, "assigned": assigned, "unassigned": total - assigned, "redeemed": redeemed}
+
+
+def campaign_coupon_stats_statement(campaign_id: uuid.UUID) -> AnySelect:
+    return select(
+        col(CampaignCouponStats.total), col(CampaignCouponStats.assigned), col(CampaignCouponStats.redeemed)
+    ).where(col(CampaignCouponStats.campaign_id) == campaign_id)
+
+
+def campaign_coupon_stats(row: Any) -> dict[str, int]:
+    # Campaigns without coupons have no counter row yet
+    return _stats_dict(*(row or (0, 0, 0)))
+
+
+def get_campaign_coupon_stats(*, session: Session, campaign_id: uuid.UUID) -> dict[str, int]:
+    row = session.execute(campaign_coupon_stats_statement(campaign_id)).first()
+    return campaign_coupon_stats(row)
+
+
+def campaigns_with_coupon_stats_statements(
+    *, skip: int = 0, limit: int | None = None, search: str | None = None, category: str | None = None
+) -> tuple[SelectOfScalar[int], AnySelect]:
+    """Count and page queries of get_campaigns_with_coupon_stats, shared with the async routes"""
+    filters = []
+    # Campaigns have no category field, so category is matched against title and description as well
+    for term in (search, category):
+        if term:
+            filters.append(
+                contains_filter(col(Campaign.title), term) | contains_filter(col(Campaign.description), term)
+            )
+
+    count_statement = select(func.count()).select_from(Campaign).where(*filters)
+    statement = (
+        select(
+            Campaign,
+            col(CampaignCouponStats.total),
+            col(CampaignCouponStats.assigned),
+            col(CampaignCouponStats.redeemed),
+        )
+        .outerjoin(CampaignCouponStats, col(CampaignCouponStats.campaign_id) == col(Campaign.id))
+        .where(*filters)
+        .order_by(col(Campaign.created_at).desc(), col(Campaign.id))
+        .offset(skip)
+        .limit(limit)
+    )
+    return count_statement, statement
+
+
+def campaigns_with_coupon_stats_version_statement(
+    count_statement: SelectOfScalar[int], page: AnySelect
+) -> AnySelect:
+    """rows_version_statement of a campaigns page, plus the total count the listing includes"""
+    # A campaign's row in the listing also changes when its coupon counters do
+    return rows_version_statement(
+        page, col(Campaign.id), func.greatest(col(Campaign.updated_at), col(CampaignCouponStats.updated_at))
+    ).add_columns(count_statement.scalar_subquery())
+
+
+def campaigns_with_coupon_stats(rows: Iterable[Any]) -> list[tuple[Campaign, dict[str, int]]]:
+    return [(campaign, _stats_dict(*counts)) for campaign, *counts in rows]
+
+
+def get_campaigns_with_coupon_stats(
+    *, session: Session, skip: int = 0, limit: int | None = None, search: str | None = None, category: str | None = None
+) -> tuple[list[tuple[Campaign, dict[str, int]]], int]:
+    count_statement, statement = campaigns_with_coupon_stats_statements(
+        skip=skip, limit=limit, search=search, category=category
+    )
+    count = session.exec(count_statement).one()
+    return campaigns_with_coupon_stats(session.execute(statement)), count
+
+
+def adjust_campaign_coupon_stats(
+    *, session: Session, campaign_id: uuid.UUID, total: int = 0, assigned: int = 0, redeemed: int = 0
+) -> None:
+    """Add to a campaign's coupon counters in the caller's transaction"""
+    if not (total or assigned or redeemed):
+        return
+    statement = insert(CampaignCouponStats).values(
+        campaign_id=campaign_id, total=total, assigned=assigned, redeemed=redeemed
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["campaign_id"],
+        set_={
+            "total": CampaignCouponStats.total + statement.excluded.total,
+            "assigned": CampaignCouponStats.assigned + statement.excluded.assigned,
+            "redeemed": CampaignCouponStats.redeemed + statement.excluded.redeemed,
+        },
+    )
+    session.execute(statement)
+
+
+CouponStatsState = tuple[uuid.UUID, bool, bool] | None
+
+
+def coupon_stats_state(coupon: Coupon | None) -> CouponStatsState:
+    """What a coupon contributes to the counters: its campaign, whether assigned, whether redeemed"""
+    if coupon is None or coupon.campaign_id is None:
+        return None
+    return coupon.campaign_id, coupon.assigned_to_user_id is not None, bool(coupon.redeemed)
+
+
+def record_coupon_stats_change(*, session: Session, before: CouponStatsState, after: CouponStatsState) -> None:
+    """Move a coupon's contribution to the counters from its `before` state to its `after` state"""
+    deltas: dict[uuid.UUID, list[int]] = {}
+    for state, sign in ((before, -1), (after, 1)):
+        if state is None:
+            continue
+        campaign_id, is_assigned, is_redeemed = state
+        delta = deltas.setdefault(campaign_id, [0, 0, 0])
+        delta[0] += sign
+        delta[1] += sign * is_assigned
+        delta[2] += sign * is_redeemed
+    for campaign_id, (total, assigned, redeemed) in deltas.items():
+        adjust_campaign_coupon_stats(
+            session=session, campaign_id=campaign_id, total=total, assigned=assigned, redeemed=redeemed
+        )
+
+
+def rebuild_campaign_coupon_stats(*, session: Session) -> int:
+    """
+    Recompute every campaign's counters from the coupon table and commit
+
+    Writers are blocked while the table is rebuilt, so no counter update made
+    concurrently is lost. Returns the number of campaigns with coupons.
+    """
+    session.execute(text("LOCK TABLE campaign_coupon_stats IN EXCLUSIVE MODE"))
+    session.execute(delete(CampaignCouponStats))
+    total, assigned, _, redeemed = coupon_stats_columns()
+    campaign_id = col(Coupon.campaign_id)
+    aggregate = (
+        select(campaign_id, total, assigned, redeemed)
+        .where(campaign_id.is_not(None))
+        .group_by(campaign_id)
+    )
+    result = session.exec(
+        insert(CampaignCouponStats).from_select(["campaign_id", "total", "assigned", "redeemed"], aggregate)
+    )
+    session.commit()
+    return result.rowcount
+
+
 def redeem_coupon(*, session: Session, coupon: Coupon) -> Coupon:
+    if lock_coupon(session=session, coupon=coupon) is None:
+        raise ValueError("Coupon not found")
+    before = coupon_stats_state(coupon)
     coupon.redeemed = True
     session.add(coupon)
+    record_coupon_stats_change(session=session, before=before, after=coupon_stats_state(coupon))
     session.commit()
     session.refresh(coupon)
     return coupon
@@ -192,7 +596,7 @@ def get_announcement(*, session: Session, announcement_id: uuid.UUID) -> Announc
 
 
 def get_announcements(*, session: Session, skip: int = 0, limit: int = 100, status: str | None = None, include_deleted: bool = False, category: str | None = None, search: str | None = None, include_new: bool = False, include_expired: bool = False) -> list[Announcement]:
-    statement = select(Announcement)
+    statement = select(Announcement).order_by(Announcement.created_date.desc())
     if not include_deleted:
         statement = statement.where(Announcement.deleted_at.is_(None))  # Exclude soft deleted records
     if status:
@@ -215,51 +619,98 @@ def get_announcements(*, session: Session, skip: int = 0, limit: int = 100, stat
     
     # Apply category filter if provided
     if category:
-        statement = statement.where(Announcement.category.ilike(f"%{category}%"))
+        statement = statement.where(contains_filter(Announcement.category, category))
     
-    # Apply search filter if provided (search in title and description)
-    if search:
-        search_filter = f"%{search}%"
-        statement = statement.where(
-            (Announcement.title.ilike(search_filter)) | 
-            (Announcement.description.ilike(search_filter))
-        )
+    # Apply search filter if provided, full-text on title and description, best matches first
+    statement = _apply_announcement_search(statement, search)
     
     statement = statement.offset(skip).limit(limit)
     result = session.exec(statement).all()
     return result
 
 
-def get_published_announcements(*, session: Session, skip: int = 0, limit: int = 100, include_deleted: bool = False, category: str | None = None, search: str | None = None, include_new: bool = False) -> list[Announcement]:
-    statement = select(Announcement).where(Announcement.is_published == True)
+def published_announcements_statement(*, skip: int = 0, limit: int = 100, include_deleted: bool = False, category: str | None = None, search: str | None = None, include_new: bool = False, now: datetime | None = None) -> SelectOfScalar[Announcement]:
+    """The query behind get_published_announcements, shared with the async routes"""
+    now = now or datetime.utcnow()
+    statement = (
+        select(Announcement)
+        .where(col(Announcement.is_published).is_(True))
+        .order_by(col(Announcement.created_date).desc())
+    )
     if not include_deleted:
-        statement = statement.where(Announcement.deleted_at.is_(None))  # Exclude soft deleted records
+        statement = statement.where(col(Announcement.deleted_at).is_(None))  # Exclude soft deleted records
     
     # Apply include_new filter if provided - for 'New' category (created in last 10 days)
     if include_new:
-        ten_days_ago = datetime.utcnow() - timedelta(days=10)
-        statement = statement.where(Announcement.created_date >= ten_days_ago)
+        ten_days_ago = now - NEW_ANNOUNCEMENT_AGE
+        statement = statement.where(col(Announcement.created_date) >= ten_days_ago)
     
     # Exclude expired announcements (where expiry_date is in the past)
     statement = statement.where(
-        (Announcement.expiry_date.is_(None)) | (Announcement.expiry_date > datetime.utcnow())
+        (col(Announcement.expiry_date).is_(None)) | (col(Announcement.expiry_date) > now)
     )
     
     # Apply category filter if provided
     if category:
-        statement = statement.where(Announcement.category.ilike(f"%{category}%"))
+        statement = statement.where(contains_filter(Announcement.category, category))
     
-    # Apply search filter if provided (search in title and description)
-    if search:
-        search_filter = f"%{search}%"
-        statement = statement.where(
-            (Announcement.title.ilike(search_filter)) | 
-            (Announcement.description.ilike(search_filter))
-        )
+    # Apply search filter if provided, full-text on title and description, best matches first
+    statement = _apply_announcement_search(statement, search)
     
-    statement = statement.offset(skip).limit(limit)
-    result = session.exec(statement).all()
-    return result
+    return statement.offset(skip).limit(limit)
+
+
+def get_published_announcements(*, session: Session, skip: int = 0, limit: int = 100, include_deleted: bool = False, category: str | None = None, search: str | None = None, include_new: bool = False, now: datetime | None = None) -> list[Announcement]:
+    statement = published_announcements_statement(
+        skip=skip,
+        limit=limit,
+        include_deleted=include_deleted,
+        category=category,
+        search=search,
+        include_new=include_new,
+        now=now,
+    )
+    return list(session.exec(statement).all())
+
+
+def published_announcements_version_statement(**filters: Any) -> AnySelect:
+    """rows_version_statement of published_announcements_statement(**filters)"""
+    return rows_version_statement(
+        published_announcements_statement(**filters), col(Announcement.id), col(Announcement.updated_at)
+    )
+
+
+def published_announcements_change_statement(*, now: datetime, include_new: bool = False) -> AnySelect:
+    """
+    When the published listing as of `now` next changes without any write: the
+    earliest future expiry_date and, with include_new, the created_date of the
+    oldest announcement still counted as new
+    """
+    expiry_date, created_date = col(Announcement.expiry_date), col(Announcement.created_date)
+    live = (col(Announcement.is_published).is_(True), col(Announcement.deleted_at).is_(None))
+    columns = [
+        select(func.min(expiry_date)).where(*live, expiry_date > now).scalar_subquery()
+    ]
+    if include_new:
+        columns.append(
+            select(func.min(created_date))
+            .where(*live, created_date >= now - NEW_ANNOUNCEMENT_AGE)
+            .scalar_subquery()
+        )
+    statement: AnySelect = select(*columns)
+    return statement
+
+
+def published_announcements_change(row: Any) -> datetime | None:
+    next_expiry, *oldest_new = row
+    changes = [next_expiry] + [created + NEW_ANNOUNCEMENT_AGE for created in oldest_new if created]
+    return min((change for change in changes if change), default=None)
+
+
+def next_published_announcements_change(*, session: Session, now: datetime, include_new: bool = False) -> datetime | None:
+    """Next moment get_published_announcements(now=...) starts returning different rows"""
+    row = session.execute(published_announcements_change_statement(now=now, include_new=include_new)).one()
+    return published_announcements_change(row)
 
 
 def update_announcement(*, session: Session, announcement: Announcement, announcement_in: AnnouncementUpdate) -> Announcement:
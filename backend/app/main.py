@@ -1,17 +1,27 @@
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+
 import sentry_sdk
 from fastapi import FastAPI, Request, Response
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 from starlette.responses import Response as StarletteResponse
-import traceback
 import logging
 
 from app.api.main import api_router
+from app.api.routes import metrics as metrics_router
+from app.core.access_log import AccessLogMiddleware, configure_access_log
 from app.core.config import settings
+from app.core.metrics import MetricsMiddleware
+from app.core.query_stats import QueryStatsMiddleware
 from app.routers.admin import campaigns as admin_campaigns_router
 from app.routers.admin import coupons as admin_coupons_router
 from app.routers.admin import announcements as admin_announcements_router
 from app.routers.user import coupons as user_coupons_router
+from app.services.import_job_service import import_job_service
+
+
+logger = logging.getLogger(__name__)
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -21,10 +31,23 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
     sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    # Imports a previous run of the API left unfinished will never complete
+    try:
+        import_job_service.fail_orphaned_jobs()
+    except Exception:
+        logger.exception("Could not fail orphaned coupon import jobs")
+    yield
+    # Lets running imports finish, then releases their locks
+    import_job_service.shutdown()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
 )
 
 # Set all CORS enabled origins
@@ -39,30 +62,12 @@ if settings.all_cors_origins:
     )
 
 
-# DEBUG TOKEN INTERCEPT - Log incoming requests and tokens
 @app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logger = logging.getLogger("uvicorn")
-    
-    # Log all headers
-    logger.info(f"DEBUG ALL HEADERS: {dict(request.headers)}")
-    
-    # Log the authorization header
-    auth_header = request.headers.get("authorization")
-    if auth_header:
-        logger.info(f"DEBUG AUTH HEADER: {auth_header[:50]}{'...' if len(auth_header) > 50 else ''}")
-    else:
-        logger.info("DEBUG AUTH HEADER: None")
-    
-    # Log the request
-    logger.info(f"DEBUG REQUEST: {request.method} {request.url}")
-    
+async def add_cors_headers(request: Request, call_next):
     try:
         response = await call_next(request)
-        logger.info(f"DEBUG RESPONSE: {response.status_code}")
-    except Exception as e:
-        logger.error(f"DEBUG EXCEPTION: {e}")
-        logger.error(f"DEBUG TRACEBACK: {traceback.format_exc()}")
+    except Exception:
+        logger.exception("Unhandled exception on %s %s", request.method, request.url.path)
         # Create a response with CORS headers even for exceptions
         response = StarletteResponse(
             content='{"detail": "Internal server error"}',
@@ -87,6 +92,18 @@ async def log_requests(request: Request, call_next):
         
     return response
 
+
+# Inside the metrics and access log middleware, which report its stats
+app.add_middleware(QueryStatsMiddleware)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router.router)
+
+# Added last so it is outermost and also times the other middleware
+configure_access_log()
+app.add_middleware(AccessLogMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 app.include_router(admin_campaigns_router.router, prefix=settings.API_V1_STR)
 app.include_router(admin_coupons_router.router, prefix=settings.API_V1_STR)
@@ -12,6 +12,7 @@ from .campaign import (
     Campaign,
     CampaignBase,
     CampaignCreate,
+    CampaignCouponStats,
     CampaignUpdate,
     CampaignPublic,
     CampaignsPublic,
@@ -41,6 +42,11 @@ from .announcement import (
     AnnouncementPublic,
     AnnouncementsPublic,
 )
+from .import_job import (
+    CouponImportJob,
+    CouponImportJobBase,
+    CouponImportJobPublic,
+)
 from sqlmodel import SQLModel
 
 # Additional models for authentication
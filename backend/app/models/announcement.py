@@ -2,7 +2,8 @@ from datetime import datetime
 import uuid
 from sqlmodel import Field, SQLModel, Relationship
 from typing import TYPE_CHECKING, Optional
-from sqlalchemy import Column, DateTime, func
+from sqlalchemy import Index, text
+from app.models.columns import updated_at_column
 
 if TYPE_CHECKING:
     from app.models import Campaign
@@ -38,9 +39,32 @@ class AnnouncementUpdate(SQLModel):
 
 
 class Announcement(AnnouncementBase, table=True):
+    __table_args__ = (
+        # Listings of announcements that are not soft deleted, newest first
+        Index("ix_announcement_live_created_date", "created_date", postgresql_where=text("deleted_at IS NULL")),
+        Index(
+            "ix_announcement_published_created_date",
+            "created_date",
+            postgresql_where=text("is_published AND deleted_at IS NULL"),
+        ),
+        # Full-text search, see crud.announcement_search_vector
+        Index(
+            "ix_announcement_search",
+            text("to_tsvector('simple'::regconfig, coalesce(title, '') || ' ' || coalesce(description, ''))"),
+            postgresql_using="gin",
+        ),
+        Index(
+            "ix_announcement_category_trgm",
+            "category",
+            postgresql_using="gin",
+            postgresql_ops={"category": "gin_trgm_ops"},
+        ),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     campaign_id: uuid.UUID | None = Field(default=None, foreign_key="campaign.id")
     deleted_at: datetime | None = Field(default=None)  # Soft delete field
+    updated_at: datetime | None = Field(default=None, sa_column=updated_at_column())
     campaign: Optional["Campaign"] = Relationship(back_populates="announcements")
 
 
@@ -2,7 +2,8 @@ from datetime import datetime
 import uuid
 from sqlmodel import Field, SQLModel, Relationship
 from typing import List, TYPE_CHECKING
-from sqlalchemy import Column, DateTime, func
+from sqlalchemy import Column, DateTime, Index, func
+from app.models.columns import updated_at_column
 
 if TYPE_CHECKING:
     from app.models.coupon import Coupon
@@ -27,10 +28,33 @@ class CampaignUpdate(CampaignBase):
 
 
 class Campaign(CampaignBase, table=True):
+    __table_args__ = (
+        # Substring search on title and description
+        Index("ix_campaign_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        Index(
+            "ix_campaign_description_trgm",
+            "description",
+            postgresql_using="gin",
+            postgresql_ops={"description": "gin_trgm_ops"},
+        ),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime(timezone=True), server_default=func.now()))
     coupons: List["Coupon"] = Relationship(back_populates="campaign", sa_relationship_kwargs={"lazy": "select"})
     announcements: List["Announcement"] = Relationship(back_populates="campaign", sa_relationship_kwargs={"lazy": "select"})
+    updated_at: datetime | None = Field(default=None, sa_column=updated_at_column())
+
+
+class CampaignCouponStats(SQLModel, table=True):
+    """Coupon counters per campaign, kept up to date by every coupon write"""
+    __tablename__ = "campaign_coupon_stats"
+
+    campaign_id: uuid.UUID = Field(primary_key=True, foreign_key="campaign.id", ondelete="CASCADE")
+    total: int = 0
+    assigned: int = 0
+    redeemed: int = 0
+    updated_at: datetime | None = Field(default=None, sa_column=updated_at_column())
 
 
 class CampaignPublic(CampaignBase):
@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, FetchedValue, func
+
+
+def updated_at_column() -> Column[datetime]:
+    """
+    Column versioning a row for the conditional GETs of its listings
+
+    Inserts get the server default; the set_updated_at trigger, BEFORE UPDATE
+    only, bumps it on every update, bulk UPDATEs and ON CONFLICT DO UPDATE included.
+    """
+    return Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), server_onupdate=FetchedValue()
+    )
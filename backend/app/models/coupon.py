@@ -2,7 +2,8 @@ from datetime import datetime
 import uuid
 from sqlmodel import Field, SQLModel, Relationship
 from typing import TYPE_CHECKING, Optional
-from sqlalchemy import Column, DateTime, func
+from sqlalchemy import Column, DateTime, Index, func, text
+from app.models.columns import updated_at_column
 
 if TYPE_CHECKING:
     from app.models.user import User
@@ -33,12 +34,31 @@ class CouponUpdate(CouponBase):
 
 
 class Coupon(CouponBase, table=True):
+    __table_args__ = (
+        # Keyset pagination of the admin listing, newest first
+        Index("ix_coupon_created_at_id", "created_at", "id"),
+        Index("ix_coupon_campaign_id_created_at_id", "campaign_id", "created_at", "id"),
+        # A user's coupons, optionally for one campaign
+        Index("ix_coupon_assigned_to_user_id_campaign_id", "assigned_to_user_id", "campaign_id"),
+        # Unassigned coupons of a campaign, in the id order bulk assignment and listing use
+        Index(
+            "ix_coupon_campaign_id_unassigned",
+            "campaign_id",
+            "id",
+            postgresql_where=text("assigned_to_user_id IS NULL"),
+        ),
+        # Code search: trigram substring matches and lower(code) prefix matches
+        Index("ix_coupon_code_trgm", "code", postgresql_using="gin", postgresql_ops={"code": "gin_trgm_ops"}),
+        Index("ix_coupon_code_lower_pattern", text("lower(code) text_pattern_ops")),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime(timezone=True), server_default=func.now()))
     campaign_id: uuid.UUID | None = Field(default=None, foreign_key="campaign.id")
     assigned_to_user_id: uuid.UUID | None = Field(default=None, foreign_key="user.id")
     campaign: Optional["Campaign"] = Relationship(back_populates="coupons")
     owner: Optional["User"] = Relationship()
+    updated_at: datetime | None = Field(default=None, sa_column=updated_at_column())
 
 
 class CouponPublic(CouponBase):
@@ -0,0 +1,34 @@
+import uuid
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import JSON, Column
+from sqlmodel import Field, SQLModel
+
+
+# Coupon Import Job Models
+class CouponImportJobBase(SQLModel):
+    campaign_id: uuid.UUID = Field(foreign_key="campaign.id")
+    filename: str = Field(max_length=255)
+    status: str = Field(default="queued", max_length=20)  # queued, running, succeeded or failed
+    rows_processed: int = 0
+    rows_inserted: int = 0
+    rows_failed: int = 0
+    error: str | None = Field(default=None, max_length=1000)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
+class CouponImportJob(CouponImportJobBase, table=True):
+    __tablename__ = "coupon_import_job"
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    created_by_id: uuid.UUID | None = Field(default=None, foreign_key="user.id", ondelete="SET NULL")
+    errors: list[dict[str, Any]] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+
+
+class CouponImportJobPublic(CouponImportJobBase):
+    id: uuid.UUID
+    errors: list[dict[str, Any]]
+    rows_per_second: float | None = None
@@ -14,7 +14,7 @@ class UserBase(SQLModel):
     is_active: bool = True
     is_superuser: bool = False
     full_name: str | None = Field(default=None, max_length=255)
-    keycloak_user_id: str | None = Field(default=None, max_length=255)  # Add Keycloak user ID
+    keycloak_user_id: str | None = Field(default=None, unique=True, index=True, max_length=255)  # Add Keycloak user ID
 
 
 class UserCreate(UserBase):
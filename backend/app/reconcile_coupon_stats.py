@@ -0,0 +1,24 @@
+import logging
+
+from sqlmodel import Session
+
+from app import crud
+from app.core.db import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def reconcile() -> int:
+    with Session(engine) as session:
+        return crud.rebuild_campaign_coupon_stats(session=session)
+
+
+def main() -> None:
+    logger.info("Rebuilding campaign coupon stats")
+    campaigns = reconcile()
+    logger.info("Campaign coupon stats rebuilt for %d campaigns", campaigns)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlmodel import Session, select
 from app.api.deps import SessionDep, require_role, CurrentUser
+from app.core.response_cache import published_announcements_cache
 from app.models import Announcement, User
 from app.schemas import AnnouncementCreate, AnnouncementUpdate, AnnouncementPublic
 from app.crud import get_announcements, get_announcement
@@ -91,6 +92,7 @@ def create_announcement(
         announcement = Announcement.model_validate(announcement_in)
         session.add(announcement)
         session.commit()
+        published_announcements_cache.invalidate()
         session.refresh(announcement)
         return announcement
     except Exception as e:
@@ -120,6 +122,7 @@ def update_announcement(
         
         session.add(announcement)
         session.commit()
+        published_announcements_cache.invalidate()
         session.refresh(announcement)
         return announcement
     except HTTPException:
@@ -148,6 +151,7 @@ def delete_announcement(
         announcement.deleted_at = datetime.utcnow()
         session.add(announcement)
         session.commit()
+        published_announcements_cache.invalidate()
         return {"message": "Announcement deleted successfully"}
     except HTTPException:
         raise
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlmodel import Session, select
-from app.api.deps import SessionDep, require_role, CurrentUser
+from app.api.conditional import etag_matches, not_modified, set_validators, weak_etag
+from app.api.deps import AsyncCurrentUser, ReadDatabaseDep, SessionDep, require_role, require_role_async, CurrentUser
 from app.models import User
 from app.services.campaign_service import CampaignService
 from app.models import Campaign, Coupon
@@ -11,50 +12,38 @@ from datetime import datetime
 router = APIRouter(prefix="/admin/campaigns", tags=["admin/campaigns"])
 
 
-@router.get("/", response_model=dict, dependencies=[require_role(["admin", "manager"])])
-def get_all_campaigns(
-    current_user: CurrentUser,
-    session: SessionDep,
+# One async handler; its Database runs the queries on an AsyncSession when
+# DB_ASYNC is set, otherwise in the threadpool
+@router.get("/", response_model=dict, dependencies=[require_role_async(["admin", "manager"])])
+async def get_all_campaigns(
+    request: Request,
+    response: Response,
+    current_user: AsyncCurrentUser,
+    database: ReadDatabaseDep,
+    skip: int = 0,
+    # Every campaign unless the client pages; the dashboard lists them all
+    limit: int | None = None,
     search: str | None = None,
     category: str | None = None  # Adding category filter for campaigns
 ):
-    """Get all campaigns with coupon statistics"""
+    """Get all campaigns with coupon statistics, 304 Not Modified when If-None-Match carries the current ETag"""
     try:
-        from sqlmodel import select
-        
-        # Build query with filters
-        statement = select(Campaign)
-        
-        # Apply search filter if provided (search in title and description)
-        if search:
-            search_filter = f"%{search}%"
-            statement = statement.where(
-                (Campaign.title.ilike(search_filter)) | 
-                (Campaign.description.ilike(search_filter))
+        stamp, last_modified = await database.run(
+            lambda session: CampaignService(session).get_all_campaigns_version(
+                skip=skip, limit=limit, search=search, category=category
             )
-        
-        # Apply category filter if provided
-        # Note: campaigns don't have a direct category field, but we can search in title/description
-        # If campaigns had a category field, we would add it here
-        if category:
-            # For campaigns, we might want to implement a different category approach
-            # For now, just using search in title/description
-            category_filter = f"%{category}%"
-            statement = statement.where(
-                (Campaign.title.ilike(category_filter)) | 
-                (Campaign.description.ilike(category_filter))
+        )
+        etag = weak_etag(stamp)
+        if etag_matches(request, etag):
+            return not_modified(etag, last_modified)
+        set_validators(response, etag, last_modified)
+
+        campaigns, count = await database.run(
+            lambda session: CampaignService(session).get_all_campaigns_with_coupon_counts(
+                skip=skip, limit=limit, search=search, category=category
             )
-        
-        campaigns = session.exec(statement).all()
-        
-        # Get coupon stats for each campaign
-        service = CampaignService(session)
-        campaign_stats = []
-        for campaign in campaigns:
-            campaign_with_stats = service.get_campaign_with_coupon_counts(campaign.id)
-            campaign_stats.append(campaign_with_stats)
-        
-        return {"campaigns": campaign_stats, "count": len(campaign_stats)}
+        )
+        return {"campaigns": campaigns, "count": count}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,45 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from app.api.deps import SessionDep, CurrentUser
+from fastapi import APIRouter, HTTPException, Request, Response
+from app import crud
+from app.api.conditional import etag_matches, not_modified, set_validators, weak_etag
+from app.api.deps import AsyncCurrentUser, DatabaseDep, ReadDatabaseDep, SessionDep, CurrentUser, TokenClaimsDep
+from app.core.replica import primary_pins
 from app.services.coupon_service import CouponService
-from app.models import Coupon, User
+from app.services.identity_service import claims_subject
+from app.models import Coupon
 from app.schemas import CouponPublic, CouponsPublic
 import uuid
 
 router = APIRouter(prefix="/user/coupons", tags=["user/coupons"])
 
 
+# The hot routes run one async handler each; their Database runs the crud calls
+# on an AsyncSession when DB_ASYNC is set, otherwise in the threadpool
 @router.get("/my", response_model=CouponsPublic)
-def get_my_coupons(
-    session: SessionDep,
-    current_user: CurrentUser
+async def get_my_coupons(
+    request: Request,
+    response: Response,
+    database: ReadDatabaseDep,
+    current_user: AsyncCurrentUser
 ):
-    """Get current user's coupons"""
+    """Get current user's coupons, 304 Not Modified when If-None-Match carries the current ETag"""
     try:
-        statement = select(Coupon).where(Coupon.assigned_to_user_id == current_user.id)
-        coupons = session.exec(statement).all()
+        digest, last_modified = await database.run(
+            crud.get_rows_version, statement=crud.user_coupons_version_statement(current_user.id)
+        )
+        etag = weak_etag(digest)
+        if etag_matches(request, etag):
+            return not_modified(etag, last_modified)
+        set_validators(response, etag, last_modified)
+
+        coupons = await database.run(crud.get_user_coupons, user_id=current_user.id)
         return CouponsPublic(data=coupons, count=len(coupons))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/campaign/{campaign_id}", response_model=dict)
-def get_my_coupon_for_campaign(
+async def get_my_coupon_for_campaign(
     campaign_id: uuid.UUID,
-    session: SessionDep,
-    current_user: CurrentUser
+    database: DatabaseDep,
+    current_user: AsyncCurrentUser
 ):
     """Get the coupon assigned to current user for a specific campaign"""
     try:
-        statement = select(Coupon).where(
-            Coupon.assigned_to_user_id == current_user.id,
-            Coupon.campaign_id == campaign_id
+        coupon = await database.run(
+            crud.get_user_coupon_for_campaign, user_id=current_user.id, campaign_id=campaign_id
         )
-        coupon = session.exec(statement).first()
-        
+    
         if not coupon:
             raise HTTPException(status_code=404, detail="No coupon assigned to you for this campaign")
-        
+    
         return {"coupon": coupon}
     except HTTPException:
         raise
@@ -47,16 +59,41 @@ def get_my_coupon_for_campaign(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/claim/{campaign_id}", response_model=dict)
+async def claim_coupon(
+    campaign_id: uuid.UUID,
+    database: DatabaseDep,
+    current_user: AsyncCurrentUser,
+    user_info: TokenClaimsDep
+):
+    """Claim the next free coupon of a campaign, or the one already claimed"""
+    try:
+        coupon = await database.run(
+            lambda session: CouponService(session).claim_next_coupon(campaign_id, current_user)
+        )
+        # Read from the primary for a moment so the user sees the claim
+        primary_pins.pin(claims_subject(user_info))
+        return {"coupon": coupon}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/redeem/{coupon_id}", response_model=dict)
-def redeem_coupon(
+async def redeem_coupon(
     coupon_id: uuid.UUID,
-    session: SessionDep,
-    current_user: CurrentUser
+    database: DatabaseDep,
+    current_user: AsyncCurrentUser,
+    user_info: TokenClaimsDep
 ):
     """Redeem a coupon"""
     try:
-        service = CouponService(session)
-        coupon = service.redeem_coupon(coupon_id, current_user)
+        coupon = await database.run(
+            lambda session: CouponService(session).redeem_coupon(coupon_id, current_user)
+        )
+        # Read from the primary for a moment so the user sees the redeem
+        primary_pins.pin(claims_subject(user_info))
         return {"coupon": coupon, "message": "Coupon redeemed successfully"}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -1,2 +1,4 @@
 from .coupon_service import CouponService
-from .campaign_service import CampaignService
\ No newline at end of file
+from .campaign_service import CampaignService
+from .identity_service import IdentityService
+from .coupon_import_service import CouponImportService
\ No newline at end of file
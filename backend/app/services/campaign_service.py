@@ -1,14 +1,15 @@
-from typing import List, Dict
-from sqlmodel import Session, select
-from app.models import Campaign, Coupon
+from sqlmodel import Session
+from app import crud
+from app.models import Campaign
 import uuid
+from datetime import datetime
 
 
 class CampaignService:
     def __init__(self, session: Session):
         self.session = session
 
-    def get_campaign_with_coupon_counts(self, campaign_id: uuid.UUID) -> Dict:
+    def get_campaign_with_coupon_counts(self, campaign_id: uuid.UUID) -> dict:
         """
         Get campaign with coupon statistics
         
@@ -23,14 +24,59 @@ class CampaignService:
         if not campaign:
             raise ValueError("Campaign not found")
         
-        # Get coupon stats
-        statement = select(Coupon).where(Coupon.campaign_id == campaign_id)
-        all_coupons = self.session.exec(statement).all()
-        
-        total = len(all_coupons)
-        assigned = sum(1 for coupon in all_coupons if coupon.assigned_to_user_id is not None)
-        redeemed = sum(1 for coupon in all_coupons if coupon.redeemed)
-        
+        stats = crud.get_campaign_coupon_stats(session=self.session, campaign_id=campaign_id)
+
+        return self._campaign_with_stats(campaign, stats)
+
+    def get_all_campaigns_with_coupon_counts(
+        self, skip: int = 0, limit: int | None = None, search: str | None = None, category: str | None = None
+    ) -> tuple[list[dict], int]:
+        """
+        Get a page of campaigns with coupon statistics
+
+        Campaigns and their coupon counts come from a single grouped query.
+
+        Args:
+            skip: Number of campaigns to skip
+            limit: Maximum number of campaigns to return, all of them when None
+            search: Only campaigns whose title or description contains this text
+            category: Same matching as search, campaigns have no category field
+
+        Returns:
+            The campaigns with their coupon counts, and the total number of matching campaigns
+        """
+        campaigns, count = crud.get_campaigns_with_coupon_stats(
+            session=self.session, skip=skip, limit=limit, search=search, category=category
+        )
+        return [self._campaign_with_stats(campaign, stats) for campaign, stats in campaigns], count
+
+    def get_all_campaigns_version(
+        self, skip: int = 0, limit: int | None = None, search: str | None = None, category: str | None = None
+    ) -> tuple[str, datetime | None]:
+        """
+        Version stamp of a page of get_all_campaigns_with_coupon_counts, without loading it
+
+        Args:
+            skip: Number of campaigns to skip
+            limit: Maximum number of campaigns to return, all of them when None
+            search: Only campaigns whose title or description contains this text
+            category: Same matching as search, campaigns have no category field
+
+        Returns:
+            A stamp that changes with any campaign or coupon counter of the page and
+            with the total count, and when the page was last modified
+        """
+        digest, last_modified, count = self.session.exec(
+            crud.campaigns_with_coupon_stats_version_statement(
+                *crud.campaigns_with_coupon_stats_statements(
+                    skip=skip, limit=limit, search=search, category=category
+                )
+            )
+        ).one()
+        return f"{digest}-{count}", last_modified
+
+    @staticmethod
+    def _campaign_with_stats(campaign: Campaign, stats: dict) -> dict:
         return {
             "id": campaign.id,
             "title": campaign.title,
@@ -39,46 +85,5 @@ class CampaignService:
             "end_date": campaign.end_date,
             "active": campaign.active,
             "created_at": campaign.created_at,
-            "stats": {
-                "total": total,
-                "assigned": assigned,
-                "redeemed": redeemed
-            }
+            "stats": stats
         }
-
-    def get_all_campaigns_with_coupon_counts(self) -> List[Dict]:
-        """
-        Get all campaigns with coupon statistics
-        
-        Returns:
-            List of dictionaries with campaign data and coupon counts
-        """
-        # Get all campaigns
-        campaigns = self.session.exec(select(Campaign)).all()
-        
-        result = []
-        for campaign in campaigns:
-            # Get coupon stats for each campaign
-            statement = select(Coupon).where(Coupon.campaign_id == campaign.id)
-            all_coupons = self.session.exec(statement).all()
-            
-            total = len(all_coupons)
-            assigned = sum(1 for coupon in all_coupons if coupon.assigned_to_user_id is not None)
-            redeemed = sum(1 for coupon in all_coupons if coupon.redeemed)
-            
-            result.append({
-                "id": campaign.id,
-                "title": campaign.title,
-                "description": campaign.description,
-                "start_date": campaign.start_date,
-                "end_date": campaign.end_date,
-                "active": campaign.active,
-                "created_at": campaign.created_at,
-                "stats": {
-                    "total": total,
-                    "assigned": assigned,
-                    "redeemed": redeemed
-                }
-            })
-        
-        return result
\ No newline at end of file
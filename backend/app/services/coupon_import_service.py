@@ -0,0 +1,261 @@
+import uuid
+from collections.abc import Callable, Iterator
+from typing import IO, Any
+
+import pandas as pd
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col, select
+
+from app import crud
+from app.core.config import settings
+from app.models import Campaign, Coupon, User
+
+REQUIRED_COLUMNS = {"code", "discount_type", "discount_value"}
+VALID_DISCOUNT_TYPES = {"fixed", "percentage"}
+SUPPORTED_EXTENSIONS = (".csv", ".xlsx", ".xls")
+
+# Tried in order on the values ISO 8601 parsing couldn't handle
+DATE_FORMATS = [
+    '%Y.%m.%d %H:%M:%S',  # 2027.01.01 00:00:54
+    '%d/%m/%Y %H:%M:%S',  # 01/01/2027 00:00:54
+    '%d-%m-%Y %H:%M:%S',  # 01-01-2027 00:00:54
+    '%Y/%m/%d %H:%M:%S',  # 2027/01/01 00:00:54
+    '%m/%d/%Y %H:%M',     # 01/01/2027 00:00
+    '%d.%m.%Y %H:%M:%S',  # 01.01.2027 00:00:54
+]
+
+
+class CouponImportError(ValueError):
+    """The file as a whole can't be imported (unsupported type, missing columns, ...)"""
+
+
+def parse_expires_at(values: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """
+    Parse an `expires_at` column in bulk
+
+    Returns:
+        The parsed timestamps (NaT where empty) and a mask of the values that
+        were present but could not be parsed
+    """
+    text = values.astype("string").str.strip()
+    present = values.notna() & text.ne("") & text.str.lower().ne("null")
+
+    parsed = pd.to_datetime(text.where(present), format="ISO8601", errors="coerce")
+    for fmt in DATE_FORMATS:
+        pending = present & parsed.isna()
+        if not pending.any():
+            break
+        parsed = parsed.fillna(pd.to_datetime(text.where(pending), format=fmt, errors="coerce"))
+
+    pending = present & parsed.isna()
+    if pending.any():
+        # Last resort, per-value format inference for whatever is left
+        parsed = parsed.fillna(pd.to_datetime(text.where(pending), format="mixed", errors="coerce"))
+
+    return parsed, present & parsed.isna()
+
+
+def _parse_uuid(value: object) -> uuid.UUID | None:
+    try:
+        return uuid.UUID(str(value).strip())
+    except ValueError:
+        return None
+
+
+class CouponImportService:
+    def __init__(self, session: Session, chunk_size: int | None = None, max_reported_errors: int | None = None):
+        self.session = session
+        self.chunk_size = chunk_size or settings.COUPON_IMPORT_CHUNK_SIZE
+        self.max_reported_errors = (
+            settings.COUPON_IMPORT_MAX_REPORTED_ERRORS if max_reported_errors is None else max_reported_errors
+        )
+
+    def import_file(
+        self,
+        campaign_id: uuid.UUID,
+        file: IO[bytes],
+        filename: str,
+        on_progress: Callable[[dict[str, Any]], None] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Import coupons from a CSV or Excel file
+
+        The file is read in chunks of `chunk_size` rows; each chunk is validated
+        in bulk, written with a single multi-row INSERT and committed, so memory
+        use does not grow with the file. Invalid rows and codes that already
+        exist are skipped and reported instead of failing the upload.
+
+        Coupon ids are derived from the code and an id of the import, so a code
+        whose insert conflicts with a row carrying that same id was inserted by
+        an earlier row of this file: it is reported as a duplicate in the file
+        rather than as already existing, without keeping the file's codes.
+
+        Args:
+            campaign_id: ID of the campaign the coupons belong to
+            file: Binary file object positioned at the start of the upload
+            filename: Original file name, used to pick the reader
+            on_progress: Called with the running totals after every chunk
+
+        Returns:
+            Dictionary with processed, inserted and failed row counts and the
+            first `max_reported_errors` row errors
+        """
+        campaign = self.session.get(Campaign, campaign_id)
+        if not campaign:
+            raise ValueError("Campaign not found")
+
+        result: dict[str, Any] = {"processed": 0, "inserted": 0, "failed": 0, "errors": []}
+        import_id = uuid.uuid4()
+        for chunk in self.iter_chunks(file, filename):
+            self._import_chunk(campaign_id, chunk, result, import_id)
+            if on_progress:
+                on_progress(result)
+        return result
+
+    def iter_chunks(self, file: IO[bytes], filename: str) -> Iterator[pd.DataFrame]:
+        """Yield the rows of the upload as DataFrames, indexed by spreadsheet row number"""
+        name = filename.lower()
+        if name.endswith(".csv"):
+            chunks = pd.read_csv(
+                file, chunksize=self.chunk_size, dtype=str, keep_default_na=False, skip_blank_lines=False
+            )
+        elif name.endswith(".xlsx"):
+            chunks = self._iter_xlsx(file)
+        elif name.endswith(".xls"):
+            # The legacy binary format has no streaming reader
+            frame = pd.read_excel(file)
+            chunks = (frame.iloc[i:i + self.chunk_size] for i in range(0, len(frame), self.chunk_size))
+        else:
+            raise CouponImportError(
+                f"File must be a CSV or Excel file ({', '.join(SUPPORTED_EXTENSIONS)})"
+            )
+
+        first_row = 2  # Row 1 is the header
+        checked_columns = False
+        for chunk in chunks:
+            if not checked_columns:
+                missing = REQUIRED_COLUMNS - set(chunk.columns)
+                if missing:
+                    raise CouponImportError(f"Missing required columns: {', '.join(sorted(missing))}")
+                checked_columns = True
+            chunk.index = pd.RangeIndex(first_row, first_row + len(chunk))
+            first_row += len(chunk)
+            # Dropped only once numbered, so the rows after a blank one keep their row number
+            blank = chunk.replace(r"^\s*$", None, regex=True).isna().all(axis=1)
+            if not blank.all():
+                yield chunk[~blank]
+
+    def _iter_xlsx(self, file: IO[bytes]) -> Iterator[pd.DataFrame]:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(name).strip() if name is not None else "" for name in header]
+            batch: list[tuple[Any, ...]] = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= self.chunk_size:
+                    yield pd.DataFrame(batch, columns=columns)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=columns)
+        finally:
+            workbook.close()
+
+    def _import_chunk(
+        self, campaign_id: uuid.UUID, chunk: pd.DataFrame, result: dict[str, Any], import_id: uuid.UUID
+    ) -> None:
+        errors = pd.Series(pd.NA, index=chunk.index, dtype="object")
+
+        def flag(mask: pd.Series, message: str) -> None:
+            # Keep the first error reported for each row
+            errors.mask(mask & errors.isna(), message, inplace=True)
+
+        codes = chunk["code"].astype("string").str.strip().fillna("")
+        flag(codes.eq(""), "Empty coupon code")
+        flag(codes.str.len().gt(50), "Coupon code longer than 50 characters")
+        flag(codes.ne("") & codes.duplicated(), "Duplicate coupon code in file")
+
+        discount_types = chunk["discount_type"].astype("string").str.strip()
+        flag(~discount_types.isin(VALID_DISCOUNT_TYPES).fillna(False), "Invalid discount_type, must be 'fixed' or 'percentage'")
+
+        discount_values = pd.to_numeric(chunk["discount_value"], errors="coerce")
+        flag(discount_values.isna(), "Invalid discount_value")
+
+        if "expires_at" in chunk.columns:
+            expires_at, invalid_dates = parse_expires_at(chunk["expires_at"])
+            flag(invalid_dates, "Invalid date format for expires_at, expected YYYY-MM-DD HH:MM:SS or similar")
+        else:
+            expires_at = pd.Series(pd.NaT, index=chunk.index)
+
+        user_ids = pd.Series(None, index=chunk.index, dtype="object")
+        if "user_id" in chunk.columns:
+            raw_user_ids = chunk["user_id"].astype("string").str.strip()
+            has_user = raw_user_ids.notna() & raw_user_ids.ne("")
+            user_ids = raw_user_ids.where(has_user).map(_parse_uuid, na_action="ignore")
+            flag(has_user & user_ids.isna(), "Invalid user_id")
+            known = self._existing_user_ids(set(user_ids.dropna()))
+            flag(user_ids.notna() & ~user_ids.isin(known), "Unknown user_id")
+
+        valid = errors.isna()
+        rows = [
+            {
+                "id": uuid.uuid5(import_id, code),
+                "code": code,
+                "campaign_id": campaign_id,
+                "discount_type": discount_type,
+                "discount_value": float(discount_value),
+                "redeemed": False,
+                "expires_at": None if pd.isna(expires) else expires.to_pydatetime(),
+                "assigned_to_user_id": None if pd.isna(user_id) else user_id,
+            }
+            for code, discount_type, discount_value, expires, user_id in zip(
+                codes[valid], discount_types[valid], discount_values[valid],
+                expires_at[valid], user_ids[valid], strict=True,
+            )
+        ]
+
+        inserted: set[str] = set()
+        if rows:
+            statement = (
+                insert(Coupon)
+                .values(rows)
+                .on_conflict_do_nothing(index_elements=["code"])
+                .returning(col(Coupon.code), col(Coupon.assigned_to_user_id))
+            )
+            returned = self.session.execute(statement).all()
+            inserted = {code for code, _ in returned}
+            crud.adjust_campaign_coupon_stats(
+                session=self.session,
+                campaign_id=campaign_id,
+                total=len(returned),
+                assigned=sum(1 for _, user_id in returned if user_id is not None),
+            )
+            self.session.commit()
+            conflicts = valid & ~codes.isin(inserted)
+            repeated = self._codes_of_ids({uuid.uuid5(import_id, code) for code in codes[conflicts]})
+            flag(conflicts & codes.isin(repeated), "Duplicate coupon code in file")
+            flag(conflicts, "Coupon code already exists")
+
+        failed = errors.dropna()
+        result["processed"] += len(chunk)
+        result["inserted"] += len(inserted)
+        result["failed"] += len(failed)
+        room = self.max_reported_errors - len(result["errors"])
+        for row, message in failed.iloc[:max(room, 0)].items():
+            result["errors"].append({"row": int(row), "code": codes[row], "error": message})
+
+    def _codes_of_ids(self, ids: set[uuid.UUID]) -> set[str]:
+        if not ids:
+            return set()
+        return set(self.session.exec(select(Coupon.code).where(col(Coupon.id).in_(ids))).all())
+
+    def _existing_user_ids(self, user_ids: set[uuid.UUID]) -> set[uuid.UUID]:
+        if not user_ids:
+            return set()
+        statement = select(User.id).where(col(User.id).in_(user_ids))
+        return set(self.session.exec(statement).all())
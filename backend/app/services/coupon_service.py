@@ -1,201 +1,425 @@
-from typing import List, Dict
-from sqlmodel import Session, select
-from app.models import Coupon, Campaign, User
-from app.schemas import CouponCreate, CouponUpdate
+import secrets
 import uuid
+from collections.abc import Iterator
 from datetime import datetime
+from typing import Literal
+
+from sqlalchemy import BigInteger, FromClause, Uuid, column, delete, table, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, func, or_, select
+
+from app import crud
+from app.core.config import settings
+from app.core.metrics import COUPON_REDEMPTIONS
+from app.models import Campaign, Coupon, User
+
+# Collisions on the random part of a code are retried this many times per chunk
+MAX_CODE_GENERATION_ATTEMPTS = 5
+
+AssignmentMode = Literal["round_robin", "one_per_user"]
+ASSIGNMENT_MODES = ("round_robin", "one_per_user")
+
+# Users eligible for a bulk assignment, numbered from 0; lives for one transaction
+_eligible_users = table(
+    "bulk_assignment_user",
+    column("rn", BigInteger),
+    column("user_id", Uuid),
+)
 
 
 class CouponService:
     def __init__(self, session: Session):
         self.session = session
 
-    def generate_coupons(self, campaign_id: uuid.UUID, count: int) -> List[Coupon]:
+    def generate_coupons(self, campaign_id: uuid.UUID, count: int, chunk_size: int | None = None) -> list[str]:
         """
         Generate coupons for a campaign
-        
+
         Args:
             campaign_id: ID of the campaign
             count: Number of coupons to generate
-            
+            chunk_size: Rows per INSERT statement (defaults to COUPON_GENERATION_CHUNK_SIZE)
+
         Returns:
-            List of generated coupons
+            Codes of the generated coupons
+        """
+        codes: list[str] = []
+        for chunk in self.iter_generate_coupons(campaign_id, count, chunk_size):
+            codes.extend(chunk)
+        return codes
+
+    def iter_generate_coupons(
+        self, campaign_id: uuid.UUID, count: int, chunk_size: int | None = None
+    ) -> Iterator[list[str]]:
+        """
+        Generate coupons for a campaign in chunks, yielding the codes of each chunk
+
+        Every chunk is written with one multi-row INSERT and committed on its own,
+        so generating a large batch never holds a long transaction. Codes that
+        collide with existing ones are skipped by ON CONFLICT and regenerated.
+
+        Args:
+            campaign_id: ID of the campaign
+            count: Number of coupons to generate
+            chunk_size: Rows per INSERT statement (defaults to COUPON_GENERATION_CHUNK_SIZE)
+
+        Yields:
+            Codes of the coupons inserted by each chunk
         """
         # Verify campaign exists
         campaign = self.session.get(Campaign, campaign_id)
         if not campaign:
             raise ValueError("Campaign not found")
-        
-        # Generate coupons
-        coupons = []
-        for i in range(count):
-            # Generate unique code
-            code = f"{campaign.title[:3].upper()}-{uuid.uuid4().hex[:8].upper()}"
-            
-            # Create coupon using model constructor instead of from_orm
-            coupon = Coupon(
-                code=code,
-                discount_type="percentage",
-                discount_value=10.0,
-                campaign_id=campaign_id
+
+        chunk_size = chunk_size or settings.COUPON_GENERATION_CHUNK_SIZE
+        prefix = campaign.title[:3].upper()
+        remaining = count
+        while remaining > 0:
+            chunk_count = min(chunk_size, remaining)
+            codes = self._insert_generated_coupons(campaign_id, prefix, chunk_count)
+            self.session.commit()
+            remaining -= len(codes)
+            yield codes
+
+    def _insert_generated_coupons(self, campaign_id: uuid.UUID, prefix: str, count: int) -> list[str]:
+        inserted: list[str] = []
+        for _ in range(MAX_CODE_GENERATION_ATTEMPTS):
+            missing = count - len(inserted)
+            if missing == 0:
+                return inserted
+            rows = [
+                {
+                    "id": uuid.uuid4(),
+                    "code": f"{prefix}-{secrets.token_hex(4).upper()}",
+                    "discount_type": "percentage",
+                    "discount_value": 10.0,
+                    "redeemed": False,
+                    "campaign_id": campaign_id,
+                }
+                for _ in range(missing)
+            ]
+            statement = (
+                insert(Coupon)
+                .values(rows)
+                .on_conflict_do_nothing(index_elements=["code"])
+                .returning(Coupon.code)
             )
-            self.session.add(coupon)
-            coupons.append(coupon)
-        
-        self.session.commit()
-        
-        # Refresh objects
-        for coupon in coupons:
-            self.session.refresh(coupon)
-            
-        return coupons
+            inserted.extend(self.session.execute(statement).scalars().all())
+        if len(inserted) < count:
+            self.session.rollback()
+            raise RuntimeError("Could not generate unique coupon codes")
+        crud.adjust_campaign_coupon_stats(session=self.session, campaign_id=campaign_id, total=len(inserted))
+        return inserted
 
-    def assign_campaign_to_all_users(self, campaign_id: uuid.UUID) -> int:
+    def assign_campaign_to_all_users(
+        self,
+        campaign_id: uuid.UUID,
+        mode: AssignmentMode = "round_robin",
+        batch_size: int | None = None,
+    ) -> int:
         """
         Assign campaign coupons to all users
-        
+
+        Users who already hold a coupon of the campaign are skipped. The
+        remaining users are numbered once, then unassigned coupons are taken
+        in batches of `batch_size` by id and paired with them by row_number()
+        in a single UPDATE ... FROM per batch, so neither users nor coupons are
+        loaded into Python.
+
+        In round_robin mode a batch continues the numbering after the highest
+        number the previous batch used. In one_per_user mode each batch pairs
+        its coupons with the first users still without a coupon of the
+        campaign, checked in the UPDATE itself, and served users are removed
+        from the numbering, so a coupon skipped because it was assigned
+        meanwhile can't shift a user into a second coupon.
+
         Args:
             campaign_id: ID of the campaign
-            
+            mode: "round_robin" hands out every unassigned coupon, cycling through
+                the users; "one_per_user" gives each user at most one coupon
+            batch_size: Coupons per UPDATE (defaults to COUPON_ASSIGNMENT_BATCH_SIZE)
+
         Returns:
             Number of coupons assigned
         """
-        # Get all users
-        users = self.session.exec(select(User)).all()
-        
-        # Get unassigned coupons for campaign
-        statement = select(Coupon).where(
+        if mode not in ASSIGNMENT_MODES:
+            raise ValueError(f"Unknown assignment mode: {mode}")
+        campaign = self.session.get(Campaign, campaign_id)
+        if not campaign:
+            raise ValueError("Campaign not found")
+        batch_size = batch_size or settings.COUPON_ASSIGNMENT_BATCH_SIZE
+
+        # Serialize bulk assignments of the same campaign, and keep claims out while this runs
+        self._lock_campaign(campaign_id)
+
+        self.session.execute(text(
+            f"CREATE TEMPORARY TABLE {_eligible_users.name} "
+            "(rn bigint PRIMARY KEY, user_id uuid NOT NULL) ON COMMIT DROP"
+        ))
+        holds_coupon = select(Coupon.id).where(
             Coupon.campaign_id == campaign_id,
-            Coupon.assigned_to_user_id.is_(None)
-        )
-        coupons = self.session.exec(statement).all()
-        
-        # Assign coupons to users in round-robin fashion
+            Coupon.assigned_to_user_id == User.id,
+        ).exists()
+        numbered_users = select(
+            func.row_number().over(order_by=User.id) - 1,
+            User.id,
+        ).where(~holds_coupon)
+        user_count = self.session.execute(
+            insert(_eligible_users).from_select(["rn", "user_id"], numbered_users)
+        ).rowcount
+
         assigned_count = 0
-        user_index = 0
-        
-        for coupon in coupons:
-            if user_index >= len(users):
-                user_index = 0
-                
-            coupon.assigned_to_user_id = users[user_index].id
-            self.session.add(coupon)
-            assigned_count += 1
-            user_index += 1
-        
+        next_rn = 0
+        last_id = None
+        while user_count:
+            batch_filter = [Coupon.campaign_id == campaign_id, Coupon.assigned_to_user_id.is_(None)]
+            if last_id is not None:
+                batch_filter.append(Coupon.id > last_id)
+            batch = (
+                select(
+                    Coupon.id.label("coupon_id"),
+                    (func.row_number().over(order_by=Coupon.id) - 1).label("rn"),
+                )
+                .where(*batch_filter)
+                .order_by(Coupon.id)
+                .limit(batch_size)
+                .cte("batch")
+            )
+            users: FromClause
+            if mode == "round_robin":
+                users = _eligible_users
+                paired = users.c.rn == (batch.c.rn + next_rn) % user_count
+            else:
+                holds_campaign_coupon = select(Coupon.id).where(
+                    Coupon.campaign_id == campaign_id,
+                    Coupon.assigned_to_user_id == _eligible_users.c.user_id,
+                ).exists()
+                users = (
+                    select(
+                        _eligible_users.c.user_id,
+                        (func.row_number().over(order_by=_eligible_users.c.rn) - 1).label("rn"),
+                    )
+                    .where(~holds_campaign_coupon)
+                    .order_by(_eligible_users.c.rn)
+                    .limit(batch_size)
+                    .subquery("users")
+                )
+                paired = users.c.rn == batch.c.rn
+            statement = (
+                update(Coupon)
+                .where(
+                    Coupon.id == batch.c.coupon_id,
+                    paired,
+                    # Re-checked on the locked row, in case it was assigned meanwhile
+                    Coupon.assigned_to_user_id.is_(None),
+                )
+                .values(assigned_to_user_id=users.c.user_id)
+                .returning(Coupon.id, batch.c.rn, Coupon.assigned_to_user_id)
+            )
+            assigned = self.session.execute(statement).all()
+            if not assigned:
+                break
+            assigned_count += len(assigned)
+            last_id = max(coupon_id for coupon_id, _, _ in assigned)
+            if mode == "round_robin":
+                # Carry on after the highest number used, not after the count assigned
+                next_rn += max(rn for _, rn, _ in assigned) + 1
+            else:
+                self.session.execute(
+                    delete(_eligible_users).where(
+                        _eligible_users.c.user_id.in_([user_id for _, _, user_id in assigned])
+                    )
+                )
+                if assigned_count >= user_count:
+                    break
+
+        crud.adjust_campaign_coupon_stats(session=self.session, campaign_id=campaign_id, assigned=assigned_count)
         self.session.commit()
         return assigned_count
 
     def assign_coupon_to_user(self, coupon_id: uuid.UUID, user_id: uuid.UUID) -> Coupon:
         """
         Assign specific coupon to specific user
-        
+
+        The coupon is assigned with one conditional UPDATE, so two concurrent
+        assignments of the same coupon cannot both succeed.
+
         Args:
             coupon_id: ID of the coupon
             user_id: ID of the user
-            
+
         Returns:
             Updated coupon
         """
-        # Get coupon
-        coupon = self.session.get(Coupon, coupon_id)
-        if not coupon:
-            raise ValueError("Coupon not found")
-            
-        # Check if coupon is already assigned
-        if coupon.assigned_to_user_id is not None:
-            raise ValueError("Coupon is already assigned")
-            
-        # Check if coupon is redeemed
-        if coupon.redeemed:
-            raise ValueError("Cannot assign redeemed coupon")
-            
         # Get user
         user = self.session.get(User, user_id)
         if not user:
             raise ValueError("User not found")
-            
-        # Assign coupon to user
-        coupon.assigned_to_user_id = user_id
-        self.session.add(coupon)
-        self.session.commit()
-        self.session.refresh(coupon)
-        
-        return coupon
+
+        coupon = self._update_returning(
+            update(Coupon)
+            .where(
+                Coupon.id == coupon_id,
+                Coupon.assigned_to_user_id.is_(None),
+                Coupon.redeemed.is_(False),
+            )
+            .values(assigned_to_user_id=user_id)
+        )
+        if coupon is None:
+            # Nothing matched, find out why
+            coupon = self.session.get(Coupon, coupon_id)
+            if not coupon:
+                raise ValueError("Coupon not found")
+            if coupon.assigned_to_user_id is not None:
+                raise ValueError("Coupon is already assigned")
+            raise ValueError("Cannot assign redeemed coupon")
+
+        if coupon.campaign_id:
+            crud.adjust_campaign_coupon_stats(session=self.session, campaign_id=coupon.campaign_id, assigned=1)
+        return self._commit_detached(coupon)
+
+    def claim_next_coupon(self, campaign_id: uuid.UUID, current_user: User) -> Coupon:
+        """
+        Assign the next free coupon of a campaign to the current user
+
+        Free coupons are picked with FOR UPDATE SKIP LOCKED, so concurrent claims
+        take different coupons instead of queueing on the same row. A user who
+        already holds a coupon of the campaign gets that coupon back.
+
+        Args:
+            campaign_id: ID of the campaign
+            current_user: Current user
+
+        Returns:
+            The claimed coupon
+        """
+        campaign = self.session.get(Campaign, campaign_id)
+        if not campaign or not campaign.active:
+            raise ValueError("Campaign not found")
+
+        # Wait for a bulk assignment of the campaign, then serialize claims of
+        # the same user on the same campaign
+        self._lock_campaign(campaign_id, shared=True)
+        self.session.execute(
+            select(func.pg_advisory_xact_lock(func.hashtext(f"{campaign_id}:{current_user.id}")))
+        )
+        held = self.session.exec(
+            select(Coupon).where(
+                Coupon.campaign_id == campaign_id,
+                Coupon.assigned_to_user_id == current_user.id,
+            )
+        ).first()
+        if held:
+            self.session.commit()
+            return held
+
+        next_free = (
+            select(Coupon.id)
+            .where(
+                Coupon.campaign_id == campaign_id,
+                Coupon.assigned_to_user_id.is_(None),
+                Coupon.redeemed.is_(False),
+                or_(Coupon.expires_at.is_(None), Coupon.expires_at > func.now()),
+            )
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        coupon = self._update_returning(
+            update(Coupon)
+            .where(Coupon.id == next_free)
+            .values(assigned_to_user_id=current_user.id)
+        )
+        if coupon is None:
+            self.session.rollback()
+            raise ValueError("No coupons left for this campaign")
+
+        crud.adjust_campaign_coupon_stats(session=self.session, campaign_id=campaign_id, assigned=1)
+        return self._commit_detached(coupon)
 
     def redeem_coupon(self, coupon_id: uuid.UUID, current_user: User) -> Coupon:
         """
         Redeem a coupon
-        
+
+        A single UPDATE ... WHERE NOT redeemed RETURNING marks the coupon, so a
+        coupon redeemed by concurrent requests is redeemed exactly once.
+
         Args:
             coupon_id: ID of the coupon
             current_user: Current user
-            
+
         Returns:
             Redeemed coupon
         """
-        # Get coupon
-        coupon = self.session.get(Coupon, coupon_id)
-        if not coupon:
-            raise ValueError("Coupon not found")
-            
-        # Check ownership
-        if coupon.assigned_to_user_id != current_user.id:
-            raise ValueError("Not authorized to redeem this coupon")
-            
-        # Check if already redeemed
-        if coupon.redeemed:
+        coupon = self._update_returning(
+            update(Coupon)
+            .where(
+                Coupon.id == coupon_id,
+                Coupon.assigned_to_user_id == current_user.id,
+                Coupon.redeemed.is_(False),
+            )
+            .values(redeemed=True, redeemed_at=datetime.utcnow())
+        )
+        if coupon is None:
+            # Nothing matched, find out why
+            coupon = self.session.get(Coupon, coupon_id)
+            if not coupon:
+                COUPON_REDEMPTIONS.inc(result="not_found")
+                raise ValueError("Coupon not found")
+            if coupon.assigned_to_user_id != current_user.id:
+                COUPON_REDEMPTIONS.inc(result="forbidden")
+                raise ValueError("Not authorized to redeem this coupon")
+            COUPON_REDEMPTIONS.inc(result="already_redeemed")
             raise ValueError("Coupon already redeemed")
-            
-        # Redeem coupon
-        coupon.redeemed = True
-        coupon.redeemed_at = datetime.utcnow()
-        self.session.add(coupon)
+
+        if coupon.campaign_id:
+            crud.adjust_campaign_coupon_stats(session=self.session, campaign_id=coupon.campaign_id, redeemed=1)
+        coupon = self._commit_detached(coupon)
+        COUPON_REDEMPTIONS.inc(result="redeemed")
+        return coupon
+
+    def _lock_campaign(self, campaign_id: uuid.UUID, shared: bool = False) -> None:
+        # Transaction-level advisory lock on the campaign; claims share it, bulk assignments don't
+        lock = func.pg_advisory_xact_lock_shared if shared else func.pg_advisory_xact_lock
+        self.session.execute(select(lock(func.hashtext(str(campaign_id)))))
+
+    def _update_returning(self, statement) -> Coupon | None:
+        # populate_existing refreshes a copy of the coupon already in the session
+        return self.session.execute(
+            statement.returning(Coupon).execution_options(populate_existing=True)
+        ).scalar_one_or_none()
+
+    def _commit_detached(self, coupon: Coupon) -> Coupon:
+        # The RETURNING row is current, so keep it out of the expire-on-commit
+        # instead of paying for a refresh SELECT
+        self.session.expunge(coupon)
         self.session.commit()
-        self.session.refresh(coupon)
-        
         return coupon
 
-    def get_campaign_coupon_stats(self, campaign_id: uuid.UUID) -> Dict:
+    def get_campaign_coupon_stats(self, campaign_id: uuid.UUID) -> dict:
         """
         Get campaign coupon statistics
-        
+
         Args:
             campaign_id: ID of the campaign
-            
+
         Returns:
-            Dictionary with stats: total, assigned, redeemed
+            Dictionary with stats: total, assigned, unassigned, redeemed
         """
         # Verify campaign exists
         campaign = self.session.get(Campaign, campaign_id)
         if not campaign:
             raise ValueError("Campaign not found")
-        
-        # Get all coupons for campaign
-        statement = select(Coupon).where(Coupon.campaign_id == campaign_id)
-        all_coupons = self.session.exec(statement).all()
-        
-        total = len(all_coupons)
-        
-        # Count assigned coupons
-        assigned = sum(1 for coupon in all_coupons if coupon.assigned_to_user_id is not None)
-        
-        # Count redeemed coupons
-        redeemed = sum(1 for coupon in all_coupons if coupon.redeemed)
-        
-        return {
-            "total": total,
-            "assigned": assigned,
-            "redeemed": redeemed
-        }
-
-    def get_unassigned_coupons(self, campaign_id: uuid.UUID) -> List[Coupon]:
+
+        return crud.get_campaign_coupon_stats(session=self.session, campaign_id=campaign_id)
+
+    def get_unassigned_coupons(self, campaign_id: uuid.UUID) -> list[Coupon]:
         """
         Get unassigned coupons for a campaign
-        
+
         Args:
             campaign_id: ID of the campaign
-            
+
         Returns:
             List of unassigned coupons
         """
@@ -203,10 +427,5 @@ class CouponService:
         campaign = self.session.get(Campaign, campaign_id)
         if not campaign:
             raise ValueError("Campaign not found")
-        
-        # Get unassigned coupons
-        statement = select(Coupon).where(
-            Coupon.campaign_id == campaign_id,
-            Coupon.assigned_to_user_id.is_(None)
-        )
-        return self.session.exec(statement).all()
\ No newline at end of file
+
+        return crud.get_unassigned_coupons(session=self.session, campaign_id=campaign_id)
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, col, or_, select
+
+from app.core.config import settings
+from app.models import User
+
+
+class IdentityConflictError(ValueError):
+    """The token's email belongs to a user already linked to another Keycloak identity"""
+
+
+class IdentityCache:
+    """
+    In-process mapping of Keycloak subject -> (user id, claims fingerprint).
+
+    Entries expire after `ttl` seconds so changes made directly in the database
+    (deactivation, manual edits) are picked up eventually.
+    """
+
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: dict[str, tuple[uuid.UUID, str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, subject: str) -> tuple[uuid.UUID, str] | None:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None:
+                return None
+            user_id, fingerprint, expires_at = entry
+            if self._clock() >= expires_at:
+                del self._entries[subject]
+                return None
+            return user_id, fingerprint
+
+    def set(self, subject: str, user_id: uuid.UUID, fingerprint: str) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[subject] = (user_id, fingerprint, self._clock() + self.ttl)
+
+    def invalidate(self, subject: str) -> None:
+        with self._lock:
+            self._entries.pop(subject, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+identity_cache = IdentityCache(ttl=settings.IDENTITY_CACHE_TTL_SECONDS)
+
+
+def claims_fingerprint(user_info: dict[str, Any]) -> str:
+    """Hash of the token claims that are mirrored onto the user row"""
+    synced = {
+        "user_id": user_info.get("user_id"),
+        "email": user_info.get("email"),
+        "full_name": user_info.get("full_name"),
+        "is_superuser": "admin" in user_info.get("roles", []),
+    }
+    return hashlib.sha256(json.dumps(synced, sort_keys=True).encode()).hexdigest()
+
+
+def claims_subject(user_info: dict[str, Any]) -> str | None:
+    """Key of a Keycloak identity: its subject, or the email for tokens without one"""
+    return user_info.get("user_id") or user_info.get("email")
+
+
+class IdentityService:
+    def __init__(self, session: Session, cache: IdentityCache = identity_cache):
+        self.session = session
+        self.cache = cache
+
+    def sync_user(self, user_info: dict[str, Any]) -> User:
+        """
+        Return the local user for the given token claims, creating or updating it
+
+        The database is only written when the claims differ from what was last
+        synced for this subject; otherwise this is a single primary key lookup.
+
+        Args:
+            user_info: User info extracted from the token (see security.get_user_info_from_token)
+
+        Returns:
+            The local user
+
+        Raises:
+            IdentityConflictError: The email is taken by a user of another Keycloak identity
+        """
+        subject = claims_subject(user_info)
+        fingerprint = claims_fingerprint(user_info)
+
+        if subject:
+            cached = self.cache.get(subject)
+            if cached is not None and cached[1] == fingerprint:
+                user = self.session.get(User, cached[0])
+                if user is not None:
+                    return user
+                self.cache.invalidate(subject)
+
+        user_id = self._upsert(user_info)
+        if subject:
+            self.cache.set(subject, user_id, fingerprint)
+        return self.session.get_one(User, user_id)
+
+    def _upsert(self, user_info: dict[str, Any]) -> uuid.UUID:
+        keycloak_user_id = user_info.get("user_id")
+        email = user_info.get("email")
+        full_name = user_info.get("full_name")
+        values = {
+            "id": uuid.uuid4(),
+            "email": email or f"unknown_{keycloak_user_id}@example.com",  # Use a fallback if no email
+            "full_name": full_name or f"User {keycloak_user_id}",  # Use a fallback if no name
+            "keycloak_user_id": keycloak_user_id,
+            "is_active": True,
+            "is_superuser": "admin" in user_info.get("roles", []),  # Set superuser based on Keycloak roles
+        }
+
+        # Only overwrite what the token actually carries
+        synced_columns = ["is_superuser"]
+        if keycloak_user_id:
+            synced_columns.append("keycloak_user_id")
+        if email:
+            synced_columns.append("email")
+        if full_name:
+            synced_columns.append("full_name")
+
+        if keycloak_user_id:
+            try:
+                with self.session.begin_nested():
+                    user_id = self._execute_upsert(values, synced_columns, conflict_column="keycloak_user_id")
+            except IntegrityError:
+                # A user created before Keycloak was wired in: same email, no Keycloak ID yet
+                user_id = self._link_by_email(values, synced_columns)
+        else:
+            user_id = self._execute_upsert(values, synced_columns, conflict_column="email")
+
+        self.session.commit()
+        return user_id
+
+    def _execute_upsert(self, values: dict[str, Any], synced_columns: list[str], conflict_column: str) -> uuid.UUID:
+        insert_statement = insert(User).values(**values)
+        excluded = insert_statement.excluded
+        statement = insert_statement.on_conflict_do_update(
+            index_elements=[conflict_column],
+            set_={column: excluded[column] for column in synced_columns},
+            # Skip the write entirely when nothing changed
+            where=or_(
+                *(getattr(User, column).is_distinct_from(excluded[column]) for column in synced_columns)
+            ),
+        ).returning(col(User.id))
+
+        user_id = self.session.execute(statement).scalar_one_or_none()
+        if user_id is None:
+            # Row exists and is already up to date, so the conditional update returned nothing
+            user_id = self.session.exec(
+                select(User.id).where(getattr(User, conflict_column) == values[conflict_column])
+            ).one()
+        return user_id
+
+    def _link_by_email(self, values: dict[str, Any], synced_columns: list[str]) -> uuid.UUID:
+        insert_statement = insert(User).values(**values)
+        excluded = insert_statement.excluded
+        statement = insert_statement.on_conflict_do_update(
+            index_elements=["email"],
+            set_={column: excluded[column] for column in synced_columns},
+            # Only a user without a Keycloak ID is linked; one linked to another
+            # subject keeps it, or a new subject could take over the account
+            where=col(User.keycloak_user_id).is_(None),
+        ).returning(col(User.id))
+
+        user_id: uuid.UUID | None = self.session.execute(statement).scalar_one_or_none()
+        if user_id is None:
+            self.session.rollback()
+            raise IdentityConflictError(f"{values['email']} is linked to another identity")
+        return user_id
@@ -0,0 +1,307 @@
+import contextlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import IO, Any
+
+from sqlalchemy import Connection, Engine, Executable
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import Session, col, func, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import Campaign, CouponImportJob, CouponImportJobPublic
+from app.services.coupon_import_service import (
+    SUPPORTED_EXTENSIONS,
+    CouponImportError,
+    CouponImportService,
+)
+
+logger = logging.getLogger(__name__)
+
+# Statuses of jobs that have not finished
+UNFINISHED_STATUSES = ("queued", "running")
+
+
+def _job_lock_key(job_id: uuid.UUID) -> int:
+    return int.from_bytes(job_id.bytes[:8], "big", signed=True)
+
+
+class JobLocks:
+    """
+    PostgreSQL advisory locks on the jobs this process owns
+
+    Every queued or running job is locked on one connection kept open by the
+    process, so the locks vanish with the process however it ends. A job whose
+    lock can be taken by someone else has no live owner.
+
+    When that connection is lost (server restart, pooler recycling it, network
+    failure) its locks go with it: the next call reconnects and takes the locks
+    of the jobs still held again before carrying on.
+    """
+
+    def __init__(self, engine: Engine):
+        self._engine = engine
+        self._connection: Connection | None = None
+        self._held: set[uuid.UUID] = set()
+        self._lock = threading.Lock()
+
+    def acquire(self, job_id: uuid.UUID) -> None:
+        with self._lock:
+            self._execute(select(func.pg_advisory_lock(_job_lock_key(job_id))))
+            self._held.add(job_id)
+
+    def release(self, job_id: uuid.UUID) -> None:
+        with self._lock:
+            self._held.discard(job_id)
+            if self._connection is None:
+                return
+            try:
+                self._connection.execute(select(func.pg_advisory_unlock(_job_lock_key(job_id))))
+            except DBAPIError:
+                # The lock went with the connection
+                self._discard_connection()
+
+    def close(self) -> None:
+        with self._lock:
+            self._discard_connection()
+
+    def _execute(self, statement: Executable) -> None:
+        # Retried once on a fresh connection when the current one is gone
+        for attempt in range(2):
+            if self._connection is None:
+                self._connection = self._connect()
+            try:
+                self._connection.execute(statement)
+                return
+            except DBAPIError:
+                self._discard_connection()
+                if attempt:
+                    raise
+
+    def _connect(self) -> Connection:
+        connection = self._engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        if self._held:
+            logger.warning("Reconnecting the locks of %d coupon import job(s)", len(self._held))
+        for job_id in self._held:
+            taken = connection.execute(select(func.pg_try_advisory_lock(_job_lock_key(job_id)))).scalar()
+            if not taken:
+                logger.warning("Lost the lock of coupon import job %s with its connection", job_id)
+        return connection
+
+    def _discard_connection(self) -> None:
+        if self._connection is not None:
+            with contextlib.suppress(DBAPIError):
+                self._connection.close()
+            self._connection = None
+
+
+class ImportJobService:
+    """
+    Run coupon imports in the background
+
+    Uploads are spooled to disk and imported by a thread pool inside the API
+    process, so the request returns as soon as the file is saved. Job progress is
+    stored in the coupon_import_job table, which lets any worker process answer
+    a status poll, not only the one running the import. Jobs left unfinished
+    by a process that stopped are failed by `fail_orphaned_jobs` at startup.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = lambda: Session(engine),
+        max_workers: int | None = None,
+        spool_dir: str | None = None,
+        lock_engine: Engine = engine,
+    ):
+        self._session_factory = session_factory
+        self._locks = JobLocks(lock_engine)
+        self._max_workers = max_workers or settings.COUPON_IMPORT_WORKERS
+        # Started by the first submit, so the service can be used again after a shutdown
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+        self._spool_dir = spool_dir or settings.COUPON_IMPORT_SPOOL_DIR
+        self._futures: dict[uuid.UUID, Future[None]] = {}
+
+    def submit(
+        self,
+        session: Session,
+        campaign_id: uuid.UUID,
+        upload: IO[bytes],
+        filename: str,
+        created_by_id: uuid.UUID | None = None,
+    ) -> CouponImportJob:
+        """
+        Spool an upload to disk and queue it for import
+
+        Args:
+            session: Request session, used to record the job
+            campaign_id: ID of the campaign the coupons belong to
+            upload: Binary file object with the uploaded file
+            filename: Original file name
+            created_by_id: ID of the user starting the import
+
+        Returns:
+            The queued job
+        """
+        extension = os.path.splitext(filename.lower())[1]
+        if extension not in SUPPORTED_EXTENSIONS:
+            raise CouponImportError(
+                f"File must be a CSV or Excel file ({', '.join(SUPPORTED_EXTENSIONS)})"
+            )
+        if not session.get(Campaign, campaign_id):
+            raise ValueError("Campaign not found")
+
+        if self._spool_dir:
+            os.makedirs(self._spool_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=self._spool_dir, prefix="coupon-import-", suffix=extension, delete=False
+        ) as spooled:
+            shutil.copyfileobj(upload, spooled, length=1024 * 1024)
+            path = spooled.name
+
+        job = CouponImportJob(campaign_id=campaign_id, filename=filename, created_by_id=created_by_id)
+        job_id = job.id
+        # Owned before anyone can see it, so a startup sweep never takes it for an orphan
+        self._locks.acquire(job_id)
+        try:
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+        except Exception:
+            self._locks.release(job_id)
+            os.remove(path)
+            raise
+
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers, thread_name_prefix="coupon-import"
+                )
+            future = self._executor.submit(self._run, job_id, path)
+        self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._futures.pop(job_id, None))
+        return job
+
+    def wait(self, job_id: uuid.UUID, timeout: float | None = None) -> None:
+        """Block until a job submitted by this process has finished"""
+        future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout)
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+        self._locks.close()
+
+    def fail_orphaned_jobs(self) -> int:
+        """
+        Fail the queued and running jobs no live process owns
+
+        Their process stopped (restart, crash, deploy) before finishing them,
+        so they would otherwise stay unfinished forever.
+
+        Returns:
+            Number of jobs marked as failed
+        """
+        failed = 0
+        with self._session_factory() as session:
+            jobs = session.exec(
+                select(CouponImportJob).where(col(CouponImportJob.status).in_(UNFINISHED_STATUSES))
+            ).all()
+            for job in jobs:
+                # Held until the commit below, on the connection of this transaction
+                if not session.exec(select(func.pg_try_advisory_xact_lock(_job_lock_key(job.id)))).one():
+                    session.rollback()
+                    continue
+                # Its owner may have finished it since the jobs were listed
+                session.refresh(job)
+                if job.status not in UNFINISHED_STATUSES:
+                    session.rollback()
+                    continue
+                job.status = "failed"
+                job.error = "Interrupted: the process running the import stopped"
+                job.finished_at = datetime.utcnow()
+                session.add(job)
+                session.commit()
+                failed += 1
+        if failed:
+            logger.warning("Marked %d orphaned coupon import job(s) as failed", failed)
+        return failed
+
+    def _run(self, job_id: uuid.UUID, path: str) -> None:
+        # Runs on an executor thread whose Future nobody reads, so every error
+        # has to be recorded on the job here
+        try:
+            self._import(job_id, path)
+        except Exception as e:
+            logger.exception("Coupon import job %s failed", job_id)
+            self._mark_failed(job_id, e)
+        finally:
+            self._locks.release(job_id)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+    def _import(self, job_id: uuid.UUID, path: str) -> None:
+        with self._session_factory() as session:
+            job = session.get_one(CouponImportJob, job_id)
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+            session.add(job)
+            session.commit()
+
+            def record_progress(report: dict[str, Any]) -> None:
+                self._record(session, job, report)
+
+            with open(path, "rb") as file:
+                report = CouponImportService(session).import_file(
+                    job.campaign_id, file, job.filename, on_progress=record_progress
+                )
+            job.status = "succeeded"
+            self._record(session, job, report)
+
+    def _mark_failed(self, job_id: uuid.UUID, error: Exception) -> None:
+        try:
+            with self._session_factory() as session:
+                job = session.get(CouponImportJob, job_id)
+                if job is None:
+                    return
+                job.status = "failed"
+                job.error = str(error)[:1000]
+                job.finished_at = datetime.utcnow()
+                session.add(job)
+                session.commit()
+        except Exception:
+            logger.exception("Could not record the failure of coupon import job %s", job_id)
+
+    @staticmethod
+    def _record(session: Session, job: CouponImportJob, report: dict[str, Any]) -> None:
+        job.rows_processed = report["processed"]
+        job.rows_inserted = report["inserted"]
+        job.rows_failed = report["failed"]
+        job.errors = list(report["errors"])
+        if job.status == "succeeded":
+            job.finished_at = datetime.utcnow()
+        session.add(job)
+        session.commit()
+
+
+def import_job_public(job: CouponImportJob) -> CouponImportJobPublic:
+    """Public view of a job, including its import throughput"""
+    rows_per_second = None
+    if job.started_at:
+        elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+        if elapsed > 0:
+            rows_per_second = round(job.rows_processed / elapsed, 1)
+    return CouponImportJobPublic.model_validate(job, update={"rows_per_second": rows_per_second})
+
+
+import_job_service = ImportJobService()
@@ -0,0 +1,193 @@
+"""
+Requests per second of the hot read routes with the sync and the async database layer
+
+Starts the API with uvicorn twice, with DB_ASYNC=false and DB_ASYNC=true, on the
+database configured in ../.env and drives /user/coupons/my and
+/announcements/published with concurrent clients. Tokens are signed by a local
+key served from a stub JWKS endpoint, so no Keycloak is needed.
+
+    python -m benchmarks.async_mode --concurrency 64 --duration 15 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any
+
+import httpx
+from sqlmodel import Session, col, func, select
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+from app.core.jwks_stub import RSASigningKey, StubJWKSServer
+from app.models import Announcement, AnnouncementCreate, Campaign, Coupon
+from app.schemas import CampaignCreate, CouponCreate
+from app.services.identity_service import IdentityService
+
+BENCHMARK_USER_ID = "benchmark-user"
+BENCHMARK_CAMPAIGN = "Benchmark campaign"
+
+ROUTES = {
+    "/user/coupons/my": True,  # needs a token
+    "/announcements/published": False,
+}
+
+
+def token_claims() -> dict[str, Any]:
+    return {
+        "sub": BENCHMARK_USER_ID,
+        "email": "benchmark@example.com",
+        "name": "Benchmark User",
+        "realm_access": {"roles": ["user"]},
+    }
+
+
+def seed(coupons: int, announcements: int) -> None:
+    """Give the benchmark user `coupons` coupons and make sure `announcements` are published"""
+    claims = token_claims()
+    with Session(engine) as session:
+        user = IdentityService(session).sync_user(
+            {
+                "user_id": claims["sub"],
+                "email": claims["email"],
+                "full_name": claims["name"],
+                "roles": claims["realm_access"]["roles"],
+            }
+        )
+        campaign = session.exec(select(Campaign).where(Campaign.title == BENCHMARK_CAMPAIGN)).first()
+        if not campaign:
+            now = datetime.utcnow()
+            campaign = crud.create_campaign(
+                session=session,
+                campaign_in=CampaignCreate(
+                    title=BENCHMARK_CAMPAIGN, start_date=now, end_date=now + timedelta(days=365)
+                ),
+            )
+
+        held = session.exec(
+            select(func.count()).select_from(Coupon).where(Coupon.assigned_to_user_id == user.id)
+        ).one()
+        for i in range(held, coupons):
+            crud.create_coupon(
+                session=session,
+                coupon_in=CouponCreate(
+                    code=f"BENCH-{user.id.hex[:8]}-{i}",
+                    campaign_id=campaign.id,
+                    discount_type="fixed",
+                    discount_value=5,
+                    assigned_to_user_id=user.id,
+                ),
+            )
+
+        published = session.exec(
+            select(func.count()).select_from(Announcement).where(col(Announcement.is_published).is_(True))
+        ).one()
+        for i in range(published, announcements):
+            crud.create_announcement(
+                session=session,
+                announcement_in=AnnouncementCreate(
+                    title=f"Benchmark announcement {i}", category="general", is_published=True
+                ),
+            )
+
+
+def start_server(db_async: bool, port: int, workers: int, keycloak_url: str) -> subprocess.Popen[bytes]:
+    env = {**os.environ, "DB_ASYNC": str(db_async).lower(), "KEYCLOAK_URL": keycloak_url}
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_until_up(base_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/utils/health-check/").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+
+async def drive(url: str, headers: dict[str, str], concurrency: int, duration: float) -> tuple[int, int]:
+    """Hit `url` from `concurrency` clients for `duration` seconds, returns (ok, failed)"""
+    ok = failed = 0
+    deadline = time.monotonic() + duration
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        nonlocal ok, failed
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get(url, headers=headers)
+            except httpx.TransportError:
+                failed += 1
+                continue
+            if response.status_code == 200:
+                ok += 1
+            else:
+                failed += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+    return ok, failed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per route and mode")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds before measuring")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--coupons", type=int, default=20, help="coupons held by the benchmark user")
+    parser.add_argument("--announcements", type=int, default=50)
+    args = parser.parse_args()
+
+    seed(args.coupons, args.announcements)
+
+    signing_key = RSASigningKey()
+    token = signing_key.sign(token_claims())
+    base_url = f"http://127.0.0.1:{args.port}{settings.API_V1_STR}"
+
+    results: dict[str, dict[str, float]] = {}
+    with StubJWKSServer([signing_key]) as jwks:
+        # python-keycloak asks <url>/realms/<realm>/protocol/openid-connect/certs,
+        # the stub serves the keys on any path
+        keycloak_url = jwks.url.rsplit("/", 1)[0]
+        for db_async in (False, True):
+            mode = "async" if db_async else "sync"
+            server = start_server(db_async, args.port, args.workers, keycloak_url)
+            try:
+                wait_until_up(base_url)
+                for route, authenticated in ROUTES.items():
+                    headers = {"Authorization": f"Bearer {token}"} if authenticated else {}
+                    url = f"{base_url}{route}"
+                    asyncio.run(drive(url, headers, args.concurrency, args.warmup))
+                    ok, failed = asyncio.run(drive(url, headers, args.concurrency, args.duration))
+                    results.setdefault(route, {})[mode] = ok / args.duration
+                    if failed:
+                        print(f"{mode} {route}: {failed} failed requests", file=sys.stderr)
+            finally:
+                server.terminate()
+                server.wait()
+
+    print(f"{'route':<28}{'sync req/s':>12}{'async req/s':>13}{'change':>9}")
+    for route, rates in results.items():
+        change = (rates["async"] / rates["sync"] - 1) * 100 if rates["sync"] else float("nan")
+        print(f"{route:<28}{rates['sync']:>12.1f}{rates['async']:>13.1f}{change:>8.1f}%")
+
+
+if __name__ == "__main__":
+    main()
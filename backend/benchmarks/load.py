@@ -0,0 +1,265 @@
+"""
+Latency and throughput of the main API routes under concurrent load
+
+Starts the API with uvicorn on the database seeded by benchmarks.seed and
+drives each scenario with concurrent clients, one after the other:
+
+- my_coupons: GET /user/coupons/my as a random benchmark user
+- redeem: POST /user/coupons/redeem/{id}, each unredeemed coupon of the
+  benchmark users redeemed once by its holder; stops early when none are left
+  (seed more campaigns to get new ones)
+- published: GET /announcements/published
+- admin_campaigns: GET /admin/campaigns/ as the benchmark admin
+- upload: POST /admin/coupons/upload/{id} with a CSV of fresh codes
+
+Tokens are signed by a local key served from a stub JWKS endpoint, so no
+Keycloak is needed. p50/p95/p99 latency and requests per second are printed
+and saved as JSON under benchmarks/results/; pass an earlier file as
+--compare to see the change.
+
+    python -m benchmarks.seed --users 10000 --campaigns 10
+    python -m benchmarks.load --concurrency 64 --duration 15 --workers 4
+"""
+import argparse
+import asyncio
+import csv
+import io
+import random
+import sys
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from datetime import timedelta
+from pathlib import Path
+
+import httpx
+from sqlmodel import Session, col, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.jwks_stub import RSASigningKey, StubJWKSServer
+from app.models import Campaign, Coupon, User
+from benchmarks.async_mode import start_server, wait_until_up
+from benchmarks.results import (
+    compare,
+    load_results,
+    missing_benchmarks,
+    print_comparison,
+    save_results,
+)
+from benchmarks.seed import BENCHMARK_UPLOAD_CAMPAIGN, admin_claims, user_claims
+
+# Compared with --compare; True when higher is better
+COMPARED_METRICS = {"rps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False}
+
+# Long enough for any run, so no token expires while it is being used
+TOKEN_LIFETIME = timedelta(hours=6)
+
+# Sends one request, or returns None when the scenario has nothing left to send
+Request = Callable[[httpx.AsyncClient], Awaitable[httpx.Response | None]]
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+
+async def run(request: Request, concurrency: int, duration: float) -> dict[str, float]:
+    """
+    Send `request` from `concurrency` clients for `duration` seconds
+
+    Latencies of successful (2xx) requests are measured from send to full
+    response; failed requests only count as errors.
+    """
+    latencies: list[float] = []
+    errors = 0
+    exhausted = False
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        nonlocal errors, exhausted
+        while not exhausted and time.perf_counter() < deadline:
+            sent = time.perf_counter()
+            try:
+                response = await request(client)
+            except httpx.TransportError:
+                errors += 1
+                continue
+            if response is None:
+                exhausted = True
+            elif response.is_success:
+                latencies.append(time.perf_counter() - sent)
+            else:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def sign_tokens(signing_key: RSASigningKey, users: int) -> dict[str, str]:
+    """Bearer tokens of the first `users` benchmark users, by Keycloak subject"""
+    tokens = {}
+    for index in range(users):
+        claims = user_claims(index)
+        tokens[claims["sub"]] = signing_key.sign(claims, expires_in=TOKEN_LIFETIME)
+    return tokens
+
+
+def redeemable_coupons(subjects: list[str], limit: int) -> list[tuple[str, uuid.UUID]]:
+    """(subject, coupon id) of unredeemed coupons held by the given users"""
+    with Session(engine) as session:
+        rows = session.exec(
+            select(col(User.keycloak_user_id), col(Coupon.id))
+            .join(Coupon, col(Coupon.assigned_to_user_id) == col(User.id))
+            .where(col(User.keycloak_user_id).in_(subjects), col(Coupon.redeemed).is_(False))
+            .limit(limit)
+        ).all()
+    # Only users with a subject were selected
+    pairs = [(str(subject), coupon_id) for subject, coupon_id in rows]
+    random.shuffle(pairs)
+    return pairs
+
+
+def upload_campaign_id() -> uuid.UUID:
+    with Session(engine) as session:
+        campaign_id = session.exec(select(Campaign.id).where(Campaign.title == BENCHMARK_UPLOAD_CAMPAIGN)).first()
+    if campaign_id is None:
+        raise SystemExit("Benchmark dataset not found, run python -m benchmarks.seed first")
+    return campaign_id
+
+
+def upload_csv(rows: int) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["code", "discount_type", "discount_value"])
+    for _ in range(rows):
+        writer.writerow([f"UP-{uuid.uuid4().hex}", "fixed", 5])
+    return buffer.getvalue().encode()
+
+
+def build_scenarios(base_url: str, signing_key: RSASigningKey, args: argparse.Namespace) -> dict[str, Request]:
+    tokens = sign_tokens(signing_key, args.token_users)
+    bearer = {subject: {"Authorization": f"Bearer {token}"} for subject, token in tokens.items()}
+    subjects = list(bearer)
+    admin = {"Authorization": f"Bearer {signing_key.sign(admin_claims(), expires_in=TOKEN_LIFETIME)}"}
+    redeemable = redeemable_coupons(subjects, args.redeem_pool)
+    campaign_id = upload_campaign_id()
+
+    async def my_coupons(client: httpx.AsyncClient) -> httpx.Response:
+        return await client.get(f"{base_url}/user/coupons/my", headers=bearer[random.choice(subjects)])
+
+    async def redeem(client: httpx.AsyncClient) -> httpx.Response | None:
+        if not redeemable:
+            return None
+        subject, coupon_id = redeemable.pop()
+        return await client.post(f"{base_url}/user/coupons/redeem/{coupon_id}", headers=bearer[subject])
+
+    async def published(client: httpx.AsyncClient) -> httpx.Response:
+        return await client.get(f"{base_url}/announcements/published")
+
+    async def admin_campaigns(client: httpx.AsyncClient) -> httpx.Response:
+        return await client.get(f"{base_url}/admin/campaigns/", headers=admin)
+
+    async def upload(client: httpx.AsyncClient) -> httpx.Response:
+        files = {"file": ("coupons.csv", upload_csv(args.upload_rows), "text/csv")}
+        return await client.post(f"{base_url}/admin/coupons/upload/{campaign_id}", headers=admin, files=files)
+
+    return {
+        "my_coupons": my_coupons,
+        "redeem": redeem,
+        "published": published,
+        "admin_campaigns": admin_campaigns,
+        "upload": upload,
+    }
+
+
+def print_results(results: dict[str, dict[str, float]]) -> None:
+    print(f"{'scenario':<18}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<18}{result['requests']:>10}{result['errors']:>8}{result['rps']:>10.1f}"
+            f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="my_coupons,redeem,published,admin_campaigns,upload")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds before measuring each scenario")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--db-async", action="store_true", help="run the API with DB_ASYNC=true")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token-users", type=int, default=1000, help="benchmark users sending requests")
+    parser.add_argument("--redeem-pool", type=int, default=50_000, help="most coupons the redeem scenario may use")
+    parser.add_argument("--upload-rows", type=int, default=100, help="coupons per uploaded CSV")
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/load-<time>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare with")
+    args = parser.parse_args()
+
+    signing_key = RSASigningKey()
+    base_url = f"http://127.0.0.1:{args.port}{settings.API_V1_STR}"
+    scenarios = build_scenarios(base_url, signing_key, args)
+    selected = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(selected) - scenarios.keys()
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results: dict[str, dict[str, float]] = {}
+    with StubJWKSServer([signing_key]) as jwks:
+        # python-keycloak asks <url>/realms/<realm>/protocol/openid-connect/certs,
+        # the stub serves the keys on any path
+        keycloak_url = jwks.url.rsplit("/", 1)[0]
+        server = start_server(args.db_async, args.port, args.workers, keycloak_url)
+        try:
+            wait_until_up(base_url)
+            for name in selected:
+                if args.warmup:
+                    asyncio.run(run(scenarios[name], args.concurrency, args.warmup))
+                results[name] = asyncio.run(run(scenarios[name], args.concurrency, args.duration))
+                if results[name]["errors"]:
+                    print(f"{name}: {results[name]['errors']} failed requests", file=sys.stderr)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print_results(results)
+    config = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in ("output", "compare")
+    }
+    output = save_results("load", results, config, args.output)
+    print(f"\nSaved to {output}")
+
+    if args.compare:
+        baseline = load_results(args.compare)["results"]
+        print()
+        print_comparison(compare(baseline, results, COMPARED_METRICS))
+        missing = missing_benchmarks(baseline, results)
+        if missing:
+            print(f"Not in this run: {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+"""
+Micro-benchmarks of the service layer's hot functions, with regression gating
+
+Each benchmark calls one function directly, without HTTP, against a dataset
+of fixed size seeded on first use, and times `--rounds` rounds of it in the
+manner of pytest-benchmark: per-round setup is not timed, and min, max, mean,
+median and standard deviation are reported. Run it on a scratch PostgreSQL
+database of its own (POSTGRES_DB in ../.env), since the assignment and the
+announcement listing see every row of their tables; it refuses to seed a
+database that is not marked as scratch:
+
+    psql -c "COMMENT ON DATABASE <POSTGRES_DB> IS 'benchmark scratch'"
+
+    python -m benchmarks.micro run --save-baseline     # on the reference commit
+    python -m benchmarks.micro run                     # on the change
+    python -m benchmarks.micro compare --threshold 0.15
+
+`compare` checks the latest run (or the given file) against the baseline and
+exits with status 1 when the median time of any benchmark grew by more than
+the threshold, or when a benchmark of the baseline is missing from the run.
+"""
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col, func, select
+
+from app import crud
+from app.core import security
+from app.core.db import engine
+from app.core.jwks import JWKSCache
+from app.core.jwks_stub import RSASigningKey, StubJWKSServer
+from app.models import Announcement, AnnouncementCreate, Campaign, Coupon, User
+from app.schemas import CampaignCreate
+from app.services.coupon_service import CouponService
+from benchmarks.results import (
+    RESULTS_DIR,
+    compare,
+    load_results,
+    missing_benchmarks,
+    print_comparison,
+    save_results,
+)
+from benchmarks.seed import NotScratchDatabase, is_scratch_database
+
+BASELINE = RESULTS_DIR / "micro-baseline.json"
+
+# Dataset sizes; changing one makes results incomparable with earlier runs
+GENERATED_COUPONS = 10_000
+ASSIGNED_COUPONS = 5_000
+USERS = 1_000
+STATS_CAMPAIGN_COUPONS = 100_000
+ANNOUNCEMENTS = 500
+
+MICRO_USER_PREFIX = "micro-user-"
+MICRO_STATS_CAMPAIGN = "Micro benchmark stats"
+MICRO_ROUND_CAMPAIGN_PREFIX = "Micro benchmark round "
+MICRO_ANNOUNCEMENT_PREFIX = "Micro benchmark announcement "
+
+# Only the median gates: the minimum is too optimistic, the mean too noisy
+COMPARED_METRICS = {"median_ms": False}
+
+
+def measure(
+    target: Callable[..., Any],
+    *,
+    rounds: int,
+    iterations: int = 1,
+    setup: Callable[[], tuple[Any, ...]] | None = None,
+) -> dict[str, float]:
+    """
+    Time `rounds` rounds of `iterations` calls to `target`
+
+    Args:
+        target: Function under test
+        rounds: Number of timed rounds
+        iterations: Calls per round; the round time is divided by it
+        setup: Called before each round, untimed; returns the arguments of `target`
+
+    Returns:
+        Statistics of the time per call, in milliseconds
+    """
+    times = []
+    for _ in range(rounds):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            target(*args)
+        times.append((time.perf_counter() - start) / iterations * 1000)
+    return {
+        "rounds": rounds,
+        "iterations": iterations,
+        "min_ms": min(times),
+        "max_ms": max(times),
+        "mean_ms": statistics.fmean(times),
+        "median_ms": statistics.median(times),
+        "stddev_ms": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def _campaign(session: Session, title: str) -> Campaign:
+    now = datetime.utcnow()
+    return crud.create_campaign(
+        session=session,
+        campaign_in=CampaignCreate(title=title, start_date=now, end_date=now + timedelta(days=365)),
+    )
+
+
+def seed_dataset(session: Session) -> None:
+    """Create whatever is missing of the fixed datasets, in a database marked as scratch only"""
+    if not is_scratch_database(session):
+        raise NotScratchDatabase()
+    session.execute(
+        insert(User)
+        .values(
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "email": f"{MICRO_USER_PREFIX}{index}@example.com",
+                    "full_name": f"Micro User {index}",
+                    "keycloak_user_id": f"{MICRO_USER_PREFIX}{index}",
+                    "is_active": True,
+                    "is_superuser": False,
+                }
+                for index in range(USERS)
+            ]
+        )
+        .on_conflict_do_nothing()
+    )
+    session.commit()
+
+    if not session.exec(select(Campaign).where(Campaign.title == MICRO_STATS_CAMPAIGN)).first():
+        campaign = _campaign(session, MICRO_STATS_CAMPAIGN)
+        CouponService(session).generate_coupons(campaign.id, STATS_CAMPAIGN_COUPONS)
+
+    existing = session.exec(
+        select(func.count())
+        .select_from(Announcement)
+        .where(Announcement.title.startswith(MICRO_ANNOUNCEMENT_PREFIX))
+    ).one()
+    for index in range(existing, ANNOUNCEMENTS):
+        crud.create_announcement(
+            session=session,
+            announcement_in=AnnouncementCreate(
+                title=f"{MICRO_ANNOUNCEMENT_PREFIX}{index}", category="general", is_published=True
+            ),
+        )
+
+
+def dataset_sizes(session: Session) -> dict[str, int]:
+    """Row counts the results depend on, stored with them so comparisons can check them"""
+    return {
+        "users": session.exec(select(func.count()).select_from(User)).one(),
+        "published_announcements": session.exec(
+            select(func.count()).select_from(Announcement).where(col(Announcement.is_published).is_(True))
+        ).one(),
+        "generated_coupons": GENERATED_COUPONS,
+        "assigned_coupons": ASSIGNED_COUPONS,
+        "stats_campaign_coupons": STATS_CAMPAIGN_COUPONS,
+    }
+
+
+@contextmanager
+def round_campaigns(session: Session) -> Iterator[Callable[[], Campaign]]:
+    """Yields a factory of fresh campaigns, deleted with their coupons on exit"""
+    created: list[uuid.UUID] = []
+
+    def new_campaign() -> Campaign:
+        campaign = _campaign(session, f"{MICRO_ROUND_CAMPAIGN_PREFIX}{uuid.uuid4().hex[:8]}")
+        created.append(campaign.id)
+        return campaign
+
+    try:
+        yield new_campaign
+    finally:
+        session.rollback()
+        if created:
+            session.execute(delete(Coupon).where(col(Coupon.campaign_id).in_(created)))
+            session.execute(delete(Campaign).where(col(Campaign.id).in_(created)))
+            session.commit()
+
+
+def bench_generate_coupons(session: Session, rounds: int) -> dict[str, float]:
+    service = CouponService(session)
+    with round_campaigns(session) as new_campaign:
+        return measure(
+            lambda campaign_id: service.generate_coupons(campaign_id, GENERATED_COUPONS),
+            rounds=rounds,
+            setup=lambda: (new_campaign().id,),
+        )
+
+
+def bench_assign_campaign_to_all_users(session: Session, rounds: int) -> dict[str, float]:
+    service = CouponService(session)
+    with round_campaigns(session) as new_campaign:
+
+        def setup() -> tuple[Any, ...]:
+            campaign = new_campaign()
+            service.generate_coupons(campaign.id, ASSIGNED_COUPONS)
+            return (campaign.id,)
+
+        return measure(service.assign_campaign_to_all_users, rounds=rounds, setup=setup)
+
+
+def bench_get_campaign_coupon_stats(session: Session, rounds: int) -> dict[str, float]:
+    campaign_id = session.exec(select(Campaign.id).where(Campaign.title == MICRO_STATS_CAMPAIGN)).one()
+    return measure(
+        lambda: crud.get_campaign_coupon_stats(session=session, campaign_id=campaign_id),
+        rounds=rounds,
+        iterations=100,
+    )
+
+
+def bench_get_published_announcements(session: Session, rounds: int) -> dict[str, float]:
+    return measure(
+        lambda: crud.get_published_announcements(session=session),
+        rounds=rounds,
+        iterations=20,
+    )
+
+
+@contextmanager
+def local_keycloak_keys(signing_key: RSASigningKey) -> Iterator[None]:
+    """Verify tokens against `signing_key`, served by a stub JWKS endpoint, instead of Keycloak"""
+    original = security.jwks_cache
+    with StubJWKSServer([signing_key]) as server:
+        security.jwks_cache = JWKSCache(server.fetch)
+        try:
+            yield
+        finally:
+            security.jwks_cache = original
+
+
+def _claims(index: int) -> dict[str, Any]:
+    subject = f"{MICRO_USER_PREFIX}{index}"
+    return {
+        "sub": subject,
+        "email": f"{subject}@example.com",
+        "name": f"Micro User {index}",
+        "realm_access": {"roles": ["user"]},
+    }
+
+
+def bench_get_user_info_from_token(_session: Session, rounds: int) -> dict[str, float]:
+    # A token never seen before: signature verification
+    signing_key = RSASigningKey()
+    iterations = 50
+    tokens = iter([signing_key.sign(_claims(index)) for index in range(rounds * iterations + 1)])
+    with local_keycloak_keys(signing_key):
+        # Fetches the keys outside the timed rounds
+        security.get_user_info_from_token(next(tokens))
+        return measure(
+            lambda: security.get_user_info_from_token(next(tokens)),
+            rounds=rounds,
+            iterations=iterations,
+        )
+
+
+def bench_get_user_info_from_token_cached(_session: Session, rounds: int) -> dict[str, float]:
+    # The same token again: served from the verified token cache
+    signing_key = RSASigningKey()
+    token = signing_key.sign(_claims(0))
+    with local_keycloak_keys(signing_key):
+        security.get_user_info_from_token(token)
+        return measure(
+            lambda: security.get_user_info_from_token(token),
+            rounds=rounds,
+            iterations=1000,
+        )
+
+
+BENCHMARKS: dict[str, Callable[[Session, int], dict[str, float]]] = {
+    "CouponService.generate_coupons": bench_generate_coupons,
+    "CouponService.assign_campaign_to_all_users": bench_assign_campaign_to_all_users,
+    "crud.get_campaign_coupon_stats": bench_get_campaign_coupon_stats,
+    "crud.get_published_announcements": bench_get_published_announcements,
+    "security.get_user_info_from_token": bench_get_user_info_from_token,
+    "security.get_user_info_from_token[cached]": bench_get_user_info_from_token_cached,
+}
+
+
+def print_results(results: dict[str, dict[str, float]]) -> None:
+    print(f"{'benchmark':<46}{'min ms':>10}{'median ms':>11}{'mean ms':>10}{'stddev':>10}{'rounds':>8}")
+    for name, result in results.items():
+        print(
+            f"{name:<46}{result['min_ms']:>10.3f}{result['median_ms']:>11.3f}{result['mean_ms']:>10.3f}"
+            f"{result['stddev_ms']:>10.3f}{result['rounds']:>8}"
+        )
+
+
+def latest_run() -> Path | None:
+    runs = sorted(RESULTS_DIR.glob("micro-2*.json"))
+    return runs[-1] if runs else None
+
+
+def run(args: argparse.Namespace) -> int:
+    selected = [name.strip() for name in args.only.split(",") if name.strip()] if args.only else list(BENCHMARKS)
+    unknown = set(selected) - BENCHMARKS.keys()
+    if unknown:
+        print(f"Unknown benchmarks: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+
+    results: dict[str, dict[str, float]] = {}
+    with Session(engine) as session:
+        try:
+            seed_dataset(session)
+        except NotScratchDatabase as error:
+            print(error, file=sys.stderr)
+            return 2
+        dataset = dataset_sizes(session)
+        for name in selected:
+            results[name] = BENCHMARKS[name](session, args.rounds)
+            print(f"{name}: median {results[name]['median_ms']:.3f} ms", file=sys.stderr)
+
+    print_results(results)
+    output = save_results("micro", results, {"rounds": args.rounds, "dataset": dataset}, args.output)
+    print(f"\nSaved to {output}")
+    if args.save_baseline:
+        BASELINE.write_text(output.read_text())
+        print(f"Saved as the baseline in {BASELINE}")
+    return 0
+
+
+def compare_runs(args: argparse.Namespace) -> int:
+    current_path = args.current or latest_run()
+    if current_path is None:
+        print("No micro-benchmark run found, run python -m benchmarks.micro run first", file=sys.stderr)
+        return 2
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}, run python -m benchmarks.micro run --save-baseline", file=sys.stderr)
+        return 2
+
+    baseline = load_results(args.baseline)
+    current = load_results(current_path)
+    if baseline["config"].get("dataset") != current["config"].get("dataset"):
+        print("Warning: the runs were measured on different datasets", file=sys.stderr)
+
+    rows = compare(baseline["results"], current["results"], COMPARED_METRICS)
+    print(f"Baseline {args.baseline} ({baseline['commit']}), current {current_path} ({current['commit']})\n")
+    print_comparison(rows, args.threshold)
+    failed = False
+    missing = missing_benchmarks(baseline["results"], current["results"])
+    if missing:
+        print(f"\nMissing from the current run: {', '.join(missing)}", file=sys.stderr)
+        failed = True
+    regressed = [row for row in rows if row.regression > args.threshold]
+    if regressed:
+        print(f"\n{len(regressed)} benchmark(s) regressed by more than {args.threshold:.0%}", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks and save the results")
+    run_parser.add_argument("--rounds", type=int, default=10)
+    run_parser.add_argument("--only", help="comma separated benchmark names")
+    run_parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/micro-<time>.json)")
+    run_parser.add_argument("--save-baseline", action="store_true", help=f"also store the results as {BASELINE.name}")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser("compare", help="fail when a benchmark regressed against the baseline")
+    compare_parser.add_argument("current", type=Path, nargs="?", help="results file (default: the latest run)")
+    compare_parser.add_argument("--baseline", type=Path, default=BASELINE)
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="largest allowed slowdown, 0.10 = 10%%")
+    compare_parser.set_defaults(handler=compare_runs)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark results stored as JSON, and comparison of two runs
+
+Every run is saved with the commit it measured, so results of different
+branches or releases can be compared later with `compare`.
+"""
+import json
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, NamedTuple
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(kind: str, results: dict[str, dict[str, float]], config: dict[str, Any], output: Path | None = None) -> Path:
+    """
+    Write a run to `output`, by default results/<kind>-<UTC timestamp>.json
+
+    Args:
+        kind: Which benchmark produced the results, e.g. "load"
+        results: Metrics per benchmark name, e.g. {"/announcements/published": {"rps": ...}}
+        config: Options of the run, stored alongside so runs can be told apart
+        output: File to write instead of the default
+
+    Returns:
+        Path of the written file
+    """
+    now = datetime.now(timezone.utc)
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / f"{kind}-{now.strftime('%Y%m%dT%H%M%SZ')}.json"
+    document = {
+        "kind": kind,
+        "timestamp": now.isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": config,
+        "results": results,
+    }
+    output.write_text(json.dumps(document, indent=2, sort_keys=True) + "\n")
+    return output
+
+
+def load_results(path: Path) -> dict[str, Any]:
+    document: dict[str, Any] = json.loads(Path(path).read_text())
+    return document
+
+
+class Comparison(NamedTuple):
+    name: str
+    metric: str
+    baseline: float
+    current: float
+    # Relative change, positive when the current run is worse
+    regression: float
+
+
+def missing_benchmarks(baseline: dict[str, dict[str, float]], current: dict[str, dict[str, float]]) -> list[str]:
+    """Names of the baseline's benchmarks that the current run lacks"""
+    return sorted(baseline.keys() - current.keys())
+
+
+def compare(
+    baseline: dict[str, dict[str, float]],
+    current: dict[str, dict[str, float]],
+    metrics: dict[str, bool],
+) -> list[Comparison]:
+    """
+    Compare the metrics of the benchmarks present in both runs
+
+    Benchmarks missing from either run are skipped; check `missing_benchmarks`
+    where that must fail.
+
+    Args:
+        baseline: `results` of the reference run
+        current: `results` of the run being checked
+        metrics: Metric names to compare, mapped to whether higher is better
+
+    Returns:
+        One row per benchmark and metric
+    """
+    rows = []
+    for name in sorted(baseline.keys() & current.keys()):
+        for metric, higher_is_better in metrics.items():
+            before = baseline[name].get(metric)
+            after = current[name].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            rows.append(Comparison(name, metric, before, after, -change if higher_is_better else change))
+    return rows
+
+
+def print_comparison(rows: list[Comparison], threshold: float | None = None) -> None:
+    """Print a comparison table, flagging rows that regressed by more than `threshold`"""
+    print(f"{'benchmark':<40}{'metric':>10}{'baseline':>14}{'current':>14}{'change':>10}")
+    for row in rows:
+        flag = "  REGRESSION" if threshold is not None and row.regression > threshold else ""
+        print(
+            f"{row.name:<40}{row.metric:>10}{row.baseline:>14.3f}{row.current:>14.3f}"
+            f"{row.regression * 100:>+9.1f}%{flag}"
+        )
@@ -0,0 +1,183 @@
+"""
+Seed the database configured in ../.env with a benchmark dataset
+
+Tops the dataset up to the requested size, so running it again with the same
+options does nothing and running it with larger ones only adds the difference:
+
+- `--users` users with Keycloak subjects bench-user-0, bench-user-1, ...
+- `--campaigns` campaigns of `--coupons-per-campaign` generated coupons each,
+  handed out one per user, the rest left unassigned
+- `--announcements` published announcements
+- an empty campaign receiving the coupons of the upload benchmark
+
+The queries the app runs (ON CONFLICT, advisory locks, the set_updated_at
+trigger) are PostgreSQL only, so the dataset is seeded into PostgreSQL. Point
+../.env at a scratch database and mark it as such, nothing is written otherwise:
+
+    psql -c "COMMENT ON DATABASE <POSTGRES_DB> IS 'benchmark scratch'"
+
+    python -m benchmarks.seed --campaigns 20 --coupons-per-campaign 100000 --users 10000
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col, func, select
+
+from app import crud
+from app.core.db import engine
+from app.models import Announcement, AnnouncementCreate, Campaign, User
+from app.schemas import CampaignCreate
+from app.services.coupon_service import CouponService
+from app.services.identity_service import IdentityService
+
+BENCHMARK_USER_PREFIX = "bench-user-"
+BENCHMARK_ADMIN_ID = "bench-admin"
+BENCHMARK_CAMPAIGN_PREFIX = "Benchmark campaign "
+BENCHMARK_UPLOAD_CAMPAIGN = "Benchmark uploads"
+BENCHMARK_ANNOUNCEMENT_PREFIX = "Benchmark announcement "
+
+# Users inserted per statement
+USER_BATCH_SIZE = 5000
+
+# Comment a database must carry before benchmark data is written into it
+SCRATCH_DATABASE_COMMENT = "benchmark scratch"
+
+
+class NotScratchDatabase(Exception):
+    def __init__(self) -> None:
+        database = engine.url.database
+        super().__init__(
+            f"{database} is not marked as a scratch database, run "
+            f"COMMENT ON DATABASE {database} IS '{SCRATCH_DATABASE_COMMENT}' if it may be filled with benchmark data"
+        )
+
+
+def is_scratch_database(session: Session) -> bool:
+    comment = session.execute(
+        text("SELECT shobj_description(oid, 'pg_database') FROM pg_database WHERE datname = current_database()")
+    ).scalar()
+    return comment == SCRATCH_DATABASE_COMMENT
+
+
+def user_claims(index: int) -> dict[str, Any]:
+    """Keycloak token claims of benchmark user `index`"""
+    subject = f"{BENCHMARK_USER_PREFIX}{index}"
+    return {
+        "sub": subject,
+        "email": f"{subject}@example.com",
+        "name": f"Benchmark User {index}",
+        "realm_access": {"roles": ["user"]},
+    }
+
+
+def admin_claims() -> dict[str, Any]:
+    return {
+        "sub": BENCHMARK_ADMIN_ID,
+        "email": f"{BENCHMARK_ADMIN_ID}@example.com",
+        "name": "Benchmark Admin",
+        "realm_access": {"roles": ["admin"]},
+    }
+
+
+def seed_users(session: Session, users: int) -> None:
+    for start in range(0, users, USER_BATCH_SIZE):
+        rows = []
+        for index in range(start, min(start + USER_BATCH_SIZE, users)):
+            claims = user_claims(index)
+            rows.append(
+                {
+                    "id": uuid.uuid4(),
+                    "email": claims["email"],
+                    "full_name": claims["name"],
+                    "keycloak_user_id": claims["sub"],
+                    "is_active": True,
+                    "is_superuser": False,
+                }
+            )
+        session.execute(insert(User).values(rows).on_conflict_do_nothing())
+        session.commit()
+
+    claims = admin_claims()
+    IdentityService(session).sync_user(
+        {
+            "user_id": claims["sub"],
+            "email": claims["email"],
+            "full_name": claims["name"],
+            "roles": claims["realm_access"]["roles"],
+        }
+    )
+
+
+def get_or_create_campaign(session: Session, title: str) -> Campaign:
+    campaign = session.exec(select(Campaign).where(Campaign.title == title)).first()
+    if campaign:
+        return campaign
+    now = datetime.utcnow()
+    return crud.create_campaign(
+        session=session,
+        campaign_in=CampaignCreate(title=title, start_date=now, end_date=now + timedelta(days=365)),
+    )
+
+
+def seed_campaigns(session: Session, campaigns: int, coupons_per_campaign: int) -> None:
+    service = CouponService(session)
+    for index in range(campaigns):
+        campaign = get_or_create_campaign(session, f"{BENCHMARK_CAMPAIGN_PREFIX}{index}")
+        missing = coupons_per_campaign - crud.get_campaign_coupon_stats(
+            session=session, campaign_id=campaign.id
+        )["total"]
+        if missing > 0:
+            started = time.perf_counter()
+            # The codes are not needed, only the rows
+            for _ in service.iter_generate_coupons(campaign.id, missing):
+                pass
+            print(f"{campaign.title}: {missing} coupons in {time.perf_counter() - started:.1f}s")
+        service.assign_campaign_to_all_users(campaign.id, mode="one_per_user")
+
+    get_or_create_campaign(session, BENCHMARK_UPLOAD_CAMPAIGN)
+
+
+def seed_announcements(session: Session, announcements: int) -> None:
+    existing = session.exec(
+        select(func.count())
+        .select_from(Announcement)
+        .where(col(Announcement.title).startswith(BENCHMARK_ANNOUNCEMENT_PREFIX))
+    ).one()
+    for index in range(existing, announcements):
+        crud.create_announcement(
+            session=session,
+            announcement_in=AnnouncementCreate(
+                title=f"{BENCHMARK_ANNOUNCEMENT_PREFIX}{index}", category="general", is_published=True
+            ),
+        )
+
+
+def seed(campaigns: int, coupons_per_campaign: int, users: int, announcements: int) -> None:
+    with Session(engine) as session:
+        if not is_scratch_database(session):
+            raise NotScratchDatabase()
+        seed_users(session, users)
+        seed_campaigns(session, campaigns, coupons_per_campaign)
+        seed_announcements(session, announcements)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--campaigns", type=int, default=10)
+    parser.add_argument("--coupons-per-campaign", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--announcements", type=int, default=200)
+    args = parser.parse_args()
+    try:
+        seed(args.campaigns, args.coupons_per_campaign, args.users, args.announcements)
+    except NotScratchDatabase as error:
+        raise SystemExit(str(error)) from None
+
+
+if __name__ == "__main__":
+    main()
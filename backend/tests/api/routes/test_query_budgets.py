@@ -0,0 +1,107 @@
+"""
+Statements each hot endpoint may send, however much data there is
+
+Every listing runs a fixed number of queries; a budget overrun means a query
+per row (N+1) crept back in.
+"""
+import uuid
+from collections.abc import Generator
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app import crud
+from app.api import deps
+from app.core.config import settings
+from app.main import app
+from app.models import User
+from app.schemas import AnnouncementCreate, CouponCreate
+from app.services.identity_service import IdentityService
+from tests.utils.campaign import create_random_campaign
+from tests.utils.utils import random_lower_string
+
+
+@pytest.fixture(scope="module")
+def claims() -> dict:
+    subject = str(uuid.uuid4())
+    return {
+        "user_id": subject,
+        "email": f"{subject}@example.com",
+        "full_name": "Query Budget",
+        "roles": ["admin"],
+    }
+
+
+@pytest.fixture(scope="module")
+def user(db: Session, claims: dict) -> User:
+    # Also warms the identity cache, as for any returning user
+    return IdentityService(db).sync_user(claims)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def seeded(db: Session, user: User) -> None:
+    for _ in range(5):
+        campaign = create_random_campaign(db)
+        for assigned in (True, False):
+            crud.create_coupon(
+                session=db,
+                coupon_in=CouponCreate(
+                    code=random_lower_string()[:20],
+                    campaign_id=campaign.id,
+                    discount_type="fixed",
+                    discount_value=5,
+                    assigned_to_user_id=user.id if assigned else None,
+                ),
+            )
+        crud.create_announcement(
+            session=db,
+            announcement_in=AnnouncementCreate(
+                title=random_lower_string(), category="general", is_published=True
+            ),
+        )
+
+
+@pytest.fixture
+def authenticated(claims: dict) -> Generator[None, None, None]:
+    app.dependency_overrides[deps.get_token_claims] = lambda: claims
+    yield
+    app.dependency_overrides.pop(deps.get_token_claims)
+
+
+def test_published_announcements(client: TestClient, max_queries) -> None:
+    # Version, rows and the next expiry; a cache hit runs none of them
+    with max_queries(3):
+        response = client.get(f"{settings.API_V1_STR}/announcements/published")
+    assert response.status_code == 200
+
+
+@pytest.mark.usefixtures("authenticated")
+def test_my_coupons(client: TestClient, max_queries) -> None:
+    # User, version and rows
+    with max_queries(3):
+        response = client.get(f"{settings.API_V1_STR}/user/coupons/my")
+    assert response.status_code == 200
+    assert response.json()["count"] == 5
+
+    # A revalidation skips the rows
+    with max_queries(2):
+        response = client.get(
+            f"{settings.API_V1_STR}/user/coupons/my",
+            headers={"If-None-Match": response.headers["ETag"]},
+        )
+    assert response.status_code == 304
+
+
+@pytest.mark.usefixtures("authenticated")
+def test_admin_campaigns(client: TestClient, max_queries) -> None:
+    # User, version, count and page: the coupon counters come with the page
+    with max_queries(4):
+        response = client.get(f"{settings.API_V1_STR}/admin/campaigns/")
+    assert response.status_code == 200
+    assert response.json()["count"] >= 5
+
+
+def test_server_timing_header(client: TestClient) -> None:
+    response = client.get(f"{settings.API_V1_STR}/announcements/published")
+    assert response.headers["Server-Timing"].startswith("db;dur=")
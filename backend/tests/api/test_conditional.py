@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta, timezone
+
+from starlette.requests import Request
+
+from app.api.conditional import etag_matches, http_date, not_modified, weak_etag
+
+
+def _request(if_none_match: str | None = None) -> Request:
+    headers = [] if if_none_match is None else [(b"if-none-match", if_none_match.encode())]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_etag_matches_weak_comparison() -> None:
+    etag = weak_etag("abc", 3)
+    assert etag == 'W/"abc-3"'
+
+    assert etag_matches(_request('W/"abc-3"'), etag)
+    # Strong and weak forms of the same tag match under weak comparison
+    assert etag_matches(_request('"abc-3"'), etag)
+    assert etag_matches(_request('"other", W/"abc-3"'), etag)
+    assert etag_matches(_request("*"), etag)
+
+    assert not etag_matches(_request(), etag)
+    assert not etag_matches(_request('W/"abc-4"'), etag)
+
+
+def test_http_date() -> None:
+    moment = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=2)))
+    assert http_date(moment) == "Fri, 02 Jan 2026 01:04:05 GMT"
+    # Naive datetimes are UTC
+    assert http_date(datetime(2026, 1, 2, 3, 4, 5)) == "Fri, 02 Jan 2026 03:04:05 GMT"
+
+
+def test_not_modified_carries_validators() -> None:
+    response = not_modified('W/"abc"', datetime(2026, 1, 2, tzinfo=timezone.utc))
+
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == 'W/"abc"'
+    assert response.headers["last-modified"] == "Fri, 02 Jan 2026 00:00:00 GMT"
+    assert response.headers["cache-control"] == "private, no-cache"
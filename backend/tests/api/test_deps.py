@@ -0,0 +1,128 @@
+from typing import Annotated
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlmodel import Session
+
+from app.api import deps
+from app.core import security
+from app.core.replica import primary_pins
+
+
+def test_token_claims_are_verified_once_per_request(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[str] = []
+
+    def fake_get_user_info_from_token(token: str) -> dict:
+        calls.append(token)
+        return {"user_id": "user-1", "roles": ["admin"]}
+
+    monkeypatch.setattr(security, "get_user_info_from_token", fake_get_user_info_from_token)
+
+    def first(claims: deps.TokenClaimsDep) -> str:
+        return claims["user_id"]
+
+    def second(claims: deps.TokenClaimsDep) -> list[str]:
+        return claims["roles"]
+
+    app = FastAPI()
+
+    @app.get("/")
+    def endpoint(
+        user_id: Annotated[str, Depends(first)],
+        roles: Annotated[list[str], Depends(second)],
+        claims: deps.TokenClaimsDep,
+    ) -> dict:
+        return {"user_id": user_id, "roles": roles, "same": claims["user_id"] == user_id}
+
+    with TestClient(app) as client:
+        r = client.get("/", headers={"Authorization": "Bearer abc"})
+        assert r.status_code == 200
+        assert r.json() == {"user_id": "user-1", "roles": ["admin"], "same": True}
+        assert calls == ["abc"]
+
+        client.get("/", headers={"Authorization": "Bearer def"})
+        assert calls == ["abc", "def"]
+
+
+def test_invalid_token_is_rejected(monkeypatch: pytest.MonkeyPatch) -> None:
+    def fake_get_user_info_from_token(token: str) -> dict:
+        raise ValueError("bad token")
+
+    monkeypatch.setattr(security, "get_user_info_from_token", fake_get_user_info_from_token)
+
+    app = FastAPI()
+
+    @app.get("/")
+    def endpoint(claims: deps.TokenClaimsDep) -> dict:
+        return claims
+
+    with TestClient(app) as client:
+        r = client.get("/", headers={"Authorization": "Bearer abc"})
+        assert r.status_code == 403
+        assert r.json()["detail"] == "Could not validate credentials"
+
+
+@pytest.fixture
+def primary_and_replica(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    engines = {}
+    for name in ("primary", "replica"):
+        engine = create_engine(f"sqlite:///{tmp_path / name}.db")
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE node (name TEXT)"))
+            connection.execute(text("INSERT INTO node VALUES (:name)"), {"name": name})
+        engines[name] = engine
+    monkeypatch.setattr(deps, "engine", engines["primary"])
+    monkeypatch.setattr(deps, "read_engine", engines["replica"])
+    yield
+    primary_pins.clear()
+    for engine in engines.values():
+        engine.dispose()
+
+
+def test_read_session_routes_to_replica_unless_pinned(
+    primary_and_replica, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(
+        security, "get_user_info_from_token", lambda token: {"user_id": token, "roles": []}
+    )
+
+    app = FastAPI()
+
+    @app.get("/")
+    def endpoint(session: deps.ReadSessionDep) -> str:
+        return session.exec(text("SELECT name FROM node")).one()[0]
+
+    with TestClient(app) as client:
+        assert client.get("/").json() == "replica"
+        assert client.get("/", headers={"Authorization": "Bearer user-1"}).json() == "replica"
+
+        primary_pins.pin("user-1")
+        assert client.get("/", headers={"Authorization": "Bearer user-1"}).json() == "primary"
+        assert client.get("/", headers={"Authorization": "Bearer user-2"}).json() == "replica"
+        assert client.get("/").json() == "replica"
+
+
+@pytest.mark.usefixtures("primary_and_replica")
+def test_read_database_runs_sync_sessions_in_the_threadpool(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(deps.settings, "DB_ASYNC", False)
+    monkeypatch.setattr(
+        security, "get_user_info_from_token", lambda token: {"user_id": token, "roles": []}
+    )
+
+    def node_name(*, session: Session) -> str:
+        return session.exec(text("SELECT name FROM node")).one()[0]
+
+    app = FastAPI()
+
+    @app.get("/")
+    async def endpoint(database: deps.ReadDatabaseDep) -> str:
+        return await database.run(node_name)
+
+    with TestClient(app) as client:
+        assert client.get("/", headers={"Authorization": "Bearer user-1"}).json() == "replica"
+        primary_pins.pin("user-1")
+        assert client.get("/", headers={"Authorization": "Bearer user-1"}).json() == "primary"
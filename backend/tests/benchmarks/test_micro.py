@@ -0,0 +1,61 @@
+import argparse
+from pathlib import Path
+
+import pytest
+
+from benchmarks import micro
+from benchmarks.results import save_results
+
+
+def test_measure_times_each_call_without_the_setup() -> None:
+    calls: list[int] = []
+    rounds = iter(range(3))
+
+    result = micro.measure(calls.append, rounds=3, iterations=4, setup=lambda: (next(rounds),))
+
+    assert calls == [0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 2]
+    assert result["rounds"] == 3
+    assert result["iterations"] == 4
+    assert 0 <= result["min_ms"] <= result["median_ms"] <= result["max_ms"]
+    assert result["stddev_ms"] >= 0
+
+
+def test_measure_single_round() -> None:
+    result = micro.measure(lambda: None, rounds=1)
+    assert result["stddev_ms"] == 0.0
+    assert result["min_ms"] == result["max_ms"] == result["mean_ms"]
+
+
+def _run(tmp_path: Path, name: str, results: dict[str, float]) -> Path:
+    return save_results(
+        "micro",
+        {benchmark: {"median_ms": median} for benchmark, median in results.items()},
+        {"rounds": 10},
+        tmp_path / f"{name}.json",
+    )
+
+
+def _compare(tmp_path: Path, current: dict[str, float], threshold: float = 0.10) -> int:
+    baseline = _run(tmp_path, "baseline", {"generate": 10.0, "stats": 2.0})
+    args = argparse.Namespace(current=_run(tmp_path, "current", current), baseline=baseline, threshold=threshold)
+    return micro.compare_runs(args)
+
+
+@pytest.mark.parametrize(
+    ("current", "status"),
+    [
+        ({"generate": 10.5, "stats": 1.0}, 0),
+        ({"generate": 12.0, "stats": 2.0}, 1),
+        # A benchmark that stopped running fails rather than passing unnoticed
+        ({"generate": 10.0}, 1),
+    ],
+)
+def test_compare_runs(tmp_path: Path, current: dict[str, float], status: int) -> None:
+    assert _compare(tmp_path, current) == status
+
+
+def test_compare_runs_without_baseline(tmp_path: Path) -> None:
+    args = argparse.Namespace(
+        current=_run(tmp_path, "current", {"generate": 1.0}), baseline=tmp_path / "missing.json", threshold=0.10
+    )
+    assert micro.compare_runs(args) == 2
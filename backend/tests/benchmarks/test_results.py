@@ -0,0 +1,25 @@
+from benchmarks.results import compare, missing_benchmarks
+
+METRICS = {"rps": True, "p50_ms": False}
+
+
+def test_compare_reports_regressions_as_positive() -> None:
+    baseline = {"published": {"rps": 100, "p50_ms": 10}}
+    current = {"published": {"rps": 80, "p50_ms": 12}}
+
+    rows = {row.metric: row for row in compare(baseline, current, METRICS)}
+
+    assert rows["rps"].regression == 0.2
+    assert rows["p50_ms"].regression == 0.2
+    assert compare(current, baseline, METRICS)[0].regression < 0
+
+
+def test_compare_skips_what_one_run_lacks() -> None:
+    baseline = {"published": {"rps": 100}, "redeem": {"rps": 50}}
+    current = {"published": {"rps": 100, "p50_ms": 5}, "upload": {"rps": 1}}
+
+    rows = compare(baseline, current, METRICS)
+
+    assert [(row.name, row.metric) for row in rows] == [("published", "rps")]
+    assert missing_benchmarks(baseline, current) == ["redeem"]
+    assert missing_benchmarks(current, current) == []
@@ -1,4 +1,6 @@
-from collections.abc import Generator
+from collections.abc import Callable, Generator
+from contextlib import AbstractContextManager, contextmanager
+from typing import Any
 
 import pytest
 from fastapi.testclient import TestClient
@@ -8,6 +10,7 @@ from app.core.config import settings
 from app.core.db import engine, init_db
 from app.main import app
 from app.models import Item, User
+from tests.utils.query_plans import capture_statements
 from tests.utils.user import authentication_token_from_email
 from tests.utils.utils import get_superuser_token_headers
 
@@ -40,3 +43,20 @@ def normal_user_token_headers(client: TestClient, db: Session) -> dict[str, str]
     return authentication_token_from_email(
         client=client, email=settings.EMAIL_TEST_USER, db=db
     )
+
+
+@pytest.fixture
+def max_queries() -> Callable[[int], AbstractContextManager[list[tuple[str, Any]]]]:
+    """
+    Context manager failing the test when the code inside it sends more than
+    `limit` statements to the database, e.g. the requests of one endpoint
+    """
+
+    @contextmanager
+    def assert_max_queries(limit: int) -> Generator[list[tuple[str, Any]], None, None]:
+        with capture_statements(engine, selects_only=False) as statements:
+            yield statements
+        sent = "\n".join(statement for statement, _ in statements)
+        assert len(statements) <= limit, f"{len(statements)} statements, at most {limit} expected:\n{sent}"
+
+    return assert_max_queries
@@ -0,0 +1,91 @@
+import io
+import json
+import logging
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.core.access_log import AccessLogMiddleware, configure_access_log, logger, stop_access_log
+
+
+@pytest.fixture
+def access_log():
+    stream = io.StringIO()
+    configure_access_log(level="INFO", queue_size=100, stream=stream)
+
+    def lines() -> list[dict]:
+        # Stopping the listener flushes everything queued so far
+        stop_access_log()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield lines
+    stop_access_log()
+    logger.handlers = []
+
+
+def _client(**middleware_options) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int) -> dict:
+        if item_id == 0:
+            raise HTTPException(status_code=404)
+        return {"id": item_id}
+
+    @app.get("/boom")
+    def boom() -> None:
+        raise RuntimeError("boom")
+
+    app.add_middleware(AccessLogMiddleware, **middleware_options)
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_one_json_line_per_request(access_log) -> None:
+    client = _client()
+    client.get("/items/7?secret=x", headers={"Authorization": "Bearer secret-token"})
+    client.get("/items/0")
+    client.get("/boom")
+    client.get("/missing")
+
+    lines = access_log()
+    assert [(line["level"], line["route"], line["status"]) for line in lines] == [
+        ("INFO", "/items/{item_id}", 200),
+        ("WARNING", "/items/{item_id}", 404),
+        ("ERROR", "/boom", 500),
+        ("WARNING", None, 404),
+    ]
+    assert lines[0]["method"] == "GET"
+    assert lines[0]["bytes"] == len(b'{"id":7}')
+    assert lines[0]["duration_ms"] >= 0
+    # No headers, query string or concrete path
+    assert "secret" not in json.dumps(lines)
+    assert "/items/7" not in json.dumps(lines)
+
+
+def test_sampling_only_drops_info_entries(access_log) -> None:
+    client = _client(sample_rate=0.5, sample=lambda: 0.75)
+    client.get("/items/1")
+    client.get("/items/0")
+
+    assert [line["status"] for line in access_log()] == [404]
+
+
+def test_slow_requests_are_warnings(access_log) -> None:
+    ticks = iter([0.0, 2.0])
+    client = _client(slow_ms=1000, sample_rate=0, clock=lambda: next(ticks))
+    client.get("/items/1")
+
+    [line] = access_log()
+    assert line["level"] == "WARNING"
+    assert line["duration_ms"] == 2000
+
+
+def test_level_gate(access_log) -> None:
+    logger.setLevel(logging.ERROR)
+    client = _client()
+    client.get("/items/1")
+    client.get("/items/0")
+    client.get("/boom")
+
+    assert [line["status"] for line in access_log()] == [500]
@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from app.core.db_pool import InstrumentedQueuePool, pool_status
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.05,
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_pool_status_tracks_checkouts(engine) -> None:
+    with engine.connect() as first:
+        first.execute(text("SELECT 1"))
+        with engine.connect() as second:
+            second.execute(text("SELECT 1"))
+            status = pool_status(engine)
+            assert status["checked_out"] == 2
+            assert status["overflow"] == 1
+
+    status = pool_status(engine)
+    assert status["checked_out"] == 0
+    assert status["checked_in"] == 1
+    assert status["checkouts"] == 2
+    assert status["timeouts"] == 0
+    assert 0 <= status["wait_seconds_max"] <= status["wait_seconds_total"]
+    assert max(status["wait_seconds_buckets"].values()) <= 2
+
+
+def test_pool_status_counts_timeouts(engine) -> None:
+    with engine.connect(), engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    assert pool_status(engine)["timeouts"] == 1
+
+
+def test_stats_survive_dispose(engine) -> None:
+    with engine.connect():
+        pass
+    engine.dispose()
+
+    assert pool_status(engine)["checkouts"] == 1
@@ -0,0 +1,108 @@
+import pytest
+
+from app.core import security
+from app.core.jwks import JWKSCache
+from app.core.jwks_stub import RSASigningKey, StubJWKSServer
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(scope="module")
+def signing_key() -> RSASigningKey:
+    return RSASigningKey(kid="key-1")
+
+
+def test_keys_are_fetched_once(signing_key: RSASigningKey) -> None:
+    with StubJWKSServer([signing_key]) as server:
+        cache = JWKSCache(server.fetch, ttl=300)
+        for _ in range(20):
+            cache.get_key("key-1")
+        assert server.requests == 1
+        assert cache.kids == ["key-1"]
+
+
+def test_token_without_kid_uses_default_key(signing_key: RSASigningKey) -> None:
+    with StubJWKSServer([signing_key]) as server:
+        cache = JWKSCache(server.fetch)
+        assert cache.get_key(None) is cache.get_key("key-1")
+
+
+def test_unknown_kid_forces_refetch_on_rotation(signing_key: RSASigningKey) -> None:
+    rotated = RSASigningKey(kid="key-2")
+    with StubJWKSServer([signing_key]) as server:
+        cache = JWKSCache(server.fetch, ttl=300)
+        cache.get_key("key-1")
+
+        server.keys = [signing_key, rotated]
+        cache.get_key("key-2")
+
+        assert server.requests == 2
+        assert sorted(cache.kids) == ["key-1", "key-2"]
+
+
+def test_forced_refetch_is_rate_limited(signing_key: RSASigningKey) -> None:
+    clock = FakeClock()
+    with StubJWKSServer([signing_key]) as server:
+        cache = JWKSCache(server.fetch, ttl=300, min_refetch_interval=10, clock=clock)
+        cache.get_key("key-1")
+
+        for _ in range(5):
+            with pytest.raises(ValueError):
+                cache.get_key("bogus")
+        assert server.requests == 2
+
+        clock.now += 10
+        with pytest.raises(ValueError):
+            cache.get_key("bogus")
+        assert server.requests == 3
+
+
+def test_stale_keys_are_served_while_refreshing_in_background(
+    signing_key: RSASigningKey,
+) -> None:
+    clock = FakeClock()
+    with StubJWKSServer([signing_key]) as server:
+        cache = JWKSCache(server.fetch, ttl=60, clock=clock)
+        key = cache.get_key("key-1")
+
+        clock.now += 61
+        assert cache.get_key("key-1") is key
+        cache.wait_for_refresh(timeout=5)
+
+        assert server.requests == 2
+        assert cache.get_key("key-1") is not key
+
+
+def test_stale_keys_survive_failed_refresh(signing_key: RSASigningKey) -> None:
+    clock = FakeClock()
+    with StubJWKSServer([signing_key]) as server:
+        cache = JWKSCache(server.fetch, ttl=60, clock=clock)
+        key = cache.get_key("key-1")
+    # Server is gone now, the background refresh fails
+    clock.now += 61
+    assert cache.get_key("key-1") is key
+    cache.wait_for_refresh(timeout=5)
+    assert cache.get_key("key-1") is key
+
+
+def test_validate_keycloak_token_uses_cached_keys(
+    signing_key: RSASigningKey, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    with StubJWKSServer([signing_key]) as server:
+        monkeypatch.setattr(security, "jwks_cache", JWKSCache(server.fetch))
+        token = signing_key.sign({"sub": "user-1", "email": "user@example.com"})
+
+        for _ in range(3):
+            claims = security.validate_keycloak_token(token)
+        assert claims["sub"] == "user-1"
+        assert server.requests == 1
+
+        forged = RSASigningKey(kid="key-1").sign({"sub": "user-1"})
+        with pytest.raises(ValueError):
+            security.validate_keycloak_token(forged)
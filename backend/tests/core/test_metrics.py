@@ -0,0 +1,105 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.api.routes import metrics as metrics_route
+from app.core.config import settings
+from app.core.db_pool import InstrumentedQueuePool
+from app.core.metrics import (
+    DB_QUERIES_PER_REQUEST,
+    HTTP_REQUESTS,
+    Counter,
+    Histogram,
+    MetricsMiddleware,
+    Registry,
+    pool_metrics,
+)
+from app.core.query_stats import QueryStatsMiddleware, instrument_engine
+
+
+def test_render_text_format() -> None:
+    registry = Registry()
+    requests = registry.register(Counter("requests_total", "Requests\nserved", ("path",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency", buckets=(0.1, 1)))
+
+    requests.inc(path='/a"b')
+    requests.inc(2, path='/a"b')
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(3)
+
+    assert registry.render() == (
+        "# HELP requests_total Requests\\nserved\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{path="/a\\"b"} 3\n'
+        "# HELP latency_seconds Latency\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{le="0.1"} 1\n'
+        'latency_seconds_bucket{le="1"} 2\n'
+        'latency_seconds_bucket{le="+Inf"} 3\n'
+        "latency_seconds_sum 3.55\n"
+        "latency_seconds_count 3\n"
+    )
+
+
+def test_labels_must_match() -> None:
+    counter = Counter("things_total", "Things", ("kind",))
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+
+
+def test_middleware_records_route_template_and_queries(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    instrument_engine(engine)
+    app = FastAPI()
+
+    @app.get("/metrics-test/{item_id}")
+    def read_item(item_id: int) -> dict:
+        with engine.connect() as connection:
+            for _ in range(item_id):
+                connection.execute(text("SELECT 1"))
+        return {"id": item_id}
+
+    app.add_middleware(QueryStatsMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    client = TestClient(app)
+    client.get("/metrics-test/3")
+    client.get("/metrics-test/2")
+
+    route = "/metrics-test/{item_id}"
+    assert HTTP_REQUESTS.value(method="GET", route=route, status=200) == 2
+    rendered = DB_QUERIES_PER_REQUEST.render()
+    assert f'db_queries_per_request_sum{{method="GET",route="{route}"}} 5' in rendered
+    assert f'db_queries_per_request_count{{method="GET",route="{route}"}} 2' in rendered
+    engine.dispose()
+
+
+def test_pool_metrics(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool, pool_size=1)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    rendered = "\n".join(metric.render() for metric in pool_metrics({"primary": engine}))
+
+    assert 'db_pool_size{pool="primary"} 1' in rendered
+    assert 'db_pool_checkouts_total{pool="primary"} 1' in rendered
+    assert 'db_pool_checkout_wait_seconds_bucket{pool="primary",le="+Inf"} 1' in rendered
+    assert 'db_pool_checkout_wait_seconds_count{pool="primary"} 1' in rendered
+    engine.dispose()
+
+
+def test_metrics_token(monkeypatch: pytest.MonkeyPatch) -> None:
+    app = FastAPI()
+    app.include_router(metrics_route.router)
+    client = TestClient(app)
+
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-token")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+    assert response.status_code == 200
+    assert "http_requests_total" in response.text
+
+    monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+    assert client.get("/metrics").status_code == 200
@@ -0,0 +1,79 @@
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.core.query_stats import QueryStatsMiddleware, instrument_engine, normalize_statement
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'queries.db'}")
+    instrument_engine(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_normalize_statement() -> None:
+    statement = """
+        SELECT coupon.id FROM coupon
+        WHERE coupon.id IN (%(id_1_1)s, %(id_1_2)s) AND coupon.code = 'it''s'
+        LIMIT 10
+    """
+    assert normalize_statement(statement) == (
+        "SELECT coupon.id FROM coupon WHERE coupon.id IN (...) AND coupon.code = ? LIMIT ?"
+    )
+    # Lists of any length normalize to the same statement
+    assert normalize_statement("SELECT 1 WHERE x IN (?)") == normalize_statement("SELECT 1 WHERE x IN (?, ?, ?)")
+
+
+def test_server_timing_counts_request_queries(engine) -> None:
+    app = FastAPI()
+
+    @app.get("/queries/{count}")
+    def run_queries(count: int) -> dict:
+        with engine.connect() as connection:
+            for _ in range(count):
+                connection.execute(text("SELECT 1"))
+        return {}
+
+    app.add_middleware(QueryStatsMiddleware)
+    client = TestClient(app)
+
+    # Statements outside a request are not counted towards the next one
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    timing = client.get("/queries/3").headers["Server-Timing"]
+    assert timing.startswith("db;dur=")
+    assert timing.endswith('desc="3 queries"')
+    assert client.get("/queries/0").headers["Server-Timing"].endswith('desc="0 queries"')
+
+
+def test_failed_statement_is_not_timed_into_the_next(engine) -> None:
+    with engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.execute(text("SELECT * FROM missing_table"))
+        connection.execute(text("SELECT 1"))
+        assert connection.info.get("query_start") == []
+
+
+def test_slow_queries_are_logged(engine, monkeypatch, caplog) -> None:
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 1e-6)
+    with caplog.at_level(logging.WARNING, logger="app.slow_query"):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 42"), {})
+
+    [record] = caplog.records
+    assert record.getMessage().endswith("SELECT ?")
+    assert record.duration_ms >= 0
+
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0)
+    caplog.clear()
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 42"))
+    assert caplog.records == []
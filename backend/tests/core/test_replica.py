@@ -0,0 +1,72 @@
+from app.core.replica import PrimaryPins, read_engine_for
+from app.core.response_cache import InMemoryCacheBackend
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_pin_expires_after_ttl() -> None:
+    clock = FakeClock()
+    pins = PrimaryPins(ttl=5, clock=clock)
+
+    pins.pin("user-1")
+    assert pins.is_pinned("user-1")
+    assert not pins.is_pinned("user-2")
+
+    clock.now = 4.9
+    assert pins.is_pinned("user-1")
+    clock.now = 5
+    assert not pins.is_pinned("user-1")
+
+
+def test_pin_is_extended_by_later_writes() -> None:
+    clock = FakeClock()
+    pins = PrimaryPins(ttl=5, clock=clock)
+
+    pins.pin("user-1")
+    clock.now = 4
+    pins.pin("user-1")
+    clock.now = 8
+    assert pins.is_pinned("user-1")
+
+
+def test_anonymous_and_disabled_pins() -> None:
+    pins = PrimaryPins(ttl=0)
+    pins.pin("user-1")
+    pins.pin(None)
+
+    assert not pins.is_pinned("user-1")
+    assert not pins.is_pinned(None)
+
+
+def test_pins_are_seen_by_every_process_sharing_the_backend() -> None:
+    # Two workers pointed at the same (Redis) backend
+    clock = FakeClock()
+    backend = InMemoryCacheBackend(max_entries=10, clock=clock)
+    worker, other_worker = PrimaryPins(ttl=5, backend=backend), PrimaryPins(ttl=5, backend=backend)
+
+    worker.pin("user-1")
+    assert other_worker.is_pinned("user-1")
+    clock.now = 5
+    assert not other_worker.is_pinned("user-1")
+
+    worker.pin("user-1")
+    other_worker.clear()
+    assert not worker.is_pinned("user-1")
+
+
+def test_read_engine_for() -> None:
+    pins = PrimaryPins(ttl=5)
+    primary, replica = object(), object()
+    pins.pin("user-1")
+
+    assert read_engine_for(None, primary, replica, pins) is replica
+    assert read_engine_for("user-2", primary, replica, pins) is replica
+    assert read_engine_for("user-1", primary, replica, pins) is primary
+    # Without a replica everything reads from the primary
+    assert read_engine_for(None, primary, primary, pins) is primary
@@ -0,0 +1,113 @@
+from app.core.response_cache import InMemoryCacheBackend, ResponseCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _cache(clock: FakeClock, ttl: float = 30, max_entries: int = 10) -> ResponseCache:
+    return ResponseCache(InMemoryCacheBackend(max_entries, clock=clock), "test", ttl=ttl, clock=clock)
+
+
+def test_entries_expire_after_ttl() -> None:
+    clock = FakeClock()
+    cache = _cache(clock)
+    key = cache.key(("general", None, False, 0, 100))
+    cache.set(key, b"page")
+
+    clock.now += 29.9
+    assert cache.get(key) == b"page"
+    clock.now += 0.1
+    assert cache.get(key) is None
+
+
+def test_entries_expire_exactly_at_expires_at() -> None:
+    clock = FakeClock()
+    cache = _cache(clock)
+    key = cache.key((None, None, False, 0, 100))
+    # An announcement in the page expires in 5 seconds, well before the TTL
+    cache.set(key, b"page", expires_at=clock.now + 5)
+
+    clock.now += 4.999
+    assert cache.get(key) == b"page"
+    clock.now = 1005
+    assert cache.get(key) is None
+
+
+def test_already_expired_responses_are_not_cached() -> None:
+    clock = FakeClock()
+    cache = _cache(clock)
+    key = cache.key((None, None, False, 0, 100))
+    cache.set(key, b"page", expires_at=clock.now - 1)
+
+    assert cache.get(key) is None
+
+
+def test_invalidate_drops_every_page() -> None:
+    clock = FakeClock()
+    cache = _cache(clock)
+    first, second = cache.key(("a", None, False, 0, 10)), cache.key(("b", None, True, 10, 10))
+    cache.set(first, b"first")
+    cache.set(second, b"second")
+
+    cache.invalidate()
+
+    assert cache.get(cache.key(("a", None, False, 0, 10))) is None
+    assert cache.get(cache.key(("b", None, True, 10, 10))) is None
+
+
+def test_response_loaded_during_a_write_is_not_served() -> None:
+    clock = FakeClock()
+    cache = _cache(clock)
+    params = (None, None, False, 0, 100)
+
+    key = cache.key(params)  # request starts loading the page
+    cache.invalidate()  # a write commits meanwhile
+    cache.set(key, b"stale page")
+
+    assert cache.get(cache.key(params)) is None
+
+
+def test_least_recently_used_entry_is_evicted() -> None:
+    clock = FakeClock()
+    cache = _cache(clock, max_entries=2)
+    keys = [cache.key((str(i), None, False, 0, 100)) for i in range(3)]
+    cache.set(keys[0], b"0")
+    cache.set(keys[1], b"1")
+    cache.get(keys[0])
+    cache.set(keys[2], b"2")
+
+    assert cache.get(keys[0]) == b"0"
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) == b"2"
+
+
+def test_zero_ttl_disables_caching() -> None:
+    clock = FakeClock()
+    cache = _cache(clock, ttl=0)
+    key = cache.key((None, None, False, 0, 100))
+    cache.set(key, b"page")
+
+    assert not cache.enabled
+    assert cache.get(key) is None
+
+
+def test_nothing_is_stored_while_a_write_settles() -> None:
+    clock = FakeClock()
+    cache = ResponseCache(
+        InMemoryCacheBackend(10, clock=clock), "test", ttl=30, clock=clock, settle_seconds=5
+    )
+    params = (None, None, False, 0, 100)
+
+    cache.invalidate()
+    # Loaded after the write, but maybe from a replica that hasn't replayed it yet
+    cache.set(cache.key(params), b"maybe stale page")
+    assert cache.get(cache.key(params)) is None
+
+    clock.now += 5
+    cache.set(cache.key(params), b"page")
+    assert cache.get(cache.key(params)) == b"page"
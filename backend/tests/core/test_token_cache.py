@@ -0,0 +1,71 @@
+from app.core.token_cache import VerifiedTokenCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_hit_and_miss_counters() -> None:
+    clock = FakeClock()
+    cache = VerifiedTokenCache(max_size=10, clock=clock)
+    claims = {"sub": "user-1", "exp": clock.now + 60}
+
+    assert cache.get("token") is None
+    cache.set("token", claims)
+    assert cache.get("token") == claims
+    assert cache.get("token") == claims
+    assert cache.stats() == {"size": 1, "max_size": 10, "hits": 2, "misses": 1}
+
+
+def test_claims_are_never_served_past_expiry() -> None:
+    clock = FakeClock()
+    cache = VerifiedTokenCache(max_size=10, clock=clock)
+    cache.set("token", {"sub": "user-1", "exp": clock.now + 60})
+
+    clock.now += 59.9
+    assert cache.get("token") is not None
+    clock.now += 0.1
+    assert cache.get("token") is None
+    assert len(cache) == 0
+
+
+def test_expired_entries_are_swept_on_insert() -> None:
+    clock = FakeClock()
+    cache = VerifiedTokenCache(max_size=10, clock=clock)
+    cache.set("short", {"exp": clock.now + 10})
+    cache.set("long", {"exp": clock.now + 100})
+
+    clock.now += 10
+    cache.set("other", {"exp": clock.now + 100})
+    assert len(cache) == 2
+    assert cache.get("short") is None
+
+
+def test_least_recently_used_entry_is_evicted() -> None:
+    clock = FakeClock()
+    cache = VerifiedTokenCache(max_size=2, clock=clock)
+    exp = clock.now + 60
+    cache.set("a", {"sub": "a", "exp": exp})
+    cache.set("b", {"sub": "b", "exp": exp})
+    cache.get("a")
+    cache.set("c", {"sub": "c", "exp": exp})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_tokens_without_expiry_or_disabled_cache_are_not_stored() -> None:
+    clock = FakeClock()
+    cache = VerifiedTokenCache(max_size=10, clock=clock)
+    cache.set("no-exp", {"sub": "user-1"})
+    cache.set("expired", {"sub": "user-1", "exp": clock.now - 1})
+    assert len(cache) == 0
+
+    disabled = VerifiedTokenCache(max_size=0, clock=clock)
+    disabled.set("token", {"exp": clock.now + 60})
+    assert disabled.get("token") is None
@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from sqlmodel import Session
+
+from app import crud
+from app.models import AnnouncementCreate
+from tests.utils.utils import random_lower_string
+
+
+def _create_announcement(db: Session, title: str, description: str | None = None):
+    announcement_in = AnnouncementCreate(
+        title=title, description=description, category="general", is_published=True
+    )
+    return crud.create_announcement(session=db, announcement_in=announcement_in)
+
+
+def test_search_announcements_full_text(db: Session) -> None:
+    word = random_lower_string()[:12]
+    in_title = _create_announcement(db, f"{word} sale", f"{word} everything must go")
+    in_description = _create_announcement(db, "Weekly news", f"Don't miss the {word} deals")
+    _create_announcement(db, "Unrelated", "Nothing to see here")
+
+    found = crud.get_published_announcements(session=db, search=word[:6])
+
+    # Prefix match on every word, title and description hits ranked above description only
+    assert [a.id for a in found] == [in_title.id, in_description.id]
+    assert crud.get_announcements(session=db, search=f"{word} sale") == [in_title]
+
+
+def test_search_announcements_ignores_punctuation(db: Session) -> None:
+    word = random_lower_string()[:12]
+    announcement = _create_announcement(db, f"{word} offer")
+
+    assert crud.get_announcements(session=db, search=f"'{word}' & !") == [announcement]
+    assert len(crud.get_announcements(session=db, search="&!", limit=1)) == 1
+
+
+def test_next_published_announcements_change(db: Session) -> None:
+    word = random_lower_string()[:12]
+    now = datetime(2100, 1, 1)
+
+    def create(title: str, **fields):
+        fields.setdefault("is_published", True)
+        announcement_in = AnnouncementCreate(title=f"{word} {title}", category="general", **fields)
+        return crud.create_announcement(session=db, announcement_in=announcement_in)
+
+    expiring = create("expiring", expiry_date=datetime(2100, 1, 3))
+    crud.delete_announcement(session=db, announcement=create("deleted", expiry_date=datetime(2100, 1, 2)))
+    create("draft", expiry_date=datetime(2100, 1, 2), is_published=False)
+    create("new", created_date=datetime(2099, 12, 23))
+
+    # Deleted and unpublished announcements never show up, so they don't count
+    assert crud.next_published_announcements_change(session=db, now=now) == datetime(2100, 1, 3)
+    # "new" stops being new 10 days after its creation
+    assert crud.next_published_announcements_change(
+        session=db, now=now, include_new=True
+    ) == datetime(2100, 1, 2)
+
+    # The announcement drops out exactly at its expiry date
+    before = crud.get_published_announcements(session=db, search=word, now=datetime(2100, 1, 2, 23, 59, 59))
+    at = crud.get_published_announcements(session=db, search=word, now=datetime(2100, 1, 3))
+    assert expiring.id in [a.id for a in before]
+    assert expiring.id not in [a.id for a in at]
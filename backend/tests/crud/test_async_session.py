@@ -0,0 +1,96 @@
+import asyncio
+import uuid
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import crud
+from app.api.deps import Database
+from app.core.config import settings
+from app.models import AnnouncementCreate, Coupon
+from app.schemas import CouponCreate
+from app.services.coupon_service import CouponService
+from tests.utils.campaign import create_random_campaign
+from tests.utils.user import create_random_user
+from tests.utils.utils import random_lower_string
+
+
+def _run(function, **kwargs):
+    """Run `function` through the Database of the async routes on a fresh AsyncSession and event loop"""
+
+    async def main():
+        # NullPool: pooled connections can't outlive the event loop they were opened on
+        engine = create_async_engine(str(settings.SQLALCHEMY_DATABASE_URI), poolclass=NullPool)
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                return await Database(session).run(function, **kwargs)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def _add_coupon(db: Session, campaign_id: uuid.UUID, **fields) -> Coupon:
+    coupon_in = CouponCreate(
+        code=random_lower_string()[:20],
+        campaign_id=campaign_id,
+        discount_type="fixed",
+        discount_value=5,
+        **fields,
+    )
+    return crud.create_coupon(session=db, coupon_in=coupon_in)
+
+
+def test_async_user_coupons_match_sync(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    user = create_random_user(db)
+    held = _add_coupon(db, campaign.id, assigned_to_user_id=user.id)
+    _add_coupon(db, campaign.id)
+
+    coupons = _run(crud.get_user_coupons, user_id=user.id)
+    for_campaign = _run(crud.get_user_coupon_for_campaign, user_id=user.id, campaign_id=campaign.id)
+
+    assert [c.id for c in coupons] == [c.id for c in crud.get_user_coupons(session=db, user_id=user.id)]
+    assert [c.id for c in coupons] == [held.id]
+    assert for_campaign.id == held.id
+
+
+def test_async_published_announcements_match_sync(db: Session) -> None:
+    word = random_lower_string()[:12]
+    for title in (f"{word} one", f"{word} two"):
+        crud.create_announcement(
+            session=db,
+            announcement_in=AnnouncementCreate(title=title, category="general", is_published=True),
+        )
+
+    found = _run(crud.get_published_announcements, search=word)
+
+    expected = crud.get_published_announcements(session=db, search=word)
+    assert len(found) == 2
+    assert [a.id for a in found] == [a.id for a in expected]
+
+
+def test_async_campaign_coupon_stats_match_sync(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    _add_coupon(db, campaign.id)
+    _add_coupon(db, campaign.id, assigned_to_user_id=create_random_user(db).id)
+
+    stats = _run(crud.get_campaign_coupon_stats, campaign_id=campaign.id)
+    empty = _run(crud.get_campaign_coupon_stats, campaign_id=uuid.uuid4())
+
+    assert stats == crud.get_campaign_coupon_stats(session=db, campaign_id=campaign.id)
+    assert empty == {"total": 0, "assigned": 0, "unassigned": 0, "redeemed": 0}
+
+
+def test_async_redeem_coupon(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    user = create_random_user(db)
+    coupon = _add_coupon(db, campaign.id, assigned_to_user_id=user.id)
+
+    redeemed = _run(lambda session: CouponService(session).redeem_coupon(coupon.id, user))
+
+    assert redeemed.redeemed is True
+    assert redeemed.redeemed_at is not None
+    assert crud.get_campaign_coupon_stats(session=db, campaign_id=campaign.id)["redeemed"] == 1
@@ -0,0 +1,225 @@
+import uuid
+
+from sqlmodel import Session, update
+
+from app import crud
+from app.core.db import engine
+from app.models import Coupon
+from app.schemas import CouponCreate, CouponUpdate
+from tests.utils.campaign import create_random_campaign
+from tests.utils.user import create_random_user
+from tests.utils.utils import random_lower_string
+
+
+def _add_coupon(db: Session, campaign_id: uuid.UUID, **fields) -> Coupon:
+    coupon_in = CouponCreate(
+        code=random_lower_string()[:20],
+        campaign_id=campaign_id,
+        discount_type="fixed",
+        discount_value=5,
+        **fields,
+    )
+    return crud.create_coupon(session=db, coupon_in=coupon_in)
+
+
+def test_get_campaign_coupon_stats(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    user = create_random_user(db)
+    _add_coupon(db, campaign.id)
+    _add_coupon(db, campaign.id)
+    _add_coupon(db, campaign.id, assigned_to_user_id=user.id)
+    _add_coupon(db, campaign.id, assigned_to_user_id=user.id, redeemed=True)
+
+    stats = crud.get_campaign_coupon_stats(session=db, campaign_id=campaign.id)
+
+    assert stats == {"total": 4, "assigned": 2, "unassigned": 2, "redeemed": 1}
+
+
+def test_coupon_stats_follow_updates_and_deletes(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    other_campaign = create_random_campaign(db)
+    user = create_random_user(db)
+    coupon = _add_coupon(db, campaign.id)
+
+    crud.update_coupon(
+        session=db, coupon=coupon, coupon_in=CouponUpdate(assigned_to_user_id=user.id)
+    )
+    crud.redeem_coupon(session=db, coupon=coupon)
+    assert crud.get_campaign_coupon_stats(session=db, campaign_id=campaign.id) == {
+        "total": 1, "assigned": 1, "unassigned": 0, "redeemed": 1
+    }
+
+    crud.update_coupon(
+        session=db, coupon=coupon, coupon_in=CouponUpdate(campaign_id=other_campaign.id)
+    )
+    assert crud.get_campaign_coupon_stats(session=db, campaign_id=campaign.id)["total"] == 0
+    assert crud.get_campaign_coupon_stats(session=db, campaign_id=other_campaign.id)["redeemed"] == 1
+
+    crud.delete_coupon(session=db, coupon=coupon)
+    assert crud.get_campaign_coupon_stats(session=db, campaign_id=other_campaign.id) == {
+        "total": 0, "assigned": 0, "unassigned": 0, "redeemed": 0
+    }
+
+
+def test_rebuild_campaign_coupon_stats(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    _add_coupon(db, campaign.id)
+    _add_coupon(db, campaign.id)
+    # Change coupons behind the counters' back
+    db.execute(update(Coupon).where(Coupon.campaign_id == campaign.id).values(redeemed=True))
+    db.commit()
+    assert crud.get_campaign_coupon_stats(session=db, campaign_id=campaign.id)["redeemed"] == 0
+
+    crud.rebuild_campaign_coupon_stats(session=db)
+
+    assert crud.get_campaign_coupon_stats(session=db, campaign_id=campaign.id) == {
+        "total": 2, "assigned": 0, "unassigned": 2, "redeemed": 2
+    }
+
+
+def test_get_campaigns_with_coupon_stats(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    empty_campaign = create_random_campaign(db)
+    _add_coupon(db, campaign.id, redeemed=True)
+    _add_coupon(db, campaign.id)
+
+    campaigns, count = crud.get_campaigns_with_coupon_stats(session=db, search=campaign.title)
+
+    assert count == 1
+    assert [c.id for c, _ in campaigns] == [campaign.id]
+    assert campaigns[0][1] == {"total": 2, "assigned": 0, "unassigned": 2, "redeemed": 1}
+
+    campaigns, _ = crud.get_campaigns_with_coupon_stats(session=db, search=empty_campaign.title)
+    assert campaigns[0][1] == {"total": 0, "assigned": 0, "unassigned": 0, "redeemed": 0}
+
+
+def test_get_campaigns_with_coupon_stats_paginates(db: Session) -> None:
+    for _ in range(3):
+        create_random_campaign(db)
+
+    campaigns, count = crud.get_campaigns_with_coupon_stats(session=db, limit=2)
+    rest, _ = crud.get_campaigns_with_coupon_stats(session=db, skip=2, limit=count)
+
+    assert len(campaigns) == 2
+    assert count >= 3
+    assert len(rest) == count - 2
+    assert not {c.id for c, _ in campaigns} & {c.id for c, _ in rest}
+
+    # Without a limit every campaign is listed
+    everything, _ = crud.get_campaigns_with_coupon_stats(session=db)
+    assert len(everything) == count
+
+
+def test_get_coupons_page_walks_all_pages(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    created = {_add_coupon(db, campaign.id).id for _ in range(5)}
+    filters = crud.coupon_filters(campaign_id=campaign.id)
+
+    seen = []
+    cursor = None
+    while True:
+        coupons, cursor = crud.get_coupons_page(session=db, filters=filters, limit=2, cursor=cursor)
+        seen.extend(coupons)
+        if cursor is None:
+            break
+
+    assert {c.id for c in seen} == created
+    assert len(seen) == 5
+    keys = [(c.created_at, c.id) for c in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_count_coupons_modes(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    for _ in range(3):
+        _add_coupon(db, campaign.id)
+    filters = crud.coupon_filters(campaign_id=campaign.id)
+
+    assert crud.count_coupons(session=db, filters=filters, mode="exact") == 3
+    assert crud.count_coupons(session=db, filters=filters, mode="none") is None
+    assert crud.count_coupons(session=db, filters=filters, mode="estimated") >= 0
+    assert crud.count_coupons(session=db, filters=[], mode="estimated") >= 0
+
+
+def test_coupon_code_search(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    prefix = random_lower_string()[:8].upper()
+    matching = crud.create_coupon(
+        session=db,
+        coupon_in=CouponCreate(
+            code=f"{prefix}-50_OFF", campaign_id=campaign.id, discount_type="fixed", discount_value=5
+        ),
+    )
+    crud.create_coupon(
+        session=db,
+        coupon_in=CouponCreate(
+            code=f"{prefix}-5X0OFF", campaign_id=campaign.id, discount_type="fixed", discount_value=5
+        ),
+    )
+
+    def search(term: str, mode: crud.SearchMode = "contains") -> set[str]:
+        filters = crud.coupon_filters(search=term, search_mode=mode, campaign_id=campaign.id)
+        return {c.code for c in crud.get_coupons_page(session=db, filters=filters)[0]}
+
+    # Substring, case-insensitive, LIKE wildcards taken literally
+    assert search("50_off") == {matching.code}
+    # Short terms are substring matches too
+    assert search("_o") == {matching.code}
+    # Prefix matches only when asked for
+    assert len(search(prefix.lower(), "prefix")) == 2
+    assert search("50", "prefix") == set()
+
+
+def test_user_coupons_version_follows_changes(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    user = create_random_user(db)
+
+    def version() -> tuple[str, object]:
+        return crud.get_rows_version(session=db, statement=crud.user_coupons_version_statement(user.id))
+
+    empty, last_modified = version()
+    assert last_modified is None
+
+    coupon = _add_coupon(db, campaign.id, assigned_to_user_id=user.id)
+    assigned = version()
+    assert assigned[0] != empty
+    assert version() == assigned
+
+    # Redeeming bumps updated_at through the trigger
+    crud.redeem_coupon(session=db, coupon=coupon)
+    redeemed = version()
+    assert redeemed[0] != assigned[0]
+    assert redeemed[1] > assigned[1]
+
+    # A coupon leaving the listing changes the version too
+    db.exec(update(Coupon).where(Coupon.id == coupon.id).values(assigned_to_user_id=None))
+    db.commit()
+    assert version()[0] == empty
+
+
+def test_get_coupons_by_codes(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    codes = [_add_coupon(db, campaign.id).code for _ in range(5)]
+
+    coupons = crud.get_coupons_by_codes(session=db, codes=codes + ["missing"], chunk_size=2)
+    assert sorted(coupon.code for coupon in coupons) == sorted(codes)
+
+
+def test_coupon_stats_use_the_current_row_state(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    user = create_random_user(db)
+    coupon = _add_coupon(db, campaign.id)
+    assert coupon.assigned_to_user_id is None
+
+    # Another request assigns the coupon after this one loaded it
+    with Session(engine) as other:
+        other_coupon = other.get_one(Coupon, coupon.id)
+        crud.update_coupon(
+            session=other, coupon=other_coupon, coupon_in=CouponUpdate(assigned_to_user_id=user.id)
+        )
+
+    crud.delete_coupon(session=db, coupon=coupon)
+
+    assert crud.get_campaign_coupon_stats(session=db, campaign_id=campaign.id) == {
+        "total": 0, "assigned": 0, "unassigned": 0, "redeemed": 0
+    }
@@ -0,0 +1,115 @@
+"""
+Every hot crud query must be served by an index
+
+The queries run against a seeded dataset large enough for the planner to
+prefer an index; each SELECT they send is EXPLAINed and the test fails if it
+reads the coupon or announcement table with a sequential scan.
+"""
+import uuid
+from collections.abc import Callable, Generator
+from datetime import datetime, timedelta
+from typing import Any
+
+import pytest
+from sqlalchemy import delete, insert, text, update
+from sqlmodel import Session, select
+
+from app import crud
+from app.core.db import engine
+from app.models import Announcement, Campaign, Coupon, User
+from app.services.coupon_service import CouponService
+from tests.utils.campaign import create_random_campaign
+from tests.utils.query_plans import capture_statements, explain, seq_scanned_tables
+from tests.utils.user import create_random_user
+from tests.utils.utils import random_lower_string
+
+COUPONS_PER_CAMPAIGN = 10000
+ANNOUNCEMENTS = 3000
+CHECKED_TABLES = {"coupon", "announcement"}
+
+
+@pytest.fixture(scope="module")
+def seeded(db: Session) -> Generator[dict[str, Any], None, None]:
+    campaign = create_random_campaign(db)
+    other_campaign = create_random_campaign(db)
+    user = create_random_user(db)
+    service = CouponService(db)
+    service.generate_coupons(campaign.id, COUPONS_PER_CAMPAIGN)
+    service.generate_coupons(other_campaign.id, COUPONS_PER_CAMPAIGN)
+
+    # Hand a few coupons of the campaign to the user
+    some_coupons = select(Coupon.id).where(Coupon.campaign_id == campaign.id).limit(20)
+    db.execute(update(Coupon).where(Coupon.id.in_(some_coupons)).values(assigned_to_user_id=user.id))
+
+    now = datetime.utcnow()
+    words = [random_lower_string()[:10] for _ in range(ANNOUNCEMENTS)]
+    announcement_ids = [uuid.uuid4() for _ in range(ANNOUNCEMENTS)]
+    db.execute(
+        insert(Announcement),
+        [
+            {
+                "id": announcement_ids[i],
+                "title": f"{words[i]} announcement {i}",
+                "description": random_lower_string(),
+                "category": f"category-{i % 20}",
+                "requires_coupon": False,
+                "is_published": i % 3 != 0,
+                "created_date": now - timedelta(hours=i),
+                "expiry_date": now + timedelta(days=30) if i % 2 else None,
+                "deleted_at": now if i % 10 == 0 else None,
+            }
+            for i in range(ANNOUNCEMENTS)
+        ],
+    )
+    db.execute(text("ANALYZE coupon"))
+    db.execute(text("ANALYZE announcement"))
+    db.commit()
+    code = db.exec(select(Coupon.code).where(Coupon.campaign_id == campaign.id)).first()
+    yield {"campaign": campaign, "user": user, "code": code, "word": words[42]}
+
+    # Leave the database as small as the other modules expect it
+    db.rollback()
+    campaign_ids = [campaign.id, other_campaign.id]
+    db.execute(delete(Coupon).where(Coupon.campaign_id.in_(campaign_ids)))
+    db.execute(delete(Campaign).where(Campaign.id.in_(campaign_ids)))
+    db.execute(delete(Announcement).where(Announcement.id.in_(announcement_ids)))
+    db.execute(delete(User).where(User.id == user.id))
+    db.commit()
+
+
+CASES: dict[str, Callable[[Session, dict[str, Any]], Any]] = {
+    "user coupons": lambda s, d: crud.get_user_coupons(session=s, user_id=d["user"].id),
+    "user coupon for campaign": lambda s, d: crud.get_user_coupon_for_campaign(
+        session=s, user_id=d["user"].id, campaign_id=d["campaign"].id
+    ),
+    "unassigned coupons": lambda s, d: crud.get_unassigned_coupons(
+        session=s, campaign_id=d["campaign"].id, limit=100
+    ),
+    "coupon page": lambda s, d: crud.get_coupons_page(session=s, filters=[]),
+    "coupon page of campaign": lambda s, d: crud.get_coupons_page(
+        session=s, filters=crud.coupon_filters(campaign_id=d["campaign"].id)
+    ),
+    "coupon code search": lambda s, d: crud.get_coupons_page(
+        session=s, filters=crud.coupon_filters(search=d["code"][-6:])
+    ),
+    "coupon code prefix": lambda s, d: crud.get_coupons_page(
+        session=s, filters=crud.coupon_filters(search=d["code"], search_mode="prefix")
+    ),
+    "announcements": lambda s, d: crud.get_announcements(session=s),
+    "published announcements": lambda s, d: crud.get_published_announcements(session=s),
+    "announcement search": lambda s, d: crud.get_published_announcements(session=s, search=d["word"]),
+}
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_query_uses_indexes(db: Session, seeded: dict[str, Any], name: str) -> None:
+    with capture_statements(engine) as statements:
+        CASES[name](db, seeded)
+    db.rollback()
+
+    assert statements
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            plan = explain(connection, statement, parameters)
+            scanned = seq_scanned_tables(plan) & CHECKED_TABLES
+            assert not scanned, f"{name}: sequential scan on {scanned}\n{statement}"
@@ -0,0 +1,80 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Callable
+from typing import Any
+
+from sqlmodel import Session, select
+
+from app import crud
+from app.core.db import engine
+from app.models import Coupon
+from app.services.coupon_service import CouponService
+from tests.utils.campaign import create_random_campaign
+from tests.utils.user import create_random_user
+
+WORKERS = 8
+
+
+def _run_concurrently(calls: list[Callable[[CouponService], Any]]) -> list[Any]:
+    """Run each call in its own thread and session, all starting at once; exceptions are returned"""
+    barrier = threading.Barrier(len(calls))
+
+    def run(call: Callable[[CouponService], Any]) -> Any:
+        with Session(engine) as session:
+            barrier.wait()
+            try:
+                return call(CouponService(session))
+            except Exception as e:
+                return e
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        return list(pool.map(run, calls))
+
+
+def test_concurrent_redeems_redeem_once(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    user = create_random_user(db)
+    service = CouponService(db)
+    service.generate_coupons(campaign.id, 1)
+    coupon_id = db.exec(select(Coupon.id).where(Coupon.campaign_id == campaign.id)).one()
+    service.assign_coupon_to_user(coupon_id, user.id)
+
+    results = _run_concurrently(
+        [lambda s: s.redeem_coupon(coupon_id, user) for _ in range(WORKERS)]
+    )
+
+    redeemed = [r for r in results if isinstance(r, Coupon)]
+    errors = [r for r in results if isinstance(r, Exception)]
+    assert len(redeemed) == 1
+    assert all(str(e) == "Coupon already redeemed" for e in errors)
+    assert crud.get_campaign_coupon_stats(session=db, campaign_id=campaign.id)["redeemed"] == 1
+
+
+def test_concurrent_claims_take_distinct_coupons(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    users = [create_random_user(db) for _ in range(WORKERS)]
+    CouponService(db).generate_coupons(campaign.id, WORKERS - 2)
+
+    results = _run_concurrently(
+        [lambda s, user=user: s.claim_next_coupon(campaign.id, user) for user in users]
+    )
+
+    claimed = [r for r in results if isinstance(r, Coupon)]
+    errors = [r for r in results if isinstance(r, Exception)]
+    assert len(claimed) == WORKERS - 2
+    assert len({coupon.id for coupon in claimed}) == WORKERS - 2
+    assert all(str(e) == "No coupons left for this campaign" for e in errors)
+    assert crud.get_campaign_coupon_stats(session=db, campaign_id=campaign.id)["assigned"] == WORKERS - 2
+
+
+def test_claim_returns_the_coupon_already_held(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    user = create_random_user(db)
+    service = CouponService(db)
+    service.generate_coupons(campaign.id, 2)
+
+    first = service.claim_next_coupon(campaign.id, user)
+    second = service.claim_next_coupon(campaign.id, user)
+
+    assert first.id == second.id
+    assert crud.get_campaign_coupon_stats(session=db, campaign_id=campaign.id)["assigned"] == 1
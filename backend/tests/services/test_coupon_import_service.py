@@ -0,0 +1,127 @@
+import io
+import uuid
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+from sqlmodel import Session, select
+
+from app.models import Coupon
+from app.services.coupon_import_service import (
+    CouponImportError,
+    CouponImportService,
+    parse_expires_at,
+)
+from tests.utils.campaign import create_random_campaign
+from tests.utils.user import create_random_user
+from tests.utils.utils import random_lower_string
+
+
+def _csv(rows: list[str]) -> io.BytesIO:
+    header = "code,discount_type,discount_value,expires_at,user_id"
+    return io.BytesIO("\n".join([header, *rows]).encode())
+
+
+def test_parse_expires_at_formats() -> None:
+    values = pd.Series(
+        ["2027-01-01 00:00:54", "2027.01.01 00:00:54", "31/01/2027 00:00:54", None, "null", "", "garbage"]
+    )
+    parsed, invalid = parse_expires_at(values)
+    assert parsed[0] == pd.Timestamp("2027-01-01 00:00:54")
+    assert parsed[1] == pd.Timestamp("2027-01-01 00:00:54")
+    assert parsed[2] == pd.Timestamp("2027-01-31 00:00:54")
+    assert parsed[3:6].isna().all()
+    assert invalid.tolist() == [False, False, False, False, False, False, True]
+
+
+def test_import_csv_reports_row_errors(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    user = create_random_user(db)
+    prefix = random_lower_string()[:10]
+    rows = [
+        f"{prefix}-1,fixed,5,2027-01-01 00:00:00,",
+        f"{prefix}-2,percentage,10,,{user.id}",
+        f"{prefix}-1,fixed,5,,",
+        f"{prefix}-3,bogus,5,,",
+        f"{prefix}-4,fixed,abc,,",
+        f"{prefix}-5,fixed,5,not a date,",
+        f"{prefix}-6,fixed,5,,{uuid.uuid4()}",
+        f"{prefix}-7,fixed,5,,",
+    ]
+
+    report = CouponImportService(db, chunk_size=3).import_file(campaign.id, _csv(rows), "coupons.csv")
+
+    assert report["processed"] == 8
+    assert report["inserted"] == 3
+    assert report["failed"] == 5
+    assert [error["row"] for error in report["errors"]] == [4, 5, 6, 7, 8]
+
+    coupons = db.exec(select(Coupon).where(Coupon.campaign_id == campaign.id)).all()
+    by_code = {coupon.code: coupon for coupon in coupons}
+    assert set(by_code) == {f"{prefix}-1", f"{prefix}-2", f"{prefix}-7"}
+    assert by_code[f"{prefix}-1"].expires_at == datetime(2027, 1, 1)
+    assert by_code[f"{prefix}-2"].assigned_to_user_id == user.id
+
+
+def test_import_skips_existing_codes(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    code = random_lower_string()[:20]
+    service = CouponImportService(db)
+    service.import_file(campaign.id, _csv([f"{code},fixed,1,,"]), "coupons.csv")
+
+    report = service.import_file(campaign.id, _csv([f"{code},fixed,1,,"]), "coupons.csv")
+    assert report["inserted"] == 0
+    assert report["errors"][0]["error"] == "Coupon code already exists"
+
+
+def test_import_reports_duplicates_across_chunks(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    code = random_lower_string()[:20]
+    rows = [f"{code},fixed,1,,", f"{code}-a,fixed,1,,", f"{code}-b,fixed,1,,", f"{code},fixed,1,,"]
+
+    report = CouponImportService(db, chunk_size=2).import_file(campaign.id, _csv(rows), "coupons.csv")
+    assert report["inserted"] == 3
+    assert report["errors"] == [{"row": 5, "code": code, "error": "Duplicate coupon code in file"}]
+
+
+def test_import_xlsx_in_chunks(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    prefix = random_lower_string()[:10]
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["code", "discount_type", "discount_value", "expires_at"])
+    for i in range(7):
+        sheet.append([f"{prefix}-{i}", "fixed", i, datetime(2027, 1, 1)])
+    upload = io.BytesIO()
+    workbook.save(upload)
+    upload.seek(0)
+
+    report = CouponImportService(db, chunk_size=3).import_file(campaign.id, upload, "coupons.xlsx")
+    assert report["inserted"] == 7
+    assert report["failed"] == 0
+
+
+def test_import_xlsx_row_numbers_count_blank_rows(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    prefix = random_lower_string()[:10]
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["code", "discount_type", "discount_value"])
+    sheet.append([f"{prefix}-1", "fixed", 1])
+    sheet.append([None, None, None])
+    sheet.append([f"{prefix}-2", "unknown", 1])
+    upload = io.BytesIO()
+    workbook.save(upload)
+    upload.seek(0)
+
+    report = CouponImportService(db).import_file(campaign.id, upload, "coupons.xlsx")
+    assert report["processed"] == 2
+    assert [error["row"] for error in report["errors"]] == [4]
+
+
+def test_import_rejects_missing_columns(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    upload = io.BytesIO(b"code,discount_value\nA,1\n")
+    with pytest.raises(CouponImportError):
+        CouponImportService(db).import_file(campaign.id, upload, "coupons.csv")
@@ -0,0 +1,104 @@
+import itertools
+import uuid
+from collections import Counter
+
+import pytest
+from sqlmodel import Session, func, select
+
+from app import crud
+from app.models import Coupon, User
+from app.services import coupon_service
+from app.services.coupon_service import CouponService
+from tests.utils.campaign import create_random_campaign
+from tests.utils.user import create_random_user
+
+
+def _coupon_count(db: Session, campaign_id) -> int:
+    return db.exec(
+        select(func.count()).select_from(Coupon).where(Coupon.campaign_id == campaign_id)
+    ).one()
+
+
+def test_generate_coupons_in_chunks(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    service = CouponService(db)
+
+    codes = service.generate_coupons(campaign.id, 12, chunk_size=5)
+
+    assert len(codes) == 12
+    assert len(set(codes)) == 12
+    assert all(code.startswith(campaign.title[:3].upper()) for code in codes)
+    assert _coupon_count(db, campaign.id) == 12
+
+
+def test_generate_coupons_retries_code_collisions(
+    db: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    campaign = create_random_campaign(db)
+    service = CouponService(db)
+    existing = service.generate_coupons(campaign.id, 1)
+    taken = existing[0].split("-", 1)[1]
+
+    # First two draws collide with the existing code, the rest are fresh
+    fresh = (f"{i:08X}" for i in itertools.count())
+    draws = itertools.chain([taken, taken], fresh)
+    monkeypatch.setattr(coupon_service.secrets, "token_hex", lambda _n: next(draws).lower())
+
+    codes = service.generate_coupons(campaign.id, 3)
+    assert len(codes) == 3
+    assert existing[0] not in codes
+    assert _coupon_count(db, campaign.id) == 4
+
+
+def test_generate_coupons_unknown_campaign(db: Session) -> None:
+    with pytest.raises(ValueError):
+        CouponService(db).generate_coupons(uuid.uuid4(), 1)
+
+
+def _assignments(db: Session, campaign_id) -> Counter:
+    return Counter(
+        db.exec(
+            select(Coupon.assigned_to_user_id).where(
+                Coupon.campaign_id == campaign_id, Coupon.assigned_to_user_id.is_not(None)
+            )
+        ).all()
+    )
+
+
+def test_assign_round_robin_skips_users_holding_a_coupon(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    service = CouponService(db)
+    holder = create_random_user(db)
+    user_count = db.exec(select(func.count()).select_from(User)).one()
+    coupon_count = 2 * user_count + 3
+    service.generate_coupons(campaign.id, coupon_count + 1)
+    first = db.exec(select(Coupon).where(Coupon.campaign_id == campaign.id)).first()
+    service.assign_coupon_to_user(first.id, holder.id)
+
+    assigned = service.assign_campaign_to_all_users(campaign.id, batch_size=7)
+
+    assert assigned == coupon_count
+    per_user = _assignments(db, campaign.id)
+    assert per_user[holder.id] == 1
+    del per_user[holder.id]
+    assert len(per_user) == user_count - 1
+    assert max(per_user.values()) - min(per_user.values()) <= 1
+    assert crud.get_campaign_coupon_stats(session=db, campaign_id=campaign.id)["unassigned"] == 0
+
+
+def test_assign_one_per_user(db: Session) -> None:
+    campaign = create_random_campaign(db)
+    service = CouponService(db)
+    create_random_user(db)
+    user_count = db.exec(select(func.count()).select_from(User)).one()
+    service.generate_coupons(campaign.id, user_count + 5)
+
+    assigned = service.assign_campaign_to_all_users(campaign.id, mode="one_per_user", batch_size=3)
+
+    assert assigned == user_count
+    per_user = _assignments(db, campaign.id)
+    assert len(per_user) == user_count
+    assert set(per_user.values()) == {1}
+    # Everyone holds a coupon now, so a second run assigns nothing
+    assert service.assign_campaign_to_all_users(campaign.id, mode="one_per_user") == 0
+    assert crud.get_campaign_coupon_stats(session=db, campaign_id=campaign.id)["unassigned"] == 5
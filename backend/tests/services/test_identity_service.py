@@ -0,0 +1,100 @@
+import uuid
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app import crud
+from app.core.db import engine
+from app.schemas import UserCreate
+from app.services.identity_service import (
+    IdentityCache,
+    IdentityConflictError,
+    IdentityService,
+)
+from tests.utils.utils import random_email
+
+
+def _user_info(**overrides: object) -> dict:
+    info = {
+        "user_id": str(uuid.uuid4()),
+        "email": random_email(),
+        "full_name": "Test User",
+        "roles": ["user"],
+    }
+    info.update(overrides)
+    return info
+
+
+class StatementRecorder:
+    def __init__(self) -> None:
+        self.statements: list[str] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(statement.split(None, 1)[0].upper())
+
+    def __enter__(self) -> "StatementRecorder":
+        event.listen(engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        event.remove(engine, "before_cursor_execute", self)
+
+
+def test_sync_creates_user(db: Session) -> None:
+    info = _user_info(roles=["admin"])
+    user = IdentityService(db, cache=IdentityCache(ttl=300)).sync_user(info)
+    assert user.keycloak_user_id == info["user_id"]
+    assert user.email == info["email"]
+    assert user.is_superuser is True
+
+
+def test_unchanged_claims_do_not_write(db: Session) -> None:
+    service = IdentityService(db, cache=IdentityCache(ttl=300))
+    info = _user_info()
+    user = service.sync_user(info)
+
+    db.expire_all()
+    with StatementRecorder() as recorder:
+        assert service.sync_user(info).id == user.id
+    assert recorder.statements == ["SELECT"]
+
+
+def test_changed_claims_update_user(db: Session) -> None:
+    service = IdentityService(db, cache=IdentityCache(ttl=300))
+    info = _user_info()
+    user = service.sync_user(info)
+
+    renamed = service.sync_user({**info, "full_name": "Renamed User"})
+    assert renamed.id == user.id
+    assert renamed.full_name == "Renamed User"
+
+
+def test_cold_cache_with_unchanged_claims_is_not_an_update(db: Session) -> None:
+    info = _user_info()
+    user = IdentityService(db, cache=IdentityCache(ttl=300)).sync_user(info)
+
+    again = IdentityService(db, cache=IdentityCache(ttl=300)).sync_user(info)
+    assert again.id == user.id
+
+
+def test_existing_user_without_keycloak_id_is_linked_by_email(db: Session) -> None:
+    email = random_email()
+    legacy = crud.create_user(session=db, user_create=UserCreate(email=email))
+
+    info = _user_info(email=email)
+    user = IdentityService(db, cache=IdentityCache(ttl=300)).sync_user(info)
+    assert user.id == legacy.id
+    assert user.keycloak_user_id == info["user_id"]
+
+
+def test_email_linked_to_another_identity_is_not_taken_over(db: Session) -> None:
+    info = _user_info()
+    owner = IdentityService(db, cache=IdentityCache(ttl=300)).sync_user(info)
+
+    intruder = _user_info(email=info["email"])
+    with pytest.raises(IdentityConflictError):
+        IdentityService(db, cache=IdentityCache(ttl=300)).sync_user(intruder)
+
+    db.refresh(owner)
+    assert owner.keycloak_user_id == info["user_id"]
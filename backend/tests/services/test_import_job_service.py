@@ -0,0 +1,121 @@
+import io
+import itertools
+import uuid
+
+import pytest
+from sqlmodel import Session, func, select
+
+from app.core.db import engine
+from app.models import CouponImportJob
+from app.services.coupon_import_service import CouponImportError
+from app.services.import_job_service import ImportJobService, JobLocks, _job_lock_key
+from tests.utils.campaign import create_random_campaign
+from tests.utils.utils import random_lower_string
+
+
+def test_import_job_runs_in_background(db: Session, tmp_path) -> None:
+    campaign = create_random_campaign(db)
+    prefix = random_lower_string()[:10]
+    upload = io.BytesIO(
+        "\n".join(
+            [
+                "code,discount_type,discount_value",
+                f"{prefix}-1,fixed,5",
+                f"{prefix}-2,percentage,10",
+                f"{prefix}-1,fixed,5",
+            ]
+        ).encode()
+    )
+    service = ImportJobService(lambda: Session(engine), max_workers=1, spool_dir=str(tmp_path))
+    try:
+        job = service.submit(db, campaign.id, upload, "coupons.csv")
+        assert job.status == "queued"
+        service.wait(job.id, timeout=30)
+    finally:
+        service.shutdown()
+
+    db.expire_all()
+    job = db.get(CouponImportJob, job.id)
+    assert job.status == "succeeded"
+    assert job.rows_processed == 3
+    assert job.rows_inserted == 2
+    assert job.rows_failed == 1
+    assert job.errors[0]["error"] == "Duplicate coupon code in file"
+    assert job.finished_at is not None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_import_job_rejects_unsupported_files(db: Session, tmp_path) -> None:
+    campaign = create_random_campaign(db)
+    service = ImportJobService(max_workers=1, spool_dir=str(tmp_path))
+    try:
+        with pytest.raises(CouponImportError):
+            service.submit(db, campaign.id, io.BytesIO(b"data"), "coupons.txt")
+    finally:
+        service.shutdown()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_orphaned_jobs_are_failed(db: Session, tmp_path) -> None:
+    campaign = create_random_campaign(db)
+    orphan = CouponImportJob(campaign_id=campaign.id, filename="coupons.csv", status="running")
+    db.add(orphan)
+    db.commit()
+
+    service = ImportJobService(max_workers=1, spool_dir=str(tmp_path))
+    try:
+        # A job this process still owns is left alone
+        owned = service.submit(db, campaign.id, io.BytesIO(b"code,discount_type,discount_value\n"), "coupons.csv")
+        service.fail_orphaned_jobs()
+        service.wait(owned.id, timeout=30)
+    finally:
+        service.shutdown()
+
+    db.expire_all()
+    assert db.get(CouponImportJob, orphan.id).status == "failed"
+    assert db.get(CouponImportJob, owned.id).status == "succeeded"
+
+
+def test_errors_before_the_import_are_recorded(db: Session, tmp_path) -> None:
+    campaign = create_random_campaign(db)
+    sessions = itertools.count()
+
+    def session_factory() -> Session:
+        # The worker can't open its first session; recording the failure can
+        if next(sessions) == 0:
+            raise RuntimeError("database unavailable")
+        return Session(engine)
+
+    service = ImportJobService(session_factory, max_workers=1, spool_dir=str(tmp_path))
+    try:
+        job = service.submit(db, campaign.id, io.BytesIO(b"code,discount_type,discount_value\n"), "coupons.csv")
+        service.wait(job.id, timeout=30)
+    finally:
+        service.shutdown()
+
+    db.expire_all()
+    job = db.get(CouponImportJob, job.id)
+    assert job.status == "failed"
+    assert job.error == "database unavailable"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_job_locks_are_taken_again_after_a_lost_connection() -> None:
+    locks = JobLocks(engine)
+    held, new = uuid.uuid4(), uuid.uuid4()
+    try:
+        locks.acquire(held)
+        pid = locks._connection.execute(select(func.pg_backend_pid())).scalar()
+        with engine.connect() as other:
+            # What a server restart or a pooler recycling the connection does
+            other.execute(select(func.pg_terminate_backend(pid)))
+            other.commit()
+
+            locks.acquire(new)
+
+            for job_id in (held, new):
+                assert not other.execute(select(func.pg_try_advisory_lock(_job_lock_key(job_id)))).scalar()
+    finally:
+        locks.release(held)
+        locks.release(new)
+        locks.close()
@@ -0,0 +1,19 @@
+from datetime import datetime, timedelta
+
+from sqlmodel import Session
+
+from app import crud
+from app.models import Campaign
+from app.schemas import CampaignCreate
+from tests.utils.utils import random_lower_string
+
+
+def create_random_campaign(db: Session) -> Campaign:
+    now = datetime.utcnow()
+    campaign_in = CampaignCreate(
+        title=random_lower_string(),
+        description=random_lower_string(),
+        start_date=now,
+        end_date=now + timedelta(days=30),
+    )
+    return crud.create_campaign(session=db, campaign_in=campaign_in)
@@ -0,0 +1,39 @@
+from collections.abc import Generator, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from sqlalchemy import Engine, event
+from sqlalchemy.engine import Connection
+
+
+@contextmanager
+def capture_statements(
+    engine: Engine, selects_only: bool = True
+) -> Generator[list[tuple[str, Any]], None, None]:
+    """Collect the (SQL, parameters) of every SELECT, or every statement, sent to the database"""
+    statements: list[tuple[str, Any]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not selects_only or statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def explain(connection: Connection, statement: str, parameters: Any) -> dict:
+    return connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()[0]["Plan"]
+
+
+def _walk(plan: dict) -> Iterator[dict]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _walk(child)
+
+
+def seq_scanned_tables(plan: dict) -> set[str]:
+    """Tables the plan reads with a sequential scan"""
+    return {node["Relation Name"] for node in _walk(plan) if node["Node Type"] == "Seq Scan"}